@@ -0,0 +1,43 @@
+import argparse
+import time
+from src.recommendation import load_rule_store
+from src.training import load_transaction_baskets
+from benchmarks.synthetic import generate_baskets, load_catalogue
+
+# Compare scoring carts one by one with RuleStore.recommend against one RuleStore.recommend_batch call.
+# Run from the "Recommendation System" folder: python -m benchmarks.bench_batch
+
+
+def load_stored_carts():
+    baskets, item_names = load_transaction_baskets()
+    return [[item_names[item_id] for item_id in basket] for basket in baskets]
+
+
+def run(name, rule_store, carts, top_n):
+    start = time.perf_counter()
+    one_by_one = [rule_store.recommend(cart, top_n=top_n) for cart in carts]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = rule_store.recommend_batch(carts, top_n=top_n)
+    batch_seconds = time.perf_counter() - start
+
+    print(f"{name:<12} {len(carts):>9} {loop_seconds:>10.3f} {batch_seconds:>10.3f} "
+          f"{loop_seconds / batch_seconds:>8.1f}x {'yes' if one_by_one == batch else 'NO':>6}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark batch recommendation against per-cart calls.")
+    parser.add_argument('--synthetic', type=int, nargs='*', default=[100000],
+                        help="Sizes of the synthetic cart sets to score")
+    parser.add_argument('--top-n', type=int, default=5)
+    args = parser.parse_args()
+
+    rule_store = load_rule_store()
+    print(f"{len(rule_store)} rules over {len(rule_store.items)} items")
+    print(f"{'dataset':<12} {'carts':>9} {'per cart':>10} {'batch':>10} {'speedup':>9} {'match':>6}")
+    run('stored', rule_store, load_stored_carts(), args.top_n)
+
+    catalogue = load_catalogue()
+    for size in args.synthetic:
+        run('synthetic', rule_store, generate_baskets(size, catalogue), args.top_n)
@@ -0,0 +1,62 @@
+import argparse
+import sqlite3
+import time
+from mlxtend.frequent_patterns import fpgrowth
+from src.bitset_miner import bitset_eclat
+from src.training import data_preparation, encode_transactions
+from benchmarks.synthetic import generate_baskets, load_catalogue
+
+# Compare the packed-bitset Eclat engine against mlxtend fpgrowth on the same one-hot frame.
+# Run from the "Recommendation System" folder: python -m benchmarks.bench_mining
+
+
+def load_bundled_baskets(db_path='./data/recommendation_system.db'):
+    conn = sqlite3.connect(db_path)
+    try:
+        return data_preparation(conn.execute('SELECT transaction_id, products FROM transactions').fetchall())
+    finally:
+        conn.close()
+
+
+def time_engine(engine, basket_encoded, min_support, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frequent_itemsets = engine(basket_encoded, min_support=min_support, use_colnames=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, frequent_itemsets
+
+
+def same_itemsets(left, right):
+    left = {itemset: round(support, 12) for itemset, support in zip(left['itemsets'], left['support'])}
+    right = {itemset: round(support, 12) for itemset, support in zip(right['itemsets'], right['support'])}
+    return left == right
+
+
+def run(name, baskets, min_supports, sparse, repeat):
+    basket_encoded = encode_transactions(baskets, sparse=sparse)
+    for min_support in min_supports:
+        fpgrowth_seconds, fpgrowth_itemsets = time_engine(fpgrowth, basket_encoded, min_support, repeat)
+        bitset_seconds, bitset_itemsets = time_engine(bitset_eclat, basket_encoded, min_support, repeat)
+        print(f"{name:<12} {len(baskets):>9} {min_support:>8} {len(fpgrowth_itemsets):>9} "
+              f"{fpgrowth_seconds:>10.3f} {bitset_seconds:>10.3f} {fpgrowth_seconds / bitset_seconds:>8.1f}x "
+              f"{'yes' if same_itemsets(fpgrowth_itemsets, bitset_itemsets) else 'NO':>6}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the bitset miner against mlxtend fpgrowth.")
+    parser.add_argument('--min-support', type=float, nargs='+', default=[0.009, 0.001])
+    parser.add_argument('--synthetic', type=int, nargs='*', default=[100000, 500000],
+                        help="Sizes of the synthetic basket sets to mine")
+    parser.add_argument('--sparse', action='store_true', help="Mine the sparse one-hot encoding")
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'dataset':<12} {'baskets':>9} {'support':>8} {'itemsets':>9} {'fpgrowth':>10} {'bitset':>10} "
+          f"{'speedup':>9} {'match':>6}")
+    run('bundled', load_bundled_baskets(), args.min_support, args.sparse, args.repeat)
+
+    catalogue = load_catalogue()
+    for basket_count in args.synthetic:
+        run('synthetic', generate_baskets(basket_count, catalogue), args.min_support, args.sparse, args.repeat)
@@ -0,0 +1,191 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from src import storage
+from src.checkout_logger import CheckoutLogger
+from src.pos_operations import POSOperations
+from src.recommendation_system import RecommendationSystem
+from src.training import model_training
+from benchmarks.synthetic import generate_baskets, load_catalogue
+
+# End-to-end replay of baskets through the POS hot path, headless:
+#   POSOperations.add_product -> RecommendationSystem.update_recommendations (per scan) -> CheckoutLogger.submit
+# For every rule-set size (--min-support) the rules are trained on the first part of the baskets in a
+# scratch database and the rest is replayed against them. "checkout" is the till's side of a checkout
+# (queueing it), "commit" the logger's write of each batch of logs and sales rows, and the throughput
+# clock runs until every checkout has been committed. Results are printed as a table on stderr and
+# written as JSON so runs can be compared over time.
+# Run from the "Recommendation System" folder: python -m benchmarks.bench_pos_replay --output replay.json
+
+RETAIL_DATA_FILE = '../Milestone_1/datapipeline code/retail-data.csv'
+
+# Default rule-set sizes per source. The retail invoices are long (20 lines on average, up to ~600), so
+# below about 0.04 their frequent itemsets grow past 10 items and the rule count explodes
+DEFAULT_MIN_SUPPORT = {
+    'retail': [0.05, 0.045, 0.04],
+    'synthetic': [0.01, 0.005, 0.002]
+}
+
+
+def load_retail_baskets(path=RETAIL_DATA_FILE):
+    # Invoices of the online retail sample, each one a basket of distinct product descriptions. The file
+    # is decoded by open() so undecodable bytes are replaced on every pandas version
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as file:
+        df = pd.read_csv(file, usecols=['InvoiceNo', 'Description'])
+    df = df.dropna()
+    df['Description'] = df['Description'].astype(str).str.strip()
+    return [list(dict.fromkeys(items)) for _, items in df.groupby('InvoiceNo', sort=False)['Description']]
+
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies) * 1000
+    if not len(latencies):
+        return {'count': 0}
+    return {
+        'count': int(len(latencies)),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max())
+    }
+
+
+def replay(train_baskets, replay_baskets, min_support, confidence_threshold, use_session, cache_size, engine):
+    # Every rule-set size gets a fresh scratch database, the real one is never touched and is
+    # configured again afterwards, so a caller in the same process keeps using it
+    directory = tempfile.mkdtemp(prefix='pos_replay_')
+    db_path = storage.connection_manager.db_path
+    try:
+        storage.configure(db_path=os.path.join(directory, 'replay.db'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            model_training(train_baskets, min_support=min_support, lift_threshold=1,
+                           confidence_threshold=confidence_threshold, sparse=True, engine=engine)
+
+            recommendation_system = RecommendationSystem()
+            recommendation_system.recommendation_cache.maxsize = cache_size
+            recommendation_system.load_rules()
+            pos_operations = POSOperations(recommend_log_path=os.path.join(directory, 'recommend_log.csv'),
+                                           counter_path=os.path.join(directory, 'transaction_counter'),
+                                           sales_log_path=os.path.join(directory, 'retail-data.csv'))
+            session = recommendation_system.new_cart_session() if use_session else None
+            # Checkouts go through the till's write-behind logger, flushed before its stats are read
+            checkout_logger = CheckoutLogger(recommendation_system.save_logs, pos_operations.write_transaction_rows,
+                                             spill_path=os.path.join(directory, 'unsaved_checkouts.jsonl'),
+                                             commit_history=len(replay_baskets),
+                                             on_idle=pos_operations.transaction_ids.reserve_ahead)
+
+            scan_latencies = []
+            checkout_latencies = []
+            start = time.perf_counter()
+            for basket in replay_baskets:
+                recommendations = []
+                for item in basket:
+                    scan_start = time.perf_counter()
+                    pos_operations.add_product(item)
+                    if session is not None:
+                        session.add(item)
+                    scanned_items = list(pos_operations.get_transaction_items().keys())
+                    recommendations = recommendation_system.update_recommendations(scanned_items, session=session)
+                    scan_latencies.append(time.perf_counter() - scan_start)
+
+                checkout_start = time.perf_counter()
+                recommended_items = [item.replace(" (Already in cart)", "") for item in recommendations]
+                checkout_logger.submit((pos_operations.generate_transaction_id(), recommended_items, scanned_items),
+                                       pos_operations.transaction_rows())
+                pos_operations.clear_transaction()
+                if session is not None:
+                    session.clear()
+                checkout_latencies.append(time.perf_counter() - checkout_start)
+            checkout_logger.flush()
+            elapsed = time.perf_counter() - start
+            commit_latencies = list(checkout_logger.commit_seconds)
+            durability = checkout_logger.durability_stats()
+            checkout_logger.close()
+
+        return {
+            'min_support': min_support,
+            'rules': len(recommendation_system.rule_store),
+            'items': len(recommendation_system.rule_store.items),
+            'scan': percentiles(scan_latencies),
+            'checkout': percentiles(checkout_latencies),
+            'commit': percentiles(commit_latencies),
+            'throughput': {
+                'seconds': elapsed,
+                'scans_per_second': len(scan_latencies) / elapsed if elapsed else 0.0,
+                'baskets_per_second': len(replay_baskets) / elapsed if elapsed else 0.0
+            },
+            'cache': recommendation_system.recommendation_cache_stats(),
+            'durability': durability
+        }
+    finally:
+        storage.connection_manager.close()
+        storage.configure(db_path=db_path)
+        # The mapped rule file may still be open on platforms that cannot delete it, leave it to the OS then
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay baskets through the POS hot path and report latencies.")
+    parser.add_argument('--source', choices=['retail', 'synthetic'], default='retail')
+    parser.add_argument('--retail-file', default=RETAIL_DATA_FILE)
+    parser.add_argument('--baskets', type=int, default=20000, help="Synthetic baskets to generate")
+    parser.add_argument('--replay', type=int, default=None, help="Replay at most this many baskets")
+    parser.add_argument('--train-fraction', type=float, default=0.8)
+    parser.add_argument('--min-support', type=float, nargs='+',
+                        help="One replay per value, lower values give larger rule sets (default depends on --source)")
+    parser.add_argument('--engine', choices=['fpgrowth', 'bitset'], default='bitset', help="Miner used to train the rules")
+    parser.add_argument('--confidence', type=float, default=0.1)
+    parser.add_argument('--no-session', action='store_true', help="Score every scan from scratch without a CartSession")
+    parser.add_argument('--cache-size', type=int, default=1024, help="Recommendation LRU size, 0 disables it")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.source == 'retail':
+        baskets = load_retail_baskets(args.retail_file)
+    else:
+        baskets = generate_baskets(args.baskets, load_catalogue(), seed=args.seed)
+    split = int(len(baskets) * args.train_fraction)
+    train_baskets, replay_baskets = baskets[:split], baskets[split:][:args.replay]
+
+    results = {
+        'benchmark': 'pos_replay',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'source': args.source,
+        'train_baskets': len(train_baskets),
+        'replay_baskets': len(replay_baskets),
+        'session': not args.no_session,
+        'cache_size': args.cache_size,
+        'engine': args.engine,
+        'runs': []
+    }
+
+    print(f"{'support':>8} {'rules':>7} {'scans':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'co p50':>8} {'co p99':>8} {'cm p99':>8} {'scans/s':>9}", file=sys.stderr)
+    for min_support in args.min_support or DEFAULT_MIN_SUPPORT[args.source]:
+        run = replay(train_baskets, replay_baskets, min_support, args.confidence, not args.no_session, args.cache_size,
+                     args.engine)
+        results['runs'].append(run)
+        print(f"{min_support:>8} {run['rules']:>7} {run['scan']['count']:>7} {run['scan']['p50_ms']:>8.3f} "
+              f"{run['scan']['p95_ms']:>8.3f} {run['scan']['p99_ms']:>8.3f} {run['checkout']['p50_ms']:>8.3f} "
+              f"{run['checkout']['p99_ms']:>8.3f} {run['commit']['p99_ms']:>8.3f} "
+              f"{run['throughput']['scans_per_second']:>9.0f}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
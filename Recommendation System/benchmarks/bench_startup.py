@@ -0,0 +1,121 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from mainpos import DEFERRED_MODULES
+
+# Startup profile of the cashier screen and a regression guard on it:
+#   - import time per module of src.pos_ui, from python -X importtime
+#   - mainpos.py --profile-startup: import, UI construction and time to the first drawn frame
+#     (the frame timings are missing without a display)
+#   - none of mainpos.DEFERRED_MODULES may be loaded at startup
+# Run from the "Recommendation System" folder:
+#   python -m benchmarks.bench_startup --save startup.json     record a baseline
+#   python -m benchmarks.bench_startup --check startup.json    exit 1 if startup regressed against it
+
+
+def import_times(module='src.pos_ui'):
+    # {module: (self_us, cumulative_us)} from a fresh interpreter
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def profile_mainpos():
+    result = subprocess.run([sys.executable, 'mainpos.py', '--profile-startup'], capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median(values):
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+
+def profile(runs, top):
+    import_runs = [import_times() for _ in range(runs)]
+    main_runs = [profile_mainpos() for _ in range(runs)]
+
+    modules = {}
+    for name in import_runs[0]:
+        modules[name] = {
+            'self_ms': median(run.get(name, (None, None))[0] for run in import_runs) / 1000,
+            'cumulative_ms': median(run.get(name, (None, None))[1] for run in import_runs) / 1000
+        }
+    slowest = sorted(modules.items(), key=lambda item: item[1]['self_ms'], reverse=True)[:top]
+
+    def phase(key):
+        value = median(run.get(key) for run in main_runs)
+        return value * 1000 if value is not None else None
+
+    return {
+        'benchmark': 'startup',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'runs': runs,
+        'import_ms': modules['src.pos_ui']['cumulative_ms'],
+        'mainpos_import_ms': phase('import_s'),
+        'ui_ms': phase('ui_s'),
+        'first_frame_ms': phase('first_frame_s'),
+        'total_ms': phase('total_s'),
+        'loaded_deferred_modules': sorted(name for name in DEFERRED_MODULES if name in modules),
+        'slowest_modules': [dict(module=name, **times) for name, times in slowest]
+    }
+
+
+def check(results, baseline, tolerance, min_slack_ms):
+    # Regressions as messages, a timing may exceed its baseline by tolerance or min_slack_ms, whichever is larger
+    failures = []
+    if results['loaded_deferred_modules']:
+        failures.append(f"deferred modules imported at startup: {', '.join(results['loaded_deferred_modules'])}")
+    for key in ('import_ms', 'ui_ms', 'first_frame_ms', 'total_ms'):
+        if results[key] is None or baseline.get(key) is None:
+            continue
+        limit = max(baseline[key] * (1 + tolerance), baseline[key] + min_slack_ms)
+        if results[key] > limit:
+            failures.append(f"{key} {results[key]:.1f} > {limit:.1f} (baseline {baseline[key]:.1f})")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile the POS startup and guard it against regressions.")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per measurement, medians are reported")
+    parser.add_argument('--top', type=int, default=15, help="Slowest modules to list")
+    parser.add_argument('--save', help="Write the results as the new baseline")
+    parser.add_argument('--check', help="Compare against this baseline and exit 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument('--min-slack-ms', type=float, default=50, help="Allowed absolute slowdown")
+    args = parser.parse_args()
+
+    results = profile(args.runs, args.top)
+
+    def ms(value):
+        return f"{value:.1f} ms" if value is not None else "n/a (no display)"
+
+    print(f"import src.pos_ui {ms(results['import_ms'])}, POSUI {ms(results['ui_ms'])}, "
+          f"first frame {ms(results['first_frame_ms'])}, total {ms(results['total_ms'])}", file=sys.stderr)
+    print(f"{'module':<45} {'self ms':>9} {'cumul ms':>9}", file=sys.stderr)
+    for module in results['slowest_modules']:
+        print(f"{module['module']:<45} {module['self_ms']:>9.1f} {module['cumulative_ms']:>9.1f}", file=sys.stderr)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+            file.write('\n')
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.check:
+        with open(args.check) as file:
+            failures = check(results, json.load(file), args.tolerance, args.min_slack_ms)
+        for failure in failures:
+            print(f"REGRESSION: {failure}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
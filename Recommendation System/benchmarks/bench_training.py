@@ -0,0 +1,127 @@
+import argparse
+import csv
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from mlxtend.frequent_patterns import association_rules
+from src.training import MINING_ENGINES, encode_transactions
+from benchmarks.synthetic import BasketGenerator
+
+# Scalability suite for the steps of training.model_training: encoding, frequent itemset mining and
+# association_rules, timed and memory-profiled separately over a sweep of basket counts, catalogue
+# sizes and min_support values on co-purchase structured synthetic baskets.
+# Run from the "Recommendation System" folder:
+#   python -m benchmarks.bench_training --baskets 10000 100000 1000000 --output training.csv
+# Once a configuration takes longer than --budget seconds, larger basket counts of the same catalogue
+# size and min_support are skipped: that is where "Train Model" stops finishing in time.
+
+COLUMNS = ['baskets', 'catalogue', 'min_support', 'engine', 'sparse', 'itemsets', 'rules',
+           'encode_s', 'mine_s', 'rules_s', 'total_s', 'encode_peak_mb', 'mine_peak_mb', 'rules_peak_mb', 'status']
+
+
+def measure(stage, profile_memory):
+    # Seconds and peak traced memory (MB) of one stage
+    gc.collect()
+    if profile_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = stage()
+    seconds = time.perf_counter() - start
+    peak = 0.0
+    if profile_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run(baskets, catalogue_size, min_support, engine, sparse, profile_memory):
+    basket_encoded, encode_seconds, encode_peak = measure(lambda: encode_transactions(baskets, sparse=sparse),
+                                                          profile_memory)
+    frequent_itemsets, mine_seconds, mine_peak = measure(
+        lambda: MINING_ENGINES[engine](basket_encoded, min_support=min_support, use_colnames=True), profile_memory)
+    rules, rules_seconds, rules_peak = measure(
+        lambda: association_rules(frequent_itemsets, metric="lift", min_threshold=1), profile_memory)
+    return {
+        'baskets': len(baskets),
+        'catalogue': catalogue_size,
+        'min_support': min_support,
+        'engine': engine,
+        'sparse': sparse,
+        'itemsets': len(frequent_itemsets),
+        'rules': len(rules),
+        'encode_s': encode_seconds,
+        'mine_s': mine_seconds,
+        'rules_s': rules_seconds,
+        'total_s': encode_seconds + mine_seconds + rules_seconds,
+        'encode_peak_mb': encode_peak,
+        'mine_peak_mb': mine_peak,
+        'rules_peak_mb': rules_peak,
+        'status': 'ok'
+    }
+
+
+def print_row(row, file=sys.stdout):
+    if row['status'] != 'ok':
+        print(f"{row['baskets']:>9} {row['catalogue']:>9} {row['min_support']:>8}  {row['status']}", file=file)
+        return
+    print(f"{row['baskets']:>9} {row['catalogue']:>9} {row['min_support']:>8} {row['itemsets']:>9} {row['rules']:>8} "
+          f"{row['encode_s']:>9.2f} {row['mine_s']:>9.2f} {row['rules_s']:>9.2f} {row['total_s']:>9.2f} "
+          f"{row['encode_peak_mb']:>9.0f} {row['mine_peak_mb']:>9.0f} {row['rules_peak_mb']:>9.0f}", file=file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark how model training scales with the basket history.")
+    parser.add_argument('--baskets', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help="Basket counts to sweep, e.g. up to 10000000")
+    parser.add_argument('--catalogue', type=int, nargs='+', default=[95, 500],
+                        help="Catalogue sizes, products beyond prod_list.csv are cloned variants")
+    parser.add_argument('--min-support', type=float, nargs='+', default=[0.01, 0.005])
+    parser.add_argument('--engine', choices=list(MINING_ENGINES), default='fpgrowth')
+    parser.add_argument('--sparse', action='store_true', help="Use the sparse one-hot encoding")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Skip tracemalloc, which slows down the Python heavy encoding step")
+    parser.add_argument('--budget', type=float, default=3600,
+                        help="Skip larger basket counts once a configuration takes longer than this (seconds)")
+    parser.add_argument('--output', help="Also write the rows to this .csv or .json file")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'baskets':>9} {'catalogue':>9} {'support':>8} {'itemsets':>9} {'rules':>8} {'encode s':>9} "
+          f"{'mine s':>9} {'rules s':>9} {'total s':>9} {'enc MB':>9} {'mine MB':>9} {'rules MB':>9}")
+    rows = []
+    over_budget = set()
+    for catalogue_size in args.catalogue:
+        generator = BasketGenerator(catalogue_size=catalogue_size, seed=args.seed)
+        for basket_count in sorted(args.baskets):
+            baskets = None
+            for min_support in args.min_support:
+                if (catalogue_size, min_support) in over_budget:
+                    row = dict.fromkeys(COLUMNS, None)
+                    row.update(baskets=basket_count, catalogue=catalogue_size, min_support=min_support,
+                               engine=args.engine, sparse=args.sparse, status='skipped (over budget)')
+                else:
+                    if baskets is None:
+                        baskets = generator.baskets(basket_count)
+                    try:
+                        row = run(baskets, catalogue_size, min_support, args.engine, args.sparse, not args.no_memory)
+                    except MemoryError:
+                        row = dict.fromkeys(COLUMNS, None)
+                        row.update(baskets=basket_count, catalogue=catalogue_size, min_support=min_support,
+                                   engine=args.engine, sparse=args.sparse, status='out of memory')
+                    if row['status'] != 'ok' or row['total_s'] > args.budget:
+                        over_budget.add((catalogue_size, min_support))
+                rows.append(row)
+                print_row(row)
+            del baskets
+
+    if args.output:
+        with open(args.output, 'w', newline='') as file:
+            if args.output.endswith('.json'):
+                json.dump({'benchmark': 'training', 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                           'python': sys.version.split()[0], 'rows': rows}, file, indent=2)
+            else:
+                writer = csv.DictWriter(file, fieldnames=COLUMNS)
+                writer.writeheader()
+                writer.writerows(rows)
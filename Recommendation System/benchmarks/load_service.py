@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+from benchmarks.synthetic import generate_baskets, load_catalogue
+from src.service import DEFAULT_HOST
+
+# Load test for the recommendation service: every client is one till scanning synthetic baskets item by
+# item (one recommend per scan) and checking out at the end of the basket.
+# Run from the "Recommendation System" folder: python -m benchmarks.load_service --clients 20
+# Without --address a service is started on a free local port for the duration of the run.
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((DEFAULT_HOST, 0))
+        return sock.getsockname()[1]
+
+
+def start_service(port, timeout=60):
+    process = subprocess.Popen([sys.executable, 'mainservice.py', '--port', str(port)],
+                               stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((DEFAULT_HOST, port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Recommendation service did not start.")
+
+
+async def till(host, port, baskets, latencies, checkout_latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def call(payload):
+        start = time.perf_counter()
+        writer.write(json.dumps(payload).encode('utf-8') + b'\n')
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error'))
+        return time.perf_counter() - start
+
+    for number, basket in enumerate(baskets):
+        for scanned in range(1, len(basket) + 1):
+            latencies.append(await call({'op': 'recommend', 'items': basket[:scanned]}))
+        checkout_latencies.append(await call({'op': 'checkout', 'transaction_id': f"LOAD{number:06d}",
+                                              'purchased_items': basket, 'recommended_items': []}))
+    writer.close()
+
+
+def summarize(name, latencies, elapsed):
+    latencies = np.asarray(latencies) * 1000
+    print(f"{name:<10} {len(latencies):>8} {len(latencies) / elapsed:>10.0f} "
+          f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f} "
+          f"{np.percentile(latencies, 99):>8.2f}")
+
+
+async def run(host, port, clients, baskets_per_client, seed):
+    catalogue = load_catalogue()
+    baskets = generate_baskets(clients * baskets_per_client, catalogue, seed=seed)
+    random.Random(seed).shuffle(baskets)
+    latencies, checkout_latencies = [], []
+
+    start = time.perf_counter()
+    await asyncio.gather(*(till(host, port, baskets[client::clients], latencies, checkout_latencies)
+                           for client in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{clients} tills, {len(baskets)} baskets in {elapsed:.2f}s")
+    print(f"{'request':<10} {'count':>8} {'per sec':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    summarize('recommend', latencies, elapsed)
+    summarize('checkout', checkout_latencies, elapsed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the recommendation service.")
+    parser.add_argument('--address', help="host:port of a running service, one is started otherwise")
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--baskets', type=int, default=50, help="Baskets checked out by every client")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    process = None
+    if args.address:
+        host, _, port = args.address.rpartition(':')
+        host, port = host or DEFAULT_HOST, int(port)
+    else:
+        host, port = DEFAULT_HOST, free_port()
+        process = start_service(port)
+
+    try:
+        asyncio.run(run(host, port, args.clients, args.baskets, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+
+def load_catalogue(product_file='./data/prod_list.csv'):
+    return pd.read_csv(product_file)['Product_Name'].dropna().unique().tolist()
+
+
+def generate_baskets(basket_count, catalogue, mean_basket_size=3.5, zipf_exponent=1.1, seed=0):
+    # Random baskets with Zipf distributed item popularity
+    rng = np.random.default_rng(seed)
+    catalogue = list(catalogue)
+    weights = 1.0 / np.arange(1, len(catalogue) + 1) ** zipf_exponent
+    weights /= weights.sum()
+
+    sizes = np.clip(rng.poisson(mean_basket_size - 1, basket_count) + 1, 1, len(catalogue))
+    baskets = []
+    for size in sizes:
+        items = rng.choice(len(catalogue), size=size, replace=False, p=weights)
+        baskets.append([catalogue[item] for item in items])
+    return baskets
+
+
+class BasketGenerator:
+    """
+    Synthetic baskets with popularity and co-purchase structure drawn from prod_list.csv.
+
+    Item popularity follows a Zipf law over the products ordered by price (cheap staples sell most).
+    Every basket has a shopping mission, one category picked by its popularity: each line comes from
+    that category with probability category_affinity and from the whole catalogue otherwise.
+    On top of that a fixed set of cross-category bundles (e.g. a meat with a condiment and a
+    vegetable) is added to a bundle_rate share of the baskets, which plants strong rules.
+
+    catalogue_size larger than the product list clones products into numbered variants of the same
+    brand and category, so the sweep can go beyond the bundled catalogue. Generation is vectorized
+    and baskets come back as CSR arrays (basket_ptr, item_ids); names() turns them into name lists.
+    """
+
+    def __init__(self, product_file='./data/prod_list.csv', catalogue_size=None, zipf_exponent=1.1,
+                 mean_basket_size=3.5, category_affinity=0.6, bundle_count=20, bundle_rate=0.15, seed=0):
+        self.rng = np.random.default_rng(seed)
+        products = pd.read_csv(product_file).dropna(subset=['Product_Name']).drop_duplicates('Product_Name')
+        products = products.sort_values('Price_per_Unit', kind='stable').reset_index(drop=True)
+
+        catalogue_size = catalogue_size or len(products)
+        variants = products.iloc[np.arange(catalogue_size) % len(products)].reset_index(drop=True)
+        copy = np.arange(catalogue_size) // len(products)
+        self.items = [name if number == 0 else f"{name} #{number + 1}"
+                      for name, number in zip(variants['Product_Name'], copy)]
+
+        # Popularity by price rank; clones rank after all originals
+        weights = 1.0 / np.arange(1, catalogue_size + 1) ** zipf_exponent
+        self.weights = weights / weights.sum()
+
+        categories, self.item_categories = np.unique(variants['Category'].astype(str), return_inverse=True)
+        self.categories = list(categories)
+        self.category_weights = np.bincount(self.item_categories, weights=self.weights)
+        # Items of every category with their cumulative in-category popularity, for vectorized draws
+        self.category_items = [np.flatnonzero(self.item_categories == category) for category in range(len(categories))]
+        self.category_cumulative = [np.cumsum(self.weights[items]) / self.weights[items].sum()
+                                    for items in self.category_items]
+
+        self.mean_basket_size = mean_basket_size
+        self.category_affinity = category_affinity
+        self.bundle_rate = bundle_rate
+        self.bundles = self.make_bundles(bundle_count)
+
+    def make_bundles(self, bundle_count):
+        # Two or three popular items from different categories that are bought together
+        bundles = []
+        for _ in range(bundle_count):
+            size = self.rng.integers(2, 4)
+            categories = self.rng.choice(len(self.categories), size=min(size, len(self.categories)), replace=False,
+                                         p=self.category_weights)
+            bundles.append([int(self.draw_from_category(np.full(1, category))[0]) for category in categories])
+        return bundles
+
+    def draw_from_category(self, categories):
+        # One item per entry of categories, by popularity within the category
+        items = np.empty(len(categories), dtype=np.int64)
+        draws = self.rng.random(len(categories))
+        for category in np.unique(categories):
+            mask = categories == category
+            positions = np.searchsorted(self.category_cumulative[category], draws[mask], side='right')
+            items[mask] = self.category_items[category][np.minimum(positions, len(self.category_items[category]) - 1)]
+        return items
+
+    def generate(self, basket_count):
+        sizes = np.clip(self.rng.poisson(self.mean_basket_size - 1, basket_count) + 1, 1, len(self.items))
+        missions = self.rng.choice(len(self.categories), size=basket_count, p=self.category_weights)
+
+        # Every line either follows the basket's mission or is drawn from the whole catalogue
+        line_baskets = np.repeat(np.arange(basket_count), sizes)
+        on_mission = self.rng.random(len(line_baskets)) < self.category_affinity
+        line_items = self.rng.choice(len(self.items), size=len(line_baskets), p=self.weights)
+        line_items[on_mission] = self.draw_from_category(missions[line_baskets[on_mission]])
+
+        # Planted bundles
+        bundle_baskets = np.flatnonzero(self.rng.random(basket_count) < self.bundle_rate)
+        if len(bundle_baskets) and self.bundles:
+            chosen = self.rng.integers(0, len(self.bundles), len(bundle_baskets))
+            bundle_sizes = np.array([len(bundle) for bundle in self.bundles])[chosen]
+            bundle_items = np.concatenate([self.bundles[bundle] for bundle in chosen])
+            line_baskets = np.concatenate((line_baskets, np.repeat(bundle_baskets, bundle_sizes)))
+            line_items = np.concatenate((line_items, bundle_items))
+
+        # A basket holds every item once
+        keys = np.unique(line_baskets * len(self.items) + line_items)
+        basket_ids, item_ids = keys // len(self.items), keys % len(self.items)
+        basket_ptr = np.zeros(basket_count + 1, dtype=np.int64)
+        basket_ptr[1:] = np.cumsum(np.bincount(basket_ids, minlength=basket_count))
+        return basket_ptr, item_ids
+
+    def names(self, basket_ptr, item_ids):
+        names = [self.items[item_id] for item_id in item_ids.tolist()]
+        return [names[start:end] for start, end in zip(basket_ptr[:-1].tolist(), basket_ptr[1:].tolist())]
+
+    def baskets(self, basket_count):
+        # Baskets as lists of product names, the input model_training takes
+        return self.names(*self.generate(basket_count))
@@ -1,12 +1,63 @@
-import tkinter as tk
-from src.pos_ui import POSUI
+import time
+STARTED = time.perf_counter()
+import argparse
+import json
 import os
+import sys
+import tkinter as tk
+
+# Modules the cashier screen must not load at startup, training, metrics and graphs import them on first use
+DEFERRED_MODULES = ['pandas', 'mlxtend', 'matplotlib', 'scipy', 'sklearn']
+
+
+def print_startup_profile(timings):
+    timings['loaded_deferred_modules'] = [name for name in DEFERRED_MODULES if name in sys.modules]
+    print(json.dumps(timings))
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="POS system with related recommendations.")
+    parser.add_argument('--service', default=os.environ.get('RECOMMENDATION_SERVICE'),
+                        help="host:port of a recommendation service (mainservice.py) to use instead of the local engine")
+    parser.add_argument('--ingest-workers', type=int, default=None,
+                        help="Worker processes for Fetch Data, 0 ingests serially "
+                             "(default: RECOMMENDATION_INGEST_WORKERS or one per core up to 4)")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Print the startup timings as JSON once the first frame is drawn, then exit")
+    args = parser.parse_args()
+
+    # Seconds per startup phase, total_s runs from the top of this file to the first frame
+    timings = {}
+    import_start = time.perf_counter()
+    from src.pos_ui import POSUI
+    timings['import_s'] = time.perf_counter() - import_start
+
     data_folder = './data'
     if not os.path.exists(data_folder):
         os.makedirs(data_folder)
         print(f"Created data folder: {data_folder}")
-    root = tk.Tk()
-    app = POSUI(root)
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        if not args.profile_startup:
+            raise
+        # No display: report the import timings only
+        timings.update(error=str(e), ui_s=None, first_frame_s=None, total_s=time.perf_counter() - STARTED)
+        print_startup_profile(timings)
+        sys.exit(0)
+
+    ui_start = time.perf_counter()
+    app = POSUI(root, service_address=args.service, ingest_workers=args.ingest_workers)
+    timings['ui_s'] = time.perf_counter() - ui_start
+
+    if args.profile_startup:
+        def first_frame():
+            # Runs from the event loop once the window has been mapped and drawn
+            root.update_idletasks()
+            timings['first_frame_s'] = time.perf_counter() - ui_start - timings['ui_s']
+            timings['total_s'] = time.perf_counter() - STARTED
+            print_startup_profile(timings)
+            app.on_close()
+
+        root.after(0, first_frame)
     root.mainloop()
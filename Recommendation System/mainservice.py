@@ -0,0 +1,18 @@
+import argparse
+from src.service import DEFAULT_HOST, DEFAULT_PORT, run_service
+import os
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless recommendation service for several POS terminals.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--batch-size', type=int, default=200, help="Most checkout logs written per transaction")
+    parser.add_argument('--flush-interval', type=float, default=0.05,
+                        help="Seconds a checkout may wait for others to share its commit")
+    args = parser.parse_args()
+
+    data_folder = './data'
+    if not os.path.exists(data_folder):
+        os.makedirs(data_folder)
+        print(f"Created data folder: {data_folder}")
+    run_service(args.host, args.port, batch_size=args.batch_size, flush_interval=args.flush_interval)
@@ -0,0 +1,18 @@
+import argparse
+import os
+from src.recommendation_system import RecommendationSystem
+
+# Nightly training: python maintrain.py folds the day's transactions into the stored itemset counts,
+# python maintrain.py --rebuild mines every transaction again with FP-Growth
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the association rules from the stored transactions.")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Full FP-Growth run over all transactions instead of the incremental update")
+    args = parser.parse_args()
+
+    data_folder = './data'
+    if not os.path.exists(data_folder):
+        os.makedirs(data_folder)
+        print(f"Created data folder: {data_folder}")
+    RecommendationSystem().train_model(incremental=not args.rebuild)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Number of set bits of every byte value, used to popcount packed bitsets
+POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def popcount(bitsets):
+    # Set bits per row of a 2D array of packed uint8 bitsets
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bitsets).sum(axis=1, dtype=np.int64)
+    return POPCOUNT_TABLE[bitsets].sum(axis=1, dtype=np.int64)
+
+
+def encode_bitsets(basket_encoded):
+    # Pack the transaction set of every item (column) into a bitset row
+    if hasattr(basket_encoded, 'sparse'):
+        # Set the bits straight from the non-zero entries, the baskets never become dense
+        matrix = basket_encoded.sparse.to_coo()
+        transactions, items = matrix.row, matrix.col
+        bitsets = np.zeros((basket_encoded.shape[1], (basket_encoded.shape[0] + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(bitsets, (items, transactions >> 3), (0x80 >> (transactions & 7)).astype(np.uint8))
+        return bitsets
+    return np.packbits(np.asarray(basket_encoded, dtype=bool).T, axis=1)
+
+
+def minimum_count(min_support, transaction_count):
+    # Smallest frequent count, rounded up from min_support * transaction_count like mlxtend fpgrowth.
+    # On float boundaries (0.07 * 100 is just above 7) this differs from comparing count / n >= min_support
+    return int(np.ceil(min_support * transaction_count))
+
+
+def bitset_eclat(basket_encoded, min_support=0.5, use_colnames=False, max_len=None):
+    """
+    Eclat-style frequent itemset miner on packed NumPy bitsets.
+
+    Every item keeps the set of transactions containing it as a packed bitset. An itemset is
+    extended with all remaining candidates at once: one vectorized AND against the stacked
+    candidate bitsets and one table popcount give all their supports.
+
+    Takes the same one-hot DataFrame as mlxtend fpgrowth (dense or sparse) and returns the same
+    frame with 'support' and 'itemsets' columns, ready for association_rules.
+    """
+    transaction_count = basket_encoded.shape[0]
+    columns = list(basket_encoded.columns)
+    if transaction_count == 0:
+        return pd.DataFrame(columns=['support', 'itemsets'])
+
+    min_count = minimum_count(min_support, transaction_count)
+    bitsets = encode_bitsets(basket_encoded)
+    counts = popcount(bitsets)
+
+    # Frequent single items, the extension candidates of every prefix
+    frequent = np.flatnonzero(counts >= min_count)
+    supports = [counts[item] for item in frequent]
+    itemsets = [(item,) for item in frequent]
+
+    stack = [((item,), bitsets[item], frequent[position + 1:]) for position, item in enumerate(frequent)]
+    while stack:
+        prefix, prefix_bitset, candidates = stack.pop()
+        if not len(candidates) or (max_len is not None and len(prefix) >= max_len):
+            continue
+
+        extended = bitsets[candidates] & prefix_bitset
+        extended_counts = popcount(extended)
+        keep = np.flatnonzero(extended_counts >= min_count)
+
+        for position in keep:
+            itemset = prefix + (candidates[position],)
+            supports.append(extended_counts[position])
+            itemsets.append(itemset)
+            stack.append((itemset, extended[position], candidates[keep[keep > position]]))
+
+    if use_colnames:
+        itemsets = [frozenset(columns[item] for item in itemset) for itemset in itemsets]
+    else:
+        itemsets = [frozenset(int(item) for item in itemset) for itemset in itemsets]
+
+    return pd.DataFrame({
+        'support': np.asarray(supports, dtype=np.float64) / transaction_count,
+        'itemsets': itemsets
+    })
@@ -0,0 +1,131 @@
+from bisect import insort
+import heapq
+from src.rule_store import normalize_item
+
+
+class CartSession:
+    """
+    Incremental recommendation scorer for one cart.
+
+    The candidate scores of the previous scan are kept between calls: adding an item only folds
+    in the rules indexed under that item and removing it only retracts those rules, so an update
+    costs the same for a 2 line basket as for a 40 line one.
+
+    The ranking is a lazily invalidated heap: every change of a candidate's rank key pushes a new
+    entry and outdated entries are discarded when they surface, so recommendations() only looks at
+    the top of the heap instead of every candidate.
+    """
+
+    def __init__(self, rule_store, items=()):
+        self.rule_store = rule_store
+        self.clear()
+        for item in items:
+            self.add(item)
+
+    def clear(self):
+        # Quantity per normalized item name, and the ids of the known items among them
+        self.cart = {}
+        self.cart_ids = set()
+        # Number of cart items matching each active rule's antecedents
+        self.rule_hits = {}
+        # Sorted confidences of the active rules recommending each candidate item
+        self.candidate_scores = {}
+        # (rank key, candidate) entries, an entry is current while its key equals rank_key(candidate)
+        self.ranking = []
+
+    def rebind(self, rule_store):
+        # Re-score the current cart against a freshly loaded rule store
+        items = [item for item, quantity in self.cart.items() for _ in range(quantity)]
+        self.rule_store = rule_store
+        self.clear()
+        for item in items:
+            self.add(item)
+
+    def rank_key(self, candidate):
+        # Same ordering as RuleStore.recommend: items already in the cart first, then by best confidence
+        return candidate not in self.cart_ids, -self.candidate_scores[candidate][-1], candidate
+
+    def rerank(self, candidate):
+        if candidate in self.candidate_scores:
+            heapq.heappush(self.ranking, (self.rank_key(candidate), candidate))
+
+    def add(self, item):
+        key = normalize_item(item)
+        self.cart[key] = self.cart.get(key, 0) + 1
+        if self.cart[key] > 1:
+            return
+
+        item_id = self.rule_store.lookup(key)
+        if item_id is None:
+            return
+        self.cart_ids.add(item_id)
+        self.rerank(item_id)
+
+        for rule_id in self.rule_store.rules_for_item(item_id).tolist():
+            hits = self.rule_hits.get(rule_id, 0) + 1
+            self.rule_hits[rule_id] = hits
+            if hits == 1:
+                confidence = float(self.rule_store.confidence[rule_id])
+                for candidate in self.rule_store.consequents(rule_id).tolist():
+                    scores = self.candidate_scores.setdefault(candidate, [])
+                    insort(scores, confidence)
+                    if scores[-1] == confidence:
+                        self.rerank(candidate)
+
+    def remove(self, item):
+        key = normalize_item(item)
+        if key not in self.cart:
+            return
+        self.cart[key] -= 1
+        if self.cart[key] > 0:
+            return
+        del self.cart[key]
+
+        item_id = self.rule_store.lookup(key)
+        if item_id is None:
+            return
+        self.cart_ids.discard(item_id)
+        self.rerank(item_id)
+
+        for rule_id in self.rule_store.rules_for_item(item_id).tolist():
+            hits = self.rule_hits[rule_id] - 1
+            if hits > 0:
+                self.rule_hits[rule_id] = hits
+                continue
+            del self.rule_hits[rule_id]
+            confidence = float(self.rule_store.confidence[rule_id])
+            for candidate in self.rule_store.consequents(rule_id).tolist():
+                scores = self.candidate_scores[candidate]
+                best = scores[-1]
+                scores.remove(confidence)
+                if not scores:
+                    del self.candidate_scores[candidate]
+                elif scores[-1] != best:
+                    self.rerank(candidate)
+
+    def recommendations(self, top_n=5):
+        # Pop current entries off the heap until top_n distinct candidates are found, outdated and
+        # duplicate entries are dropped on the way, the current ones are pushed back afterwards
+        top = []
+        seen = set()
+        while self.ranking and len(top) < top_n:
+            key, candidate = heapq.heappop(self.ranking)
+            if candidate in seen or candidate not in self.candidate_scores or key != self.rank_key(candidate):
+                continue
+            seen.add(candidate)
+            top.append((key, candidate))
+        for entry in top:
+            heapq.heappush(self.ranking, entry)
+
+        # Outdated entries that never reach the top are only dropped by a rebuild
+        if len(self.ranking) > 4 * len(self.candidate_scores) + 64:
+            self.ranking = [(self.rank_key(candidate), candidate) for candidate in self.candidate_scores]
+            heapq.heapify(self.ranking)
+
+        recommendations = []
+        for _, candidate in top:
+            item_name = self.rule_store.items[candidate]
+            if candidate in self.cart_ids:
+                item_name += " (Already in cart)"
+            recommendations.append(item_name)
+        return recommendations
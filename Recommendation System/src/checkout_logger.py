@@ -0,0 +1,235 @@
+import atexit
+from collections import deque
+import json
+import os
+import queue
+import threading
+import time
+from src.sales_log import write_durably
+
+
+def spill_lines(batch):
+    # One JSON line per (log, transaction_rows) checkout, log is None once it has been committed
+    return ''.join(json.dumps({'log': log, 'rows': transaction_rows}, default=str) + '\n'
+                   for log, transaction_rows in batch)
+
+
+class CheckoutLogger:
+    """
+    Write-behind logger for checkouts.
+
+    The till only puts the checkout on a bounded queue and moves on to the next customer. A single
+    background writer drains the queue and commits the recommendation logs of several checkouts in one
+    transaction (group commit) through save_logs, then appends their sales rows with
+    write_transaction_rows. When the writer falls behind by max_pending checkouts, submit() blocks,
+    so memory stays bounded. close() (also registered with atexit) flushes everything still queued.
+
+    Sales rows are only written for committed checkouts. A batch whose logs or sales rows still fail
+    after retries is appended to spill_path (one JSON line per checkout, without the log when only
+    its rows are missing) and retried every retry_interval seconds and at the next start, so nothing
+    is lost while the database, the service or the sales log is unavailable. The durations of the
+    last commit_history batches are kept in commit_seconds.
+
+    on_idle is called on the writer thread whenever the queue has been drained, for upkeep that
+    should not run at the till, like reserving the next block of transaction ids.
+    """
+
+    def __init__(self, save_logs, write_transaction_rows=None, max_pending=1000, batch_size=50,
+                 flush_interval=0.2, retries=3, spill_path=None, retry_interval=30.0, commit_history=1000,
+                 on_idle=None):
+        # save_logs takes a list of (transaction_id, recommended_items, purchased_items) and returns True
+        # once they are all committed, or False when none of them is
+        self.save_logs = save_logs
+        self.write_transaction_rows = write_transaction_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.spill_path = spill_path
+        self.retry_interval = retry_interval
+        self.next_retry = 0.0
+        self.commit_seconds = deque(maxlen=commit_history)
+        self.on_idle = on_idle
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.stats = {'submitted': 0, 'committed': 0, 'failed': 0, 'spilled': 0, 'recovered': 0, 'batches': 0,
+                      'max_pending': 0, 'last_batch_size': 0, 'last_commit_seconds': 0.0}
+        self._lock = threading.Lock()
+        self._stop = object()
+        self._thread = None
+        self._closed = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='checkout-logger', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def submit(self, log, transaction_rows=None):
+        # log is (transaction_id, recommended_items, purchased_items)
+        if self._closed:
+            raise RuntimeError("Checkout logger is closed.")
+        self.start()
+        self.pending.put((log, transaction_rows))
+        with self._lock:
+            self.stats['submitted'] += 1
+            self.stats['max_pending'] = max(self.stats['max_pending'], self.pending.qsize())
+
+    def run(self):
+        self.retry_spilled()
+        while True:
+            # Wake up for the next retry of the spilled checkouts while the till is idle
+            try:
+                entry = self.pending.get(timeout=self.retry_interval if self.spilled_entries() else None)
+            except queue.Empty:
+                self.retry_spilled()
+                continue
+            if entry is self._stop:
+                self.pending.task_done()
+                return
+
+            # Group commit: whatever else arrives within flush_interval, up to batch_size checkouts
+            batch = [entry]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = self.pending.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if entry is self._stop:
+                    stop = True
+                    break
+                batch.append(entry)
+
+            self.write_batch(batch)
+            if time.monotonic() >= self.next_retry:
+                self.retry_spilled()
+            if self.on_idle is not None and self.pending.empty():
+                try:
+                    self.on_idle()
+                except Exception as e:
+                    print(f"Error in the checkout logger's idle work: {e}")
+            for _ in batch:
+                self.pending.task_done()
+            if stop:
+                self.pending.task_done()
+                return
+
+    def attempt(self, write, items, what):
+        # write(items) with retries, True once it succeeded
+        for attempt in range(self.retries):
+            try:
+                if write(items) is not False:
+                    return True
+            except Exception as e:
+                print(f"Error writing {what}: {e}")
+            if attempt + 1 < self.retries:
+                time.sleep(0.1 * (attempt + 1))
+        return False
+
+    def commit(self, batch):
+        # Save the logs of a batch of (log, transaction_rows) with retries, then append their sales rows.
+        # Returns the checkouts still to be written, with their log set to None once it is committed
+        logs = [log for log, _ in batch if log is not None]
+        if logs and not self.attempt(self.save_logs, logs, "checkout logs"):
+            return batch
+
+        rows = [row for _, transaction_rows in batch for row in transaction_rows or []]
+        if rows and self.write_transaction_rows is not None:
+            if not self.attempt(self.write_transaction_rows, rows, "sales rows"):
+                return [(None, transaction_rows) for _, transaction_rows in batch if transaction_rows]
+        return []
+
+    def write_batch(self, batch):
+        start = time.perf_counter()
+        remaining = self.commit(batch)
+        if remaining:
+            self.spill(remaining)
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            self.commit_seconds.append(seconds)
+            self.stats['batches'] += 1
+            self.stats['last_batch_size'] = len(batch)
+            self.stats['last_commit_seconds'] = seconds
+            self.stats['committed'] += len(batch) - len(remaining)
+            self.stats['failed'] += len(remaining)
+        if remaining:
+            print(f"Failed to log {len(remaining)} checkouts after {self.retries} attempts.")
+
+    def spilled_entries(self):
+        return self.spill_path is not None and os.path.exists(self.spill_path)
+
+    def spill(self, batch):
+        # Keep a failed batch on disk for retry_spilled, synced before the checkouts count as spilled
+        if self.spill_path is None:
+            return
+        try:
+            with open(self.spill_path, 'a', encoding='utf-8') as file:
+                file.write(spill_lines(batch))
+                file.flush()
+                os.fsync(file.fileno())
+        except OSError as e:
+            print(f"Error spilling checkout logs to {self.spill_path}: {e}")
+            return
+        with self._lock:
+            self.stats['spilled'] += len(batch)
+        self.next_retry = time.monotonic() + self.retry_interval
+
+    def retry_spilled(self):
+        # Commit the spilled checkouts in batches, the ones that still fail stay in the file
+        if not self.spilled_entries():
+            return
+        self.next_retry = time.monotonic() + self.retry_interval
+        try:
+            batch = []
+            with open(self.spill_path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line torn by a crash while spilling
+                        print(f"Skipping an unreadable line of {self.spill_path}.")
+                        continue
+                    batch.append((tuple(entry['log']) if entry['log'] is not None else None, entry['rows']))
+
+            remaining = []
+            for start in range(0, len(batch), self.batch_size):
+                chunk = batch[start:start + self.batch_size]
+                if remaining:
+                    remaining.extend(chunk)
+                    continue
+                remaining = self.commit(chunk)
+                with self._lock:
+                    self.stats['recovered'] += len(chunk) - len(remaining)
+
+            if remaining:
+                write_durably(self.spill_path, spill_lines(remaining))
+            else:
+                os.remove(self.spill_path)
+        except OSError as e:
+            print(f"Error retrying the spilled checkouts: {e}")
+            return
+        if len(remaining) < len(batch):
+            print(f"Recovered {len(batch) - len(remaining)} spilled checkouts.")
+
+    def flush(self):
+        # Block until every submitted checkout has been written
+        if self._thread is not None:
+            self.pending.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self.pending.put(self._stop)
+            self._thread.join()
+            self._thread = None
+
+    def durability_stats(self):
+        with self._lock:
+            return dict(self.stats, pending=self.pending.qsize())
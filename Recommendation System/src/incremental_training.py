@@ -0,0 +1,238 @@
+from bisect import bisect_right
+from collections import Counter
+from itertools import combinations, groupby
+import json
+from operator import itemgetter
+import pandas as pd
+from src.recommendation import get_db_connection
+from src.training import save_relevant_rules_to_db
+
+
+def itemset_key(itemset):
+    # Itemsets are stored as a JSON list of sorted item ids
+    return json.dumps(sorted(itemset))
+
+
+def next_candidates(frequent):
+    # Apriori join: itemsets one item larger than the frequent ones whose subsets are all frequent
+    frequent = set(frequent)
+    by_prefix = {}
+    for itemset in sorted(frequent):
+        by_prefix.setdefault(itemset[:-1], []).append(itemset[-1])
+    for prefix, last_items in by_prefix.items():
+        for first, second in combinations(last_items, 2):
+            candidate = prefix + (first, second)
+            if all(candidate[:index] + candidate[index + 1:] in frequent for index in range(len(prefix))):
+                yield candidate
+
+
+class IncrementalTrainer:
+    """
+    Incremental association rule training.
+
+    Exact counts are persisted in itemset_counts for the Apriori candidates only: every single
+    item, and each larger itemset whose subsets one item smaller are all frequent. A training run
+    counts the baskets added since the last run (high-water mark on transactions.transaction_id)
+    against the stored candidates and recomputes the frequent itemsets level by level. Candidates
+    that no longer qualify are deleted, so the table follows the frequent itemsets instead of every
+    combination ever bought.
+
+    Itemsets that just became candidates have no count yet and are counted over the whole history.
+    Up to indexed_count_limit of them per level are counted through the transaction_items item
+    index, which reads only the baskets holding their items; more than that (the first run, or a
+    large shift in what sells) costs one scan of every stored basket. In the worst case, a run that
+    promotes itemsets of frequent items, the cost therefore still grows with the history and not
+    only with the new transactions.
+
+    Like fpgrowth in model_training, itemsets of any size are mined by default. A max_len caps
+    the itemset size, the rules then miss the longer itemsets model_training would find.
+    """
+
+    def __init__(self, min_support=0.009, lift_threshold=1, confidence_threshold=0.1, max_len=None,
+                 indexed_count_limit=64):
+        self.min_support = min_support
+        self.lift_threshold = lift_threshold
+        self.confidence_threshold = confidence_threshold
+        self.max_len = max_len
+        self.indexed_count_limit = indexed_count_limit
+
+    def get_state(self, cursor, key):
+        cursor.execute('SELECT value FROM training_state WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def set_state(self, cursor, key, value):
+        cursor.execute('INSERT OR REPLACE INTO training_state (key, value) VALUES (?, ?)', (key, value))
+
+    def reset(self, cursor):
+        # Forget all counts, the next run recounts the transactions table from the start
+        cursor.execute('DELETE FROM itemset_counts')
+        cursor.execute('DELETE FROM training_state')
+
+    def read_baskets(self, cursor, after, last):
+        # Item ids of the baskets in (after, last], streamed in transaction order. Empty baskets
+        # only count towards the total and are not returned
+        cursor.execute('SELECT transaction_id, item_id FROM transaction_items WHERE transaction_id > ? '
+                       'AND transaction_id <= ? ORDER BY transaction_id', (after, last))
+        return ([item_id for _, item_id in rows] for _, rows in groupby(cursor, key=itemgetter(0)))
+
+    def count_itemsets(self, baskets, candidates, counted=None):
+        """
+        Occurrences of every single item and of the candidate itemsets in baskets, restricted to
+        the itemsets in counted when given. Itemsets are grown one item at a time from those
+        already found in the basket, so a basket is never expanded into all of its combinations.
+        """
+        counts = Counter()
+        for basket in baskets:
+            items = sorted(set(basket))
+            found = [(item,) for item in items]
+            while found:
+                counts.update(found if counted is None else [itemset for itemset in found if itemset in counted])
+                if self.max_len and len(found[0]) >= self.max_len:
+                    break
+                found = [itemset + (item,) for itemset in found
+                         for item in items[bisect_right(items, itemset[-1]):]
+                         if itemset + (item,) in candidates]
+        return counts
+
+    def count_history(self, cursor, candidates, missing, last):
+        # Occurrences of the new candidates in the baskets up to last, see the class docstring
+        if len(missing) > self.indexed_count_limit:
+            return self.count_itemsets(self.read_baskets(cursor, 0, last), candidates, counted=missing)
+        counts = Counter()
+        for itemset in missing:
+            cursor.execute(f'''
+                SELECT COUNT(*) FROM (
+                    SELECT transaction_id FROM transaction_items
+                    WHERE item_id IN ({', '.join('?' * len(itemset))}) AND transaction_id <= ?
+                    GROUP BY transaction_id HAVING COUNT(DISTINCT item_id) = ?
+                )''', (*itemset, last, len(itemset)))
+            counts[itemset] = cursor.fetchone()[0]
+        return counts
+
+    def update_counts(self):
+        # Fold the transactions added since the last run into the stored counts
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        try:
+            last_transaction_id = self.get_state(cursor, 'last_transaction_id')
+            transaction_count = self.get_state(cursor, 'transaction_count')
+
+            # The transactions table was cleared and refilled behind our back, start over
+            cursor.execute('SELECT COALESCE(MAX(transaction_id), 0) FROM transactions')
+            if cursor.fetchone()[0] < last_transaction_id:
+                self.reset(cursor)
+                last_transaction_id = transaction_count = 0
+
+            cursor.execute('SELECT COUNT(*), MAX(transaction_id) FROM transactions WHERE transaction_id > ?',
+                           (last_transaction_id,))
+            new_count, new_last_transaction_id = cursor.fetchone()
+            if not new_count:
+                conn.commit()
+                return 0
+
+            cursor.execute('SELECT itemset, count FROM itemset_counts')
+            stored = {tuple(json.loads(itemset)): count for itemset, count in cursor}
+            counts = Counter(stored)
+            counts.update(self.count_itemsets(
+                self.read_baskets(cursor, last_transaction_id, new_last_transaction_id), stored))
+            changed = set(counts) - set(stored) | {itemset for itemset in stored if counts[itemset] != stored[itemset]}
+
+            # Rebuild the candidates level by level against the new total. Each level is joined from
+            # the frequent itemsets of the previous one, its new members are counted over the history
+            transaction_count += new_count
+            minimum = self.min_support * transaction_count
+            candidates = {itemset for itemset in counts if len(itemset) == 1}
+            frequent = [itemset for itemset in candidates if counts[itemset] >= minimum]
+            while frequent and not (self.max_len and len(frequent[0]) >= self.max_len):
+                level = set(next_candidates(frequent))
+                candidates |= level
+                missing = level - set(counts)
+                if missing:
+                    counts.update(self.count_history(cursor, candidates, missing, new_last_transaction_id))
+                    changed |= missing
+                frequent = [itemset for itemset in level if counts[itemset] >= minimum]
+
+            cursor.executemany('DELETE FROM itemset_counts WHERE itemset = ?',
+                               ((itemset_key(itemset),) for itemset in set(stored) - candidates))
+            cursor.executemany('INSERT OR REPLACE INTO itemset_counts (itemset, size, count) VALUES (?, ?, ?)',
+                               ((itemset_key(itemset), len(itemset), counts[itemset])
+                                for itemset in changed & candidates))
+
+            self.set_state(cursor, 'last_transaction_id', new_last_transaction_id)
+            self.set_state(cursor, 'transaction_count', transaction_count)
+            conn.commit()
+            print(f"Counted {new_count} new transactions, {len(candidates)} candidate itemsets.")
+            return new_count
+
+        except Exception as e:
+            conn.rollback()
+            print(f"Error updating itemset counts: {e}")
+            raise e
+
+        finally:
+            cursor.close()
+            conn.close()
+
+    def load_frequent_itemsets(self):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        try:
+            transaction_count = self.get_state(cursor, 'transaction_count')
+            if transaction_count == 0:
+                return {}, {}, 0
+
+            cursor.execute('SELECT itemset, count FROM itemset_counts WHERE count >= ?',
+                           (self.min_support * transaction_count,))
+            supports = {frozenset(json.loads(itemset)): count / transaction_count for itemset, count in cursor}
+
+            cursor.execute('SELECT item_id, name FROM items')
+            item_names = dict(cursor.fetchall())
+            return supports, item_names, transaction_count
+
+        finally:
+            cursor.close()
+            conn.close()
+
+    def generate_rules(self, supports):
+        # Same metrics as mlxtend association_rules(metric="lift", min_threshold=1)
+        rules = []
+        for itemset, support in supports.items():
+            if len(itemset) < 2:
+                continue
+            for size in range(1, len(itemset)):
+                for antecedents in combinations(sorted(itemset), size):
+                    antecedents = frozenset(antecedents)
+                    consequents = itemset - antecedents
+                    antecedent_support = supports[antecedents]
+                    consequent_support = supports[consequents]
+                    confidence = support / antecedent_support
+                    lift = confidence / consequent_support
+                    if lift < 1:
+                        continue
+                    rules.append({
+                        'antecedents': antecedents,
+                        'consequents': consequents,
+                        'support': support,
+                        'confidence': confidence,
+                        'lift': lift,
+                        'leverage': support - antecedent_support * consequent_support
+                    })
+
+        columns = ['antecedents', 'consequents', 'support', 'confidence', 'lift', 'leverage']
+        return pd.DataFrame(rules, columns=columns).sort_values('lift', ascending=False).reset_index(drop=True)
+
+    def train(self):
+        self.update_counts()
+
+        supports, item_names, transaction_count = self.load_frequent_itemsets()
+        if transaction_count == 0:
+            raise ValueError("No transaction data available for model training.")
+
+        assoc_rules = self.generate_rules(supports)
+        relevant_rules = assoc_rules[(assoc_rules['lift'] > self.lift_threshold) &
+                                     (assoc_rules['confidence'] > self.confidence_threshold)]
+        save_relevant_rules_to_db(relevant_rules, item_names)
+        return relevant_rules
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+import threading
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache with hit, miss and eviction counters.
+
+    Entries belong to an owner (the rule store they were computed from): bind() drops them all as
+    soon as a different owner is bound, so results of an old rule set are never served.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.owner = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def bind(self, owner):
+        with self._lock:
+            if owner is not self.owner:
+                if self.entries:
+                    self.invalidations += 1
+                self.entries.clear()
+                self.owner = owner
+
+    def get(self, key):
+        with self._lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+    def put(self, key, value, owner=None):
+        with self._lock:
+            # A value computed from a store that has been swapped out meanwhile is not kept
+            if owner is not None and owner is not self.owner:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
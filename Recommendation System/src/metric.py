@@ -1,7 +1,38 @@
-import sqlite3
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from src.recommendation import get_db_connection
+from src.metrics_counters import METRICS_MAX_K, PER_LOG_METRICS, load_counters
+
+class MetricsSnapshot:
+    """
+    Every figure of the Metrics page, computed once and shared by the text view, the warnings and
+    the graphs. The per-log Precision@K / Recall@K series is only fetched when a graph asks for it.
+    """
+
+    def __init__(self, calculator, anonymized_percentage, transparency_percentage, aggregated_metrics,
+                 coverage_rate, log_count):
+        self.calculator = calculator
+        self.anonymized_percentage = anonymized_percentage
+        self.transparency_percentage = transparency_percentage
+        self.aggregated_metrics = aggregated_metrics
+        self.coverage_rate = coverage_rate
+        self.log_count = log_count
+        self._ranked_metrics = None
+
+    @property
+    def ranked_metrics(self):
+        if self._ranked_metrics is None:
+            self._ranked_metrics = self.calculator.load_ranked_metrics()
+        return self._ranked_metrics
+
+    def as_dict(self):
+        return {
+            "anonymized_percentage": self.anonymized_percentage,
+            "transparency_percentage": self.transparency_percentage,
+            "aggregated_metrics": self.aggregated_metrics,
+            "coverage_rate": self.coverage_rate
+        }
+
 
 class MetricsCalculator:
     def __init__(self, precision_threshold=0.5, recall_threshold=0.5, anonymization_threshold=90.0,
@@ -12,14 +43,109 @@ class MetricsCalculator:
         self.transparency_threshold = transparency_threshold
         self.coverage_threshold = coverage_threshold
 
+    def take_snapshot(self):
+        # Log figures come from the running counters in metrics_counters, so the cost does not grow
+        # with the log tables. Only the active rule set is aggregated, in the same read transaction
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('BEGIN')
+            counters = load_counters(cursor)
+            anonymization_total = counters.get('anonymization_total', 0)
+            anonymization_success = counters.get('anonymization_success', 0)
+
+            # A rule explains itself when confidence, lift and support are all set and non-zero
+            cursor.execute('''
+                SELECT COUNT(*),
+                       COALESCE(SUM(COALESCE(confidence, 0) != 0 AND COALESCE(lift, 0) != 0 AND COALESCE(support, 0) != 0), 0)
+                FROM association_rules
+                WHERE version = (SELECT version FROM active_model WHERE id = 1)
+            ''')
+            rule_total, rule_explained = cursor.fetchone()
+            conn.commit()
+
+            # Precision@K histogram: one precision:<hits>:<k> counter per distinct value
+            log_count = precision_sum = meeting_threshold = with_recommendations = 0
+            for name, count in counters.items():
+                if not name.startswith('precision:'):
+                    continue
+                hits, k = map(int, name.split(':')[1:])
+                precision = hits / k if k > 0 else 0.0
+                log_count += count
+                precision_sum += precision * count
+                if precision >= self.precision_threshold:
+                    meeting_threshold += count
+                if k > 0:
+                    with_recommendations += count
+            recall_sum = counters.get('recall_sum', 0.0)
+
+        except Exception as e:
+            print(f"Error taking the metrics snapshot: {e}")
+            anonymization_total = rule_total = log_count = 0
+        finally:
+            conn.close()
+
+        if log_count:
+            aggregated_metrics = {
+                'Average Precision@K': precision_sum / log_count,
+                'Average Recall@K': recall_sum / log_count,
+                'Percentage Meeting Precision@K Threshold': meeting_threshold / log_count * 100
+            }
+            coverage_rate = with_recommendations / log_count * 100
+        else:
+            print("No recommendation logs found.")
+            aggregated_metrics = {'Average Precision@K': 0.0, 'Average Recall@K': 0.0,
+                                  'Percentage Meeting Precision@K Threshold': 0.0}
+            coverage_rate = 0.0
+
+        return MetricsSnapshot(
+            self,
+            anonymized_percentage=anonymization_success / anonymization_total * 100 if anonymization_total else 0.0,
+            transparency_percentage=rule_explained / rule_total * 100 if rule_total else 0.0,
+            aggregated_metrics=aggregated_metrics,
+            coverage_rate=coverage_rate,
+            log_count=log_count
+        )
+
+    def load_ranked_metrics(self, max_k=METRICS_MAX_K):
+        # Precision@K and Recall@K of every log in log order, the same frame calculate_ranked_metrics returns
+        conn = get_db_connection()
+
+        try:
+            rows = conn.execute(PER_LOG_METRICS + '''
+                SELECT COALESCE(scores.precision_k, 0.0), COALESCE(scores.recall_k, 0.0)
+                FROM recommendation_logs AS logs
+                LEFT JOIN scores ON scores.log_id = logs.log_id
+                ORDER BY logs.log_id
+            ''', {'max_k': max_k}).fetchall()
+            return pd.DataFrame(rows, columns=['Precision@K', 'Recall@K'])
+        except Exception as e:
+            print(f"Error calculating ranked metrics: {e}")
+            return pd.DataFrame()
+        finally:
+            conn.close()
+
     def load_recommendation_logs(self):
         conn = get_db_connection()
         cursor = conn.cursor()
 
         try:
-            cursor.execute('SELECT transaction_id, recommended_items, purchased_items FROM recommendation_logs')
+            # Recommended and purchased items are read as lists of item ids, in their logged order
+            cursor.execute('SELECT log_id, transaction_id FROM recommendation_logs ORDER BY log_id')
             logs = cursor.fetchall()
-            df = pd.DataFrame(logs, columns=['transaction_id', 'recommended_items', 'purchased_items'])
+            items = {(log_id, role): [] for log_id, _ in logs for role in ('recommended', 'purchased')}
+
+            cursor.execute('SELECT log_id, role, item_id FROM recommendation_log_items ORDER BY log_id, role, position')
+            for log_id, role, item_id in cursor:
+                if (log_id, role) in items:
+                    items[(log_id, role)].append(item_id)
+
+            df = pd.DataFrame({
+                'transaction_id': [transaction_id for _, transaction_id in logs],
+                'recommended_items': [items[(log_id, 'recommended')] for log_id, _ in logs],
+                'purchased_items': [items[(log_id, 'purchased')] for log_id, _ in logs]
+            }, columns=['transaction_id', 'recommended_items', 'purchased_items'])
             return df
         except Exception as e:
             print(f"Error loading recommendation logs from the database: {e}")
@@ -51,7 +177,8 @@ class MetricsCalculator:
         cursor = conn.cursor()
 
         try:
-            cursor.execute('SELECT confidence, lift, support FROM association_rules')
+            cursor.execute('SELECT confidence, lift, support FROM association_rules '
+                           'WHERE version = (SELECT version FROM active_model WHERE id = 1)')
             rules = cursor.fetchall()
 
             total_recommendations = len(rules)
@@ -66,47 +193,68 @@ class MetricsCalculator:
         finally:
             conn.close()
 
-    def calculate_ranked_metrics(self, log_df, max_k=5):
+    def explode_items(self, items):
+        # Long (row, position, item) arrays of a column holding item lists or ', ' joined strings.
+        # Also returns the mask of the rows that hold no items at all (NaN)
+        missing = items.map(lambda value: not isinstance(value, list) and pd.isna(value)).to_numpy(dtype=bool)
+        lists = items.map(lambda value: value if isinstance(value, list) else
+                          [] if pd.isna(value) else [item.strip() for item in value.split(',')])
+        lengths = lists.map(len).to_numpy(dtype=np.int64)
+        rows = np.repeat(np.arange(len(items)), lengths)
+        positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        values = [item for values in lists for item in values]
+        return rows, positions, values, lengths, missing
+
+    def calculate_ranked_metrics(self, log_df, max_k=5, k_values=()):
+        """
+        Precision@K and Recall@K of every log, where K is min(max_k, number of recommendations).
+        For every k in k_values the frame also gets Precision@k / Recall@k columns.
+
+        Recommended and purchased items are exploded into integer-coded long arrays once; the hits
+        of every row and K then come from a membership test and a bincount instead of per-row sets.
+        """
         if log_df.empty:
             print("No recommendation logs found.")
             return pd.DataFrame()
 
         try:
-            def precision_at_k(recommended_items, purchased_items, k):
-                recommended_at_k = recommended_items[:k]
-                relevant_items = set(recommended_at_k).intersection(set(purchased_items))
-                return len(relevant_items) / k if k > 0 else 0.0
-
-            def recall_at_k(recommended_items, purchased_items, k):
-                recommended_at_k = recommended_items[:k]
-                relevant_items = set(recommended_at_k).intersection(set(purchased_items))
-                return len(relevant_items) / len(purchased_items) if len(purchased_items) > 0 else 0.0
-
-            precision_k_list = []
-            recall_k_list = []
-
-            for _, row in log_df.iterrows():
-                recommended_items_str = row['recommended_items']
-                purchased_items_str = row['purchased_items']
-                
-                if pd.isna(recommended_items_str) or pd.isna(purchased_items_str):
-                    precision_k_list.append(0)
-                    recall_k_list.append(0)
-                    continue
-                
-                recommended_items = [item.strip() for item in recommended_items_str.split(',')]
-                purchased_items = [item.strip() for item in purchased_items_str.split(',')]
-                k = min(max_k, len(recommended_items))
-
-                precision_k = precision_at_k(recommended_items, purchased_items, k)
-                recall_k = recall_at_k(recommended_items, purchased_items, k)
-                precision_k_list.append(precision_k)
-                recall_k_list.append(recall_k)
-
-            return pd.DataFrame({
-                'Precision@K': precision_k_list,
-                'Recall@K': recall_k_list
-            })
+            row_count = len(log_df)
+            recommended_rows, positions, recommended, recommended_lengths, recommended_missing = \
+                self.explode_items(log_df['recommended_items'].reset_index(drop=True))
+            purchased_rows, _, purchased, purchased_lengths, purchased_missing = \
+                self.explode_items(log_df['purchased_items'].reset_index(drop=True))
+
+            # One integer code per distinct item across both columns
+            codes, uniques = pd.factorize(pd.Series(recommended + purchased, dtype=object))
+            recommended_codes = codes[:len(recommended)].astype(np.int64)
+            purchased_codes = codes[len(recommended):].astype(np.int64)
+            code_count = max(len(uniques), 1)
+
+            # First position of every distinct recommended item of a row, and whether the row purchased it
+            recommended_keys = recommended_rows * code_count + recommended_codes
+            order = np.lexsort((positions, recommended_keys))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = recommended_keys[order][1:] != recommended_keys[order][:-1]
+            first_keys = recommended_keys[order][first]
+            first_positions = positions[order][first]
+            first_rows = recommended_rows[order][first]
+            purchased_match = np.isin(first_keys, purchased_rows * code_count + purchased_codes)
+
+            valid = ~(recommended_missing | purchased_missing)
+
+            def ranked(k_limit):
+                k = np.minimum(k_limit, recommended_lengths)
+                hit = purchased_match & (first_positions < k_limit)
+                hits = np.bincount(first_rows[hit], minlength=row_count).astype(np.float64)
+                precision = np.divide(hits, k, out=np.zeros(row_count), where=(k > 0) & valid)
+                recall = np.divide(hits, purchased_lengths, out=np.zeros(row_count), where=(purchased_lengths > 0) & valid)
+                return precision, recall
+
+            precision_k, recall_k = ranked(max_k)
+            metrics = {'Precision@K': precision_k, 'Recall@K': recall_k}
+            for k_limit in k_values:
+                metrics[f'Precision@{k_limit}'], metrics[f'Recall@{k_limit}'] = ranked(k_limit)
+            return pd.DataFrame(metrics)
         except Exception as e:
             print(f"Error calculating ranked metrics: {e}")
             return pd.DataFrame()
@@ -147,8 +295,9 @@ class MetricsCalculator:
                 return 0.0
 
             total_purchased_transactions = log_df['purchased_items'].dropna().count()
-            recommended_for_purchases_transactions = log_df[~log_df['recommended_items'].isna() & 
-                                                            (log_df['recommended_items'].str.strip() != '')].count()['purchased_items']
+            has_recommendations = log_df['recommended_items'].map(
+                lambda items: len(items) > 0 if isinstance(items, list) else pd.notna(items) and items.strip() != '')
+            recommended_for_purchases_transactions = log_df[has_recommendations].count()['purchased_items']
 
             if total_purchased_transactions == 0:
                 return 0.0
@@ -161,14 +310,14 @@ class MetricsCalculator:
             print(f"An unexpected error occurred while calculating purchase recommendation coverage: {e}")
             return 0.0
 
-    def get_warnings(self):
-        anonymized_percentage = self.calculate_anonymized_percentage()
-        transparency_percentage = self.calculate_transparency_percentage()
-        log_df = self.load_recommendation_logs()
-
-        ranked_metrics_df = self.calculate_ranked_metrics(log_df)
-        aggregated_metrics = self.calculate_aggregated_metrics(ranked_metrics_df)
-        coverage_rate = self.calculate_purchase_recommendation_coverage(log_df)
+    def get_warnings(self, snapshot=None):
+        # Reuse the snapshot the Metrics page was drawn from instead of recomputing every figure
+        if snapshot is None:
+            snapshot = self.take_snapshot()
+        anonymized_percentage = snapshot.anonymized_percentage
+        transparency_percentage = snapshot.transparency_percentage
+        aggregated_metrics = snapshot.aggregated_metrics
+        coverage_rate = snapshot.coverage_rate
 
         warnings = []
         if aggregated_metrics.get('Average Precision@K', 0.0) < self.precision_threshold:
@@ -184,19 +333,23 @@ class MetricsCalculator:
         
         return warnings
 
-    def show_metrics_graph(self):
+    def show_metrics_graph(self, snapshot=None):
+        # matplotlib is only loaded once a graph is drawn
+        import matplotlib.pyplot as plt
+
         try:
-            log_df = self.load_recommendation_logs()
-            ranked_metrics_df = self.calculate_ranked_metrics(log_df)
+            if snapshot is None:
+                snapshot = self.take_snapshot()
+            ranked_metrics_df = snapshot.ranked_metrics
 
             if ranked_metrics_df.empty:
                 print("Error: Ranked metrics DataFrame is empty.")
                 return
 
-            aggregated_metrics = self.calculate_aggregated_metrics(ranked_metrics_df)
-            anonymized_percentage = self.calculate_anonymized_percentage()
-            transparency_percentage = self.calculate_transparency_percentage()
-            coverage_rate = self.calculate_purchase_recommendation_coverage(log_df)
+            aggregated_metrics = snapshot.aggregated_metrics
+            anonymized_percentage = snapshot.anonymized_percentage
+            transparency_percentage = snapshot.transparency_percentage
+            coverage_rate = snapshot.coverage_rate
 
             fig, axs = plt.subplots(2, 2, figsize=(16, 8))
 
@@ -0,0 +1,127 @@
+from collections import Counter
+
+# Number of recommendations Precision@K / Recall@K look at, as in MetricsCalculator.calculate_ranked_metrics
+METRICS_MAX_K = 5
+
+# Precision@K and Recall@K inputs per log in one pass over recommendation_log_items: k (recommended
+# items considered), the number of purchased items and the purchased items among the top k recommended.
+# Logs without any items do not appear and count as 0 / 0
+PER_LOG_METRICS = '''
+    WITH log_items AS (
+        SELECT log_id, item_id,
+               SUM(role = 'recommended') AS recommended,
+               MAX(role = 'recommended' AND position < :max_k) AS top_recommended,
+               SUM(role = 'purchased') AS purchased
+        FROM recommendation_log_items
+        GROUP BY log_id, item_id
+    ),
+    per_log AS (
+        SELECT log_id,
+               MIN(SUM(recommended), :max_k) AS k,
+               SUM(purchased) AS purchased,
+               SUM(top_recommended AND purchased > 0) AS hits
+        FROM log_items
+        GROUP BY log_id
+    ),
+    scores AS (
+        SELECT log_id, k, hits,
+               CASE WHEN k > 0 THEN hits * 1.0 / k ELSE 0.0 END AS precision_k,
+               CASE WHEN purchased > 0 THEN hits * 1.0 / purchased ELSE 0.0 END AS recall_k
+        FROM per_log
+    )
+'''
+
+# Counters kept in metrics_counters:
+#   precision:<hits>:<k>   logs whose Precision@K is hits / k (k = 0 for logs without recommendations)
+#   recall_sum             sum of Recall@K over all logs
+#   anonymization_total    rows of anonymization_logs
+#   anonymization_success  rows of anonymization_logs with Status 'Success'
+# Precision is kept as a histogram so that any precision threshold can be evaluated from the counters
+
+
+def precision_counter(hits, k):
+    return f"precision:{hits}:{k}"
+
+
+def log_counters(recommended_items, purchased_items, max_k=METRICS_MAX_K):
+    # Counter deltas of one recommendation log
+    recommended_items = list(recommended_items or [])
+    purchased_items = list(purchased_items or [])
+    k = min(max_k, len(recommended_items))
+    hits = len(set(recommended_items[:k]) & set(purchased_items))
+    return Counter({
+        precision_counter(hits, k): 1,
+        'recall_sum': hits / len(purchased_items) if purchased_items else 0.0
+    })
+
+
+def anonymization_counters(count, status='Success'):
+    return Counter({'anonymization_total': count, 'anonymization_success': count if status == 'Success' else 0})
+
+
+def add_counters(cursor, deltas):
+    # Add the deltas inside the caller's transaction, so the counters commit or roll back with the rows
+    cursor.executemany('''
+        INSERT INTO metrics_counters (name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+    ''', [(name, value) for name, value in deltas.items() if value])
+
+
+def reset_counters(cursor, names):
+    cursor.executemany('DELETE FROM metrics_counters WHERE name = ?', ((name,) for name in names))
+
+
+def load_counters(cursor):
+    cursor.execute('SELECT name, value FROM metrics_counters')
+    return dict(cursor.fetchall())
+
+
+def rebuild_counters(cursor, max_k=METRICS_MAX_K):
+    # Recompute every counter from the log tables, e.g. to backfill databases written before the counters
+    cursor.execute('DELETE FROM metrics_counters')
+
+    cursor.execute('SELECT COUNT(*) FROM recommendation_logs')
+    log_count = cursor.fetchone()[0]
+    cursor.execute(PER_LOG_METRICS + '''
+        SELECT hits, k, COUNT(*), SUM(recall_k) FROM scores GROUP BY hits, k
+    ''', {'max_k': max_k})
+
+    deltas = Counter()
+    logged = 0
+    for hits, k, count, recall_sum in cursor.fetchall():
+        deltas[precision_counter(hits, k)] += count
+        deltas['recall_sum'] += recall_sum
+        logged += count
+    # Logs without any items have neither recommendations nor purchases
+    deltas[precision_counter(0, 0)] += log_count - logged
+
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(Status = 'Success'), 0) FROM anonymization_logs")
+    total, success = cursor.fetchone()
+    deltas.update({'anonymization_total': total, 'anonymization_success': success})
+
+    add_counters(cursor, deltas)
+    return deltas
+
+
+def rebuild_metrics_counters():
+    from src.recommendation import get_db_connection
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        deltas = rebuild_counters(cursor)
+        conn.commit()
+        print(f"Rebuilt metrics counters from {sum(value for name, value in deltas.items() if name.startswith('precision:'))} "
+              f"recommendation logs and {deltas['anonymization_total']} anonymization logs.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Error rebuilding metrics counters: {e}")
+        raise e
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    # Backfill: python -m src.metrics_counters, run from the "Recommendation System" folder
+    rebuild_metrics_counters()
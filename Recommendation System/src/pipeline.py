@@ -1,44 +1,103 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import pandas as pd
+import multiprocessing
+import os
+import queue
+import threading
+import time
 from src.recommendation import get_db_connection
+from src.storage import insert_item_rows
+from src.metrics_counters import add_counters, anonymization_counters, log_counters
+from src.sales_log import SalesLog
+
+# Overrides the number of ingest worker processes, 0 keeps the serial path
+INGEST_WORKERS_ENV = 'RECOMMENDATION_INGEST_WORKERS'
+
+
+def prepare_chunk(chunk):
+    # Worker process stage: anonymize, clean and group one chunk
+    start = time.perf_counter()
+    pipeline = TransactionPipeline()
+    product_lists = pipeline.group_transactions(pipeline.anonymize_data(chunk))
+    return product_lists, len(chunk), time.perf_counter() - start
+
+
+def default_ingest_workers():
+    # Worker processes for process_new_data: the environment variable wins, otherwise one per core
+    # up to 4, leaving a core to the writer thread and the UI. One or two cores stay serial
+    value = os.environ.get(INGEST_WORKERS_ENV)
+    if value:
+        return max(0, int(value))
+    cpus = os.cpu_count() or 1
+    return min(4, cpus - 1) if cpus > 2 else 0
+
 
 class TransactionPipeline:
-    def __init__(self, retail_data_file='./data/retail-data.csv', chunk_size=10000):
+    def __init__(self, retail_data_file='./data/retail-data.csv', chunk_size=10000, bulk=True, workers=0,
+                 max_pending_chunks=None):
         self.retail_data_file = retail_data_file
         self.chunk_size = chunk_size 
+        # Bulk mode groups each chunk vectorized and writes it with executemany in one transaction
+        self.bulk = bulk
+        # With workers > 0 process_new_data runs as a reader -> process pool -> writer pipeline
+        self.workers = workers
+        self.max_pending_chunks = max_pending_chunks or max(2, 2 * workers)
+        self.stats = {}
         
     def save_log(self, transaction_id, recommended_items, purchased_items):
+        return self.save_logs([(transaction_id, recommended_items, purchased_items)])
+
+    def save_logs(self, logs):
+        # Write (transaction_id, recommended_items, purchased_items) checkout logs in one transaction,
+        # so a batch of checkouts costs a single commit
         conn = get_db_connection()
         cursor = conn.cursor()
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        recommended_str = ', '.join(recommended_items) if recommended_items else ''
-        purchased_str = ', '.join(purchased_items) if purchased_items else '' 
+        counters = anonymization_counters(len(logs))
 
         try:
-            # Insert into recommendation_logs with transaction_id
-            cursor.execute('''
-                INSERT INTO recommendation_logs (transaction_id, recommended_items, purchased_items, timestamp)
-                VALUES (?, ?, ?, ?)
-            ''', (transaction_id, recommended_str, purchased_str, timestamp))
-
-            # Insert into transactions table
-            cursor.execute('''
-                INSERT INTO transactions (products, datetime)
-                VALUES (?, ?)
-            ''', (purchased_str, timestamp))
-
-            # Insert into anonymization_logs table
-            cursor.execute('''
-                INSERT INTO anonymization_logs (Anonymization_Timestamp, Status)
-                VALUES (?, ?)
-            ''', (timestamp, 'Success'))
+            for transaction_id, recommended_items, purchased_items in logs:
+                recommended_str = ', '.join(recommended_items) if recommended_items else ''
+                purchased_str = ', '.join(purchased_items) if purchased_items else ''
+
+                # Insert into recommendation_logs with transaction_id
+                cursor.execute('''
+                    INSERT INTO recommendation_logs (transaction_id, recommended_items, purchased_items, timestamp)
+                    VALUES (?, ?, ?, ?)
+                ''', (transaction_id, recommended_str, purchased_str, timestamp))
+                log_id = cursor.lastrowid
+
+                # Insert into transactions table
+                cursor.execute('''
+                    INSERT INTO transactions (products, datetime)
+                    VALUES (?, ?)
+                ''', (purchased_str, timestamp))
+                stored_transaction_id = cursor.lastrowid
 
+                # Item ids of the log and the basket, so readers never split the text columns
+                insert_item_rows(cursor, 'recommendation_log_items', 'log_id', [
+                    (log_id, 'recommended', list(recommended_items or [])),
+                    (log_id, 'purchased', list(purchased_items or []))
+                ])
+                insert_item_rows(cursor, 'transaction_items', 'transaction_id',
+                                 [(stored_transaction_id, None, list(purchased_items or []))])
+
+                # Insert into anonymization_logs table
+                cursor.execute('''
+                    INSERT INTO anonymization_logs (Anonymization_Timestamp, Status)
+                    VALUES (?, ?)
+                ''', (timestamp, 'Success'))
+                counters.update(log_counters(recommended_items, purchased_items))
+
+            # Running metrics counters commit together with the logs
+            add_counters(cursor, counters)
             conn.commit()
-            print("Log saved successfully.")
+            print("Log saved successfully." if len(logs) == 1 else f"{len(logs)} logs saved successfully.")
+            return True
         except Exception as e:
             conn.rollback()
             print(f"Failed to save log: {str(e)}")
+            return False
         finally:
             conn.close()
 
@@ -52,20 +111,64 @@ class TransactionPipeline:
             INSERT INTO anonymization_logs (Transaction_ID, Anonymization_Timestamp, Status)
             VALUES (?, ?, ?)
         ''', log_entry)
+        add_counters(cursor, anonymization_counters(1, status))
     
+    def group_transactions(self, df):
+        # Product names of every transaction, NaN products are dropped like clean_data does
+        import pandas as pd
+
+        transaction_ids = pd.Index(df['Transaction_ID'].dropna().unique()).sort_values()
+        products = df[['Transaction_ID', 'Product_Name']].dropna()
+        grouped = products['Product_Name'].astype(str).groupby(products['Transaction_ID']).agg(list)
+        return [names if isinstance(names, list) else [] for names in grouped.reindex(transaction_ids)]
+
+    def write_transactions(self, cursor, product_lists, status="Success"):
+        # Insert transactions and their anonymization logs with executemany. The row ids are
+        # derived from the current AUTOINCREMENT sequence instead of asking for last_insert_rowid(),
+        # so the write lock is taken before the sequence is read: a checkout writing to transactions
+        # meanwhile waits instead of taking the same ids
+        if not cursor.connection.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'")
+        row = cursor.fetchone()
+        sequence = row[0] if row else 0
+        cursor.execute("SELECT COALESCE(MAX(transaction_id), 0) FROM transactions")
+        first_id = max(sequence, cursor.fetchone()[0]) + 1
+
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        transaction_ids = range(first_id, first_id + len(product_lists))
+
+        cursor.executemany('''
+            INSERT INTO transactions (transaction_id, products, datetime)
+            VALUES (?, ?, ?)
+        ''', ((transaction_id, ', '.join(names), timestamp)
+              for transaction_id, names in zip(transaction_ids, product_lists)))
+
+        insert_item_rows(cursor, 'transaction_items', 'transaction_id',
+                         [(transaction_id, None, names) for transaction_id, names in zip(transaction_ids, product_lists)])
+
+        cursor.executemany('''
+            INSERT INTO anonymization_logs (Transaction_ID, Anonymization_Timestamp, Status)
+            VALUES (?, ?, ?)
+        ''', ((transaction_id, timestamp, status) for transaction_id in transaction_ids))
+        add_counters(cursor, anonymization_counters(len(product_lists), status))
+
+        return len(product_lists)
+
     def save_anonymized_transactions(self, df):
+        if self.bulk:
+            return self.save_anonymized_transactions_bulk(df)
+
         # Saves anonymized transactions
         conn = get_db_connection()
         cursor = conn.cursor()
 
         try:
-            grouped_df = df.groupby('Transaction_ID').agg({
-                'Product_Name': lambda x: ', '.join(self.clean_data(x))
-            }).reset_index()
+            grouped_products = df.groupby('Transaction_ID')['Product_Name'].apply(self.clean_data)
 
             # Insert new transactions 
-            for _, row in grouped_df.iterrows():
-                product_names = row['Product_Name']
+            for product_list in grouped_products:
+                product_names = ', '.join(product_list)
                 transaction_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
                 # Insert the concatenated product names into the database
@@ -77,12 +180,31 @@ class TransactionPipeline:
                 # Get the last inserted transaction ID
                 cursor.execute("SELECT last_insert_rowid()")
                 last_transaction_id = cursor.fetchone()[0]
+                insert_item_rows(cursor, 'transaction_items', 'transaction_id',
+                                 [(last_transaction_id, None, product_list)])
 
                 # Log anonymization success for the transaction
                 self.log_anonymization(cursor, last_transaction_id, "Success")
 
             conn.commit()
-            print(f"Successfully processed {len(grouped_df)} transactions.")
+            print(f"Successfully processed {len(grouped_products)} transactions.")
+        except Exception as e:
+            conn.rollback()
+            print(f"Failed to insert transactions or logs: {e}")
+            raise e
+        finally:
+            cursor.close()
+            conn.close()
+
+    def save_anonymized_transactions_bulk(self, df):
+        # Saves a whole chunk of anonymized transactions in a single database transaction
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        try:
+            transaction_count = self.write_transactions(cursor, self.group_transactions(df))
+            conn.commit()
+            print(f"Successfully processed {transaction_count} transactions.")
         except Exception as e:
             conn.rollback()
             print(f"Failed to insert transactions or logs: {e}")
@@ -93,6 +215,8 @@ class TransactionPipeline:
 
     def clean_data(self, products):
         # Cleans product data by converting NaN to empty strings and removing empty values.
+        import pandas as pd
+
         return [str(product) for product in products if pd.notna(product)]
 
     def anonymize_data(self, df):
@@ -102,11 +226,14 @@ class TransactionPipeline:
         return df
 
     def process_new_data(self):
+        if self.workers and self.workers > 0:
+            return self.process_new_data_parallel()
+
         # Track the number of chunks processed
         chunk_count = 0
 
         # Read and process data in chunks
-        for chunk in pd.read_csv(self.retail_data_file, chunksize=self.chunk_size):
+        for chunk in SalesLog(self.retail_data_file).read_chunks(self.chunk_size):
             anonymized_chunk = self.anonymize_data(chunk)
             self.save_anonymized_transactions(anonymized_chunk)
             
@@ -115,3 +242,86 @@ class TransactionPipeline:
             print(f"Processed chunk {chunk_count}")
 
         print(f"Total chunks processed: {chunk_count}")
+
+    def process_new_data_parallel(self):
+        # Reader thread streams chunks into the process pool, the calling thread writes the
+        # grouped results in order. The bounded queue of pending chunks keeps the reader from
+        # running ahead of the database.
+        self.stats = {stage: {'chunks': 0, 'rows': 0, 'seconds': 0.0} for stage in ('read', 'process', 'write')}
+        pending = queue.Queue(maxsize=self.max_pending_chunks)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def read_chunks(executor):
+            try:
+                reader = SalesLog(self.retail_data_file).read_chunks(self.chunk_size)
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    chunk = next(reader, None)
+                    if chunk is None:
+                        break
+                    self.record_stage('read', len(chunk), time.perf_counter() - start)
+                    if not put(executor.submit(prepare_chunk, chunk)):
+                        break
+                put(done)
+            except Exception as e:
+                put(e)
+
+        start = time.perf_counter()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+            reader = threading.Thread(target=read_chunks, args=(executor,), daemon=True)
+            reader.start()
+
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                while True:
+                    item = pending.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+
+                    product_lists, row_count, process_seconds = item.result()
+                    self.record_stage('process', row_count, process_seconds)
+
+                    write_start = time.perf_counter()
+                    self.write_transactions(cursor, product_lists)
+                    conn.commit()
+                    self.record_stage('write', row_count, time.perf_counter() - write_start)
+                    print(f"Processed chunk {self.stats['write']['chunks']}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Failed to insert transactions or logs: {e}")
+                raise e
+            finally:
+                stop.set()
+                cursor.close()
+                conn.close()
+                reader.join()
+
+        elapsed = time.perf_counter() - start
+        self.stats['total'] = {'chunks': self.stats['write']['chunks'], 'rows': self.stats['write']['rows'],
+                               'seconds': elapsed}
+        for stage, counters in self.stats.items():
+            rate = counters['rows'] / counters['seconds'] if counters['seconds'] else 0.0
+            print(f"{stage}: {counters['chunks']} chunks, {counters['rows']} rows, "
+                  f"{counters['seconds']:.2f}s busy, {rate:,.0f} rows/s")
+        print(f"Total chunks processed: {self.stats['write']['chunks']}")
+
+    def record_stage(self, stage, row_count, seconds):
+        # Per-stage throughput counters of the parallel ingestion
+        counters = self.stats[stage]
+        counters['chunks'] += 1
+        counters['rows'] += row_count
+        counters['seconds'] += seconds
@@ -1,45 +1,49 @@
-import pandas as pd
 from datetime import datetime
 import os
 import csv
+from src.sales_log import SalesLog, TransactionIdAllocator
 
 class POSOperations:
-    def __init__(self, recommend_log_path='./logs/recommend_log.csv'):
+    def __init__(self, recommend_log_path='./logs/recommend_log.csv', counter_path='./data/transaction_counter',
+                 sales_log_path='./data/retail-data.csv'):
         self.product_quantities = {}
         self.product_prices = {}
         self.total_price = 0.0
         self.transaction_counter = 0
         self.recommend_log_path = recommend_log_path
 
-        # Load the transaction counter from the recommend_log file
-        self.load_transaction_counter_from_log()
+        # The counter file is read in constant time, the recommend_log file only seeds it on the first start
+        self.transaction_ids = TransactionIdAllocator(counter_path, initial=self.load_transaction_counter_from_log)
+        self.transaction_counter = self.transaction_ids.last
+        self.sales_log = SalesLog(sales_log_path)
 
     def generate_transaction_id(self):
         # Increment the transaction
-        self.transaction_counter += 1
+        self.transaction_counter = self.transaction_ids.next()
         return f"REC00{self.transaction_counter:02d}"
 
     def load_transaction_counter_from_log(self):
-        # Load value from the recommend_log file
+        # Count the rows of the recommend_log file, without loading it
         if os.path.exists(self.recommend_log_path):
             try:
-                log_df = pd.read_csv(self.recommend_log_path)
-                self.transaction_counter = len(log_df)
+                with open(self.recommend_log_path, newline='') as file:
+                    return max(sum(1 for _ in csv.reader(file)) - 1, 0)
             except Exception as e:
                 # Handle errors
                 print(f"load_transaction_counter_from_log Error: Error loading transaction counter from log file: {e}")
-                self.transaction_counter = 0
+        return 0
 
     def load_products_from_transaction(self, file='./data/prod_list.csv'):
         if not os.path.exists(file):
             print(f"Warning: The file '{file}' was not found.")
             return []
 
+        # Read with the csv module, the till's startup does not need pandas
         try:
-            df = pd.read_csv(file)
-            self.product_prices = pd.Series(df['Price_per_Unit'].values,
-                                            index=df['Product_Name']).to_dict()
-            return df['Product_Name'].unique()
+            with open(file, newline='', encoding='utf-8') as csv_file:
+                rows = list(csv.DictReader(csv_file))
+            self.product_prices = {row['Product_Name']: float(row['Price_per_Unit'] or 'nan') for row in rows}
+            return list(dict.fromkeys(row['Product_Name'] for row in rows))
         except Exception as e:
             print(f"Error loading products from file: {e}")
             return []
@@ -71,6 +75,10 @@ class POSOperations:
         return self.total_price
     
     def save_transaction(self, customer_id='Anonymous'):
+        self.write_transaction_rows(self.transaction_rows(customer_id))
+
+    def transaction_rows(self, customer_id='Anonymous'):
+        # Sales rows of the current transaction, taken before the cart is cleared
         transaction_id = datetime.now().strftime('%Y%m%d%H%M%S')
         transaction_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -85,17 +93,10 @@ class POSOperations:
                 'Unit_Price': self.product_prices.get(product, 0),
                 'Customer_ID': customer_id
             })
+        return transaction_data
 
-        # Write the transaction data to retail-data.csv
-        csv_file = './data/retail-data.csv'
-        try:
-            with open(csv_file, 'a', newline='') as file:
-                writer = csv.DictWriter(file,
-                                        fieldnames=['Transaction_ID', 'Product_Name', 'Quantity', 'Transaction_Date',
-                                                    'Unit_Price', 'Customer_ID'])
-                if file.tell() == 0:
-                    writer.writeheader()
-                writer.writerows(transaction_data)
-            print("Transaction saved successfully.")
-        except Exception as e:
-            print(f"Failed to save transaction: {e}")
+    def write_transaction_rows(self, transaction_data):
+        # Write the transaction data to the current retail-data segment, rows of several checkouts in one append.
+        # A failure is raised to the checkout logger, which keeps the rows for a retry
+        self.sales_log.append(transaction_data)
+        print("Transaction saved successfully.")
@@ -2,14 +2,20 @@ import tkinter as tk
 from tkinter import ttk
 from src.pos_operations import POSOperations
 from src.recommendation_system import RecommendationSystem
+from src.service import RemoteRecommendationClient
+from src.checkout_logger import CheckoutLogger
+from src.recommendation_refresher import RecommendationRefresher
 import threading
 import time
 from src.pipeline import TransactionPipeline
 from tkinter import messagebox
 
+# Rules fetched per page while the shelf recommendations view is scrolled
+SHELF_PAGE_SIZE = 100
+
 
 class POSUI:
-    def __init__(self, root):
+    def __init__(self, root, service_address=None, ingest_workers=None):
         self.root = root
         self.root.title("POS System with Related Recommendations")
         self.root.geometry("1024x768")
@@ -19,9 +25,21 @@ class POSUI:
 
         # POS operations and recommendations
         self.pos_operations = POSOperations()
-        self.recommendation_system = RecommendationSystem(ui_controller=self) 
-        self.recommendation_system.load_rules() 
+        self.recommendation_system = RecommendationSystem(ui_controller=self, ingest_workers=ingest_workers) 
+        # Carts are scored and logged either in process or by a shared recommendation service
+        if service_address:
+            self.recommender = RemoteRecommendationClient.from_address(service_address)
+        else:
+            self.recommender = self.recommendation_system
+        self.recommender.load_rules() 
+        # Recommendations are computed off the Tk thread, bursts of scans are coalesced into one refresh
+        self.recommendation_refresher = RecommendationRefresher(self.root, self.recommender, self.show_recommendations)
         self.pipeline = TransactionPipeline()
+        # Checkout logs and sales rows are written behind the till, in group commits
+        self.checkout_logger = CheckoutLogger(self.recommender.save_logs, self.pos_operations.write_transaction_rows,
+                                              spill_path='./data/unsaved_checkouts.jsonl',
+                                              on_idle=self.pos_operations.transaction_ids.reserve_ahead).start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # UI components
         self.create_sidebar()
@@ -167,12 +185,10 @@ class POSUI:
             self.transaction_listbox.insert("", "end", values=(product, quantity))
 
     def update_recommendations(self):
-        # Get the scanned items
-        scanned_items = list(self.pos_operations.get_transaction_items().keys())
-
-        # Get updated recommendations
-        recommendations = self.recommendation_system.update_recommendations(scanned_items)
+        # Hand the scanned items to the refresher, show_recommendations receives the result on the Tk thread
+        self.recommendation_refresher.request(self.pos_operations.get_transaction_items())
 
+    def show_recommendations(self, recommendations):
         # Update the UI with the recommendations
         self.recommendations_listbox.delete(0, tk.END)
         if recommendations:
@@ -189,25 +205,32 @@ class POSUI:
         # Get scanned items
         purchased_items = list(self.pos_operations.get_transaction_items().keys())
 
-        # Get recommendations
-        raw_recommended_items = list(self.recommendations_listbox.get(1, tk.END))
+        # Get the recommendations of the final cart, the listbox may not show them yet right after a scan
+        raw_recommended_items = self.recommendation_refresher.latest()
+        if raw_recommended_items is None:
+            raw_recommended_items = list(self.recommendations_listbox.get(1, tk.END))
         recommended_items = [item.replace(" (Already in cart)", "") for item in raw_recommended_items]
 
         # Generate transaction ID
         transaction_id = self.pos_operations.generate_transaction_id()
 
-        # Save the log of the transaction
-        self.recommendation_system.checkout(transaction_id, purchased_items, recommended_items)
-
-        # Save the current transaction data
-        self.pos_operations.save_transaction(customer_id="12345")
+        # Queue the log of the transaction and the current transaction data, the checkout logger writes them
+        self.checkout_logger.submit((transaction_id, recommended_items, purchased_items),
+                                    self.pos_operations.transaction_rows(customer_id="12345"))
 
         # Clear the transaction
         self.pos_operations.clear_transaction()
+        self.recommendation_refresher.request({})
         self.update_transaction_listbox()
         self.recommendations_listbox.delete(0, tk.END)
         self.update_total_price()
 
+    def on_close(self):
+        # Write the checkouts still queued before the window goes away
+        self.recommendation_refresher.close()
+        self.checkout_logger.close()
+        self.root.destroy()
+
     def show_shelf_recommendations(self):
         if not self.recommendation_system.is_logged_in:
             self.recommendation_system.show_login(self.root)
@@ -240,14 +263,14 @@ class POSUI:
         treeview_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         # Scrollbar
-        treeview_scrollbar = ttk.Scrollbar(treeview_frame, orient="vertical")
-        treeview_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.shelf_scrollbar = ttk.Scrollbar(treeview_frame, orient="vertical")
+        self.shelf_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        # Displaying all recommendations
+        # Displaying all recommendations, further pages are fetched when the view is scrolled to the end
         columns = ("Antecedents", "Consequents", "Support", "Confidence", "Lift", "Leverage")
         self.shelf_recommendations_treeview = ttk.Treeview(treeview_frame, columns=columns, show="headings",
-                                                        yscrollcommand=treeview_scrollbar.set)
-        treeview_scrollbar.config(command=self.shelf_recommendations_treeview.yview)
+                                                        yscrollcommand=self.on_shelf_scroll)
+        self.shelf_scrollbar.config(command=self.shelf_recommendations_treeview.yview)
 
         # Define column headings and sizes
         for col in columns:
@@ -270,8 +293,18 @@ class POSUI:
         self.results_combobox.current(0)
         self.results_combobox.pack(side=tk.LEFT, padx=5)
 
+        # Sort label and combobox
+        sort_label = ttk.Label(dropdown_frame, text="Sort By:", font=("Arial", 12), background="white")
+        sort_label.pack(side=tk.LEFT, padx=5)
+
+        self.sort_combobox = ttk.Combobox(dropdown_frame, values=["Lift", "Confidence", "Support"],
+                                          font=("Arial", 12))
+        self.sort_combobox.current(0)
+        self.sort_combobox.pack(side=tk.LEFT, padx=5)
+
         # Bind combobox
         self.results_combobox.bind("<<ComboboxSelected>>", lambda event: self.update_shelf_recommendations())
+        self.sort_combobox.bind("<<ComboboxSelected>>", lambda event: self.update_shelf_recommendations())
 
         # Display initial data
         self.update_shelf_recommendations()
@@ -309,19 +342,43 @@ class POSUI:
         for item in self.shelf_recommendations_treeview.get_children():
             self.shelf_recommendations_treeview.delete(item)
 
-        # Populate the specified number of association rules
-        recommendations = self.recommendation_system.show_shelf_recommendations(limit)
-        for _, row in recommendations.iterrows():
-            # antecedents = ', '.join(list(row['antecedents']))
-            # consequents = ', '.join(list(row['consequents']))
-            antecedents = row['antecedents']
-            consequents = row['consequents']
-            support = round(row['support'], 4)
-            confidence = round(row['confidence'], 4)
-            lift = round(row['lift'], 4)
-            leverage = round(row['leverage'], 4)
-            self.shelf_recommendations_treeview.insert("", "end", values=(
-                antecedents, consequents, support, confidence, lift, leverage))
+        # Paging state: sort column, rows still allowed by the limit and the key of the last row shown
+        self.shelf_order_by = self.sort_combobox.get().lower()
+        self.shelf_remaining = limit
+        self.shelf_last_key = None
+        self.shelf_exhausted = False
+        self.shelf_loading = False
+
+        # Populate the first page of association rules
+        self.load_next_shelf_page()
+
+    def load_next_shelf_page(self):
+        self.shelf_loading = False
+        if self.shelf_exhausted:
+            return
+
+        page_size = SHELF_PAGE_SIZE if self.shelf_remaining is None else min(SHELF_PAGE_SIZE, self.shelf_remaining)
+        recommendations = self.recommendation_system.show_shelf_recommendations(
+            page_size, order_by=self.shelf_order_by, after=self.shelf_last_key)
+
+        sort_position = {"support": 3, "confidence": 4, "lift": 5}[self.shelf_order_by]
+        for row in recommendations:
+            rule_id, antecedents, consequents, support, confidence, lift, leverage = row
+            self.shelf_recommendations_treeview.insert("", "end", iid=str(rule_id), values=(
+                antecedents, consequents, round(support, 4), round(confidence, 4), round(lift, 4), round(leverage, 4)))
+            self.shelf_last_key = (row[sort_position], rule_id)
+
+        if self.shelf_remaining is not None:
+            self.shelf_remaining -= len(recommendations)
+        if len(recommendations) < page_size or self.shelf_remaining == 0:
+            self.shelf_exhausted = True
+
+    def on_shelf_scroll(self, first, last):
+        # Keep the scrollbar in sync and fetch the next page once the end of the list comes into view
+        self.shelf_scrollbar.set(first, last)
+        if float(last) >= 0.95 and not self.shelf_exhausted and not self.shelf_loading:
+            self.shelf_loading = True
+            self.root.after_idle(self.load_next_shelf_page)
 
     def open_training_window(self):
         # Create popup window
@@ -362,13 +419,14 @@ class POSUI:
         completion_label = ttk.Label(self.training_window, text="Model training complete!", font=("Arial", 12),
                                      foreground="green")
         completion_label.pack(pady=10)
-        self.recommendation_system.load_rules() 
+        self.recommender.load_rules() 
         self.training_window.after(2000, self.training_window.destroy)
         self.show_shelf_recommendations()
 
     def clear_transaction(self):
         # Clear the current
         self.pos_operations.clear_transaction()
+        self.recommendation_refresher.request({})
         self.update_transaction_listbox()
         self.recommendations_listbox.delete(0, tk.END)
         self.update_total_price()
@@ -1,58 +1,13 @@
-from datetime import datetime
-import pandas as pd
+import os
 import sqlite3
+from src import storage
+from src.rule_store import RuleStore
+from src.rule_artifact import ARTIFACT_DIR, artifact_path, open_rule_artifact
 
 def get_db_connection():
     try:
-        # Connect to the SQLite database for the recommendation system
-        conn = sqlite3.connect('./data/recommendation_system.db')  # This creates the database if it doesn't exist
-        cursor = conn.cursor()
-
-        # Create recommendation_logs table if not exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS recommendation_logs (
-                transaction_id TEXT,
-                recommended_items TEXT,
-                purchased_items TEXT,
-                timestamp TEXT
-            )
-        ''')
-
-        # Create association_rules table if not exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS association_rules (
-                antecedents TEXT,
-                consequents TEXT,
-                support REAL,
-                confidence REAL,
-                lift REAL,
-                leverage REAL
-            )
-        ''')
-
-        # Create anonymization_logs table if not exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS anonymization_logs (
-                Transaction_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                Anonymization_Timestamp TEXT,
-                Status TEXT
-            )
-        ''')
-
-        # Create transactions table if not exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                products TEXT,
-                datetime TEXT
-            )
-        ''')
-
-        conn.commit()
-        cursor.close()
-
-        # print("Database and tables created or already exist.")
-        return conn
+        # Reuse this thread's pooled connection, the tables are created once per process
+        return storage.get_connection()
 
     except sqlite3.Error as e:
         print(f"SQLite error: {e}")
@@ -63,108 +18,128 @@ def get_db_connection():
         return None
 
 
-def load_association_rules():
+# Subquery selecting the model version the POS should use
+ACTIVE_VERSION = '(SELECT version FROM active_model WHERE id = 1)'
+
+def get_active_version():
+    conn = get_db_connection()
+    try:
+        row = conn.execute('SELECT version FROM active_model WHERE id = 1').fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+def load_rule_store():
+    # Load the association rules into the compact integer-encoded store used for lookups
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
-        cursor.execute('SELECT antecedents, consequents, support, confidence, lift, leverage FROM association_rules')
+        # Read the active version and its rules in one snapshot, training may flip the pointer meanwhile
+        cursor.execute('BEGIN')
+        cursor.execute('SELECT version FROM active_model WHERE id = 1')
+        row = cursor.fetchone()
+        version = row[0] if row else None
+
+        # Rules and their items come from the normalized tables, no antecedent strings are parsed
+        cursor.execute('SELECT rule_id, support, confidence, lift, leverage FROM association_rules '
+                       'WHERE version = ? ORDER BY rule_id', (version,))
         rules = cursor.fetchall()
+        cursor.execute('''
+            SELECT rule_items.rule_id, rule_items.role, rule_items.item_id, items.name
+            FROM association_rules AS rules
+            JOIN association_rule_items AS rule_items ON rule_items.rule_id = rules.rule_id
+            JOIN items ON items.item_id = rule_items.item_id
+            WHERE rules.version = ?
+            ORDER BY rule_items.rule_id, rule_items.role, rule_items.position
+        ''', (version,))
+        rule_store = RuleStore.from_item_rows(rules, cursor.fetchall())
+        rule_store.version = version
+        conn.commit()
 
-        if not rules:
+        if rule_store.empty:
             print("Error: No association rules found in the database.")
-            return pd.DataFrame()
-
-        # Create a DataFrame with all metrics
-        df = pd.DataFrame(rules, columns=['antecedents', 'consequents', 'support', 'confidence', 'lift', 'leverage'])
-        # print("Loaded association rules:")
-        # print(df.head())
 
-        return df
+        return rule_store
 
     except Exception as e:
         print(f"Error loading association rules from the database: {e}")
-        return pd.DataFrame()
+        return RuleStore.from_rows([])
 
     finally:
         conn.close()
 
-def get_related_recommendations(scanned_items, rules_df):
+def open_rule_store(directory=ARTIFACT_DIR):
+    # Map the binary file of the active model version when training wrote one, the database is the fallback
+    try:
+        version = get_active_version()
+        if version is not None and os.path.exists(artifact_path(version, directory)):
+            rule_store = open_rule_artifact(artifact_path(version, directory))
+            if rule_store.version == version:
+                return rule_store
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error opening the rule artifact: {e}")
+    return load_rule_store()
+
+# Columns the shelf view may sort by, each backed by a (version, column) index on association_rules
+RULE_SORT_COLUMNS = ('lift', 'confidence', 'support')
+
+def query_rules(order_by='lift', limit=50, after=None):
+    # One page of rules sorted by order_by (descending, rule_id breaks ties). after is the
+    # (value, rule_id) key of the last row of the previous page, so every page is an index seek
+    if order_by not in RULE_SORT_COLUMNS:
+        raise ValueError(f"Cannot sort rules by '{order_by}', expected one of {', '.join(RULE_SORT_COLUMNS)}.")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        query = f'''
+            SELECT rule_id, antecedents, consequents, support, confidence, lift, leverage
+            FROM association_rules
+            WHERE version = {ACTIVE_VERSION}
+            {f"AND ({order_by}, rule_id) < (?, ?)" if after is not None else ""}
+            ORDER BY {order_by} DESC, rule_id DESC
+            LIMIT ?
+        '''
+        cursor.execute(query, (*after, limit) if after is not None else (limit,))
+        return cursor.fetchall()
+
+    except Exception as e:
+        print(f"Error querying association rules: {e}")
+        return []
+
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_batch_recommendations(carts, rule_store, top_n=5):
+    # Top recommendations for every cart in carts (lists of product names), scored in one vectorized pass
+    if rule_store.empty:
+        print("No association rules available to generate recommendations.")
+        return [[] for _ in carts]
+    return rule_store.recommend_batch(list(carts), top_n=top_n)
+
+def get_related_recommendations(scanned_items, rule_store):
     if not scanned_items:
         print("No scanned items provided.")
         return []
 
-    if rules_df.empty:
+    if rule_store.empty:
         print("No association rules available to generate recommendations.")
         return []
 
     try:
-        scanned_items_set = set(item.strip().lower() for item in scanned_items)
-
-        # Antecedents set for comparison
-        rules_df['antecedents_set'] = rules_df['antecedents'].apply(
-            lambda x: set(item.strip().lower() for item in x.split(','))
-        )
-
-        # Filter the rules where scanned items are in the antecedents
-        relevant_rules = rules_df[
-            rules_df['antecedents_set'].apply(lambda antecedent: bool(antecedent & scanned_items_set))
-        ]
+        # Only the rules indexed under the scanned items are touched, items already in the
+        # cart come first and the list is limited to the top 5 recommendations
+        final_recommendations = rule_store.recommend(scanned_items, top_n=5)
 
-        if relevant_rules.empty:
+        if not final_recommendations:
             print("No relevant rules found for the scanned items.")
             return []
 
-        # Collect all consequents with associated confidence scores
-        recommendations = []
-        scanned_items_lower = set(item.lower() for item in scanned_items)
-
-        for _, row in relevant_rules.iterrows():
-            confidence = row['confidence']
-            consequents = [item.strip() for item in row['consequents'].split(',')]
-            for item in consequents:
-                item_lower = item.lower()
-                in_cart = item_lower in scanned_items_lower
-                recommendations.append({
-                    'item': item,
-                    'confidence': confidence,
-                    'in_cart': in_cart
-                })
-
-        if not recommendations:
-            print("No recommendations found.")
-            return []
-
-        # Create a DataFrame to handle duplicates and sorting
-        recommendations_df = pd.DataFrame(recommendations)
-
-        # Remove duplicates keeping the highest confidence
-        recommendations_df = recommendations_df.sort_values('confidence', ascending=False)
-        recommendations_df = recommendations_df.drop_duplicates(subset='item', keep='first')
-
-        # Prioritize items already in the cart
-        recommendations_df['priority'] = recommendations_df['in_cart'].apply(lambda x: 0 if x else 1)
-
-        # Sort by priority (items in cart first) and by confidence
-        recommendations_df = recommendations_df.sort_values(['priority', 'confidence'], ascending=[True, False])
-
-        # List of recommendations with "(Already in cart)" label
-        final_recommendations = []
-        for _, row in recommendations_df.iterrows():
-            item_name = row['item']
-            if row['in_cart']:
-                item_name += " (Already in cart)"
-            final_recommendations.append(item_name)
-
-        # Limit to top 5 recommendations
-        final_recommendations = final_recommendations[:5]
         return final_recommendations
 
     except Exception as e:
         print(f"Error in get_related_recommendations: {e}")
         return []
-
-
-
-
-# load_association_rules()
\ No newline at end of file
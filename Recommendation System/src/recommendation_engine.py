@@ -0,0 +1,125 @@
+from src.recommendation import (open_rule_store, get_related_recommendations, get_active_version,
+                                get_batch_recommendations)
+from src.cart_session import CartSession
+from src.rule_store import normalize_item
+from src.lru_cache import LRUCache
+from src.pipeline import TransactionPipeline, default_ingest_workers
+import sqlite3
+import threading
+import time
+
+
+class RecommendationEngine:
+    """
+    Rule store, cart scoring and checkout logging without any UI, so the headless service can
+    run it without tkinter. RecommendationSystem adds the admin screens of the POS on top.
+    """
+
+    def __init__(self, ingest_workers=None):
+        self.rule_store = None
+        # Seconds between checks of active_model for a newly trained rule set
+        self.version_check_interval = 5
+        self.last_version_check = 0
+        self.reload_thread = None
+        # fetch_data ingests new sales with this many worker processes, None picks default_ingest_workers()
+        self.pipeline = TransactionPipeline(
+            workers=default_ingest_workers() if ingest_workers is None else ingest_workers)
+        # Recommendations of recently seen carts, keyed on the set of normalized item names
+        self.recommendation_cache = LRUCache(maxsize=1024)
+
+    def load_rules(self):
+        # Load association rules into the integer-encoded store, which builds its item -> rules index once
+        # Map the binary rule file of the active model when there is one, so startup does not query the rules
+        self.rule_store = open_rule_store()
+        if self.rule_store.empty:
+            print("No rules were loaded.")
+        # else:
+        #     pass
+            # print(f"Loaded {len(self.rule_store)} rules.")
+        self.last_version_check = time.monotonic()
+
+    def check_for_new_rules(self):
+        # Poll active_model now and then; a new version is loaded off the scanning thread and
+        # swapped in with one assignment, so carts keep using the old store until it is ready
+        now = time.monotonic()
+        if now - self.last_version_check < self.version_check_interval:
+            return
+        self.last_version_check = now
+        if self.reload_thread is not None and self.reload_thread.is_alive():
+            return
+
+        try:
+            active_version = get_active_version()
+        except sqlite3.Error as e:
+            print(f"Error checking the active model version: {e}")
+            return
+        if active_version is None or active_version == self.rule_store.version:
+            return
+
+        self.reload_thread = threading.Thread(target=self.reload_rules, daemon=True)
+        self.reload_thread.start()
+
+    def reload_rules(self):
+        try:
+            rule_store = open_rule_store()
+            print(f"Loaded model version {rule_store.version} with {len(rule_store)} rules.")
+            self.rule_store = rule_store
+        except Exception as e:
+            print(f"Error reloading rules: {e}")
+
+    def new_cart_session(self, scanned_items=()):
+        # Incremental scorer for a cart, kept by the UI between scans
+        if self.rule_store is None:
+            self.load_rules()
+        return CartSession(self.rule_store, scanned_items)
+
+    def update_recommendations(self, scanned_items, session=None, refresh_rules=True):
+        # Ensure the rules are loaded, the service passes refresh_rules=False and does both off its event loop
+        if refresh_rules and (self.rule_store is None or self.rule_store.empty):
+            self.load_rules()
+        elif refresh_rules:
+            self.check_for_new_rules()
+
+        # The cache only holds results of the current rule store, a swapped-in model empties it
+        rule_store = self.rule_store
+        self.recommendation_cache.bind(rule_store)
+
+        if session is not None:
+            if session.rule_store is not rule_store:
+                session.rebind(rule_store)
+            cart_key = frozenset(session.cart)
+        else:
+            cart_key = frozenset(normalize_item(item) for item in scanned_items)
+
+        cached = self.recommendation_cache.get(cart_key)
+        if cached is not None:
+            return list(cached)
+
+        # A cart session already holds the scores of the scanned items, only rank them
+        if session is not None:
+            recommendations = session.recommendations()
+        else:
+            # Get the recommendations for the scanned items
+            recommendations = get_related_recommendations(scanned_items, rule_store)
+
+        self.recommendation_cache.put(cart_key, tuple(recommendations), owner=rule_store)
+        return recommendations
+
+    def recommend_batch(self, carts, top_n=5):
+        # Score many carts (e.g. all stored baskets or a replay file) in one pass, for offline evaluation
+        if self.rule_store is None or self.rule_store.empty:
+            self.load_rules()
+        return get_batch_recommendations(carts, self.rule_store, top_n=top_n)
+
+    def recommendation_cache_stats(self):
+        return self.recommendation_cache.stats
+
+
+    def checkout(self, transaction_id, purchased_items, recommended_items):
+        # Log the transaction and recommendations
+        self.pipeline.save_log(transaction_id, recommended_items, purchased_items)
+        print("Transaction logged successfully.")
+
+    def save_logs(self, logs):
+        # Several checkouts in one transaction, used by the POS checkout logger
+        return self.pipeline.save_logs(logs)
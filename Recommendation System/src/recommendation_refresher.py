@@ -0,0 +1,144 @@
+import queue
+import threading
+import tkinter as tk
+
+
+class RecommendationRefresher:
+    """
+    Computes the recommendations of the till's cart on a worker thread.
+
+    The Tk thread only hands over a copy of the cart with request() and returns to the scanner. The
+    worker waits until no newer cart arrived for debounce seconds, so a burst of scans costs a single
+    pass, scores the latest cart and puts the result on a queue that the Tk thread polls every
+    poll_interval seconds with root.after, the worker never calls into Tk itself. Every request
+    bumps the cart version and results computed for an older version are dropped. The worker owns
+    the CartSession, the Tk thread never touches it. At checkout, latest() skips the debounce and
+    waits for the result of the final cart, so the logged recommendations are never stale.
+    """
+
+    def __init__(self, root, recommender, on_result, debounce=0.03, poll_interval=0.015):
+        self.root = root
+        self.recommender = recommender
+        self.on_result = on_result
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        # (version, recommendations) computed by the worker, drained by poll() on the Tk thread
+        self.results = queue.Queue()
+        # Incremental scorer of the cart, None when the recommender has no local session
+        self.session = recommender.new_cart_session()
+        # Cart (product -> quantity) the session currently holds
+        self.session_cart = {}
+        self.version = 0
+        self.pending = None
+        # Newest (version, recommendations) the worker finished, recommendations is None when it failed
+        self.finished = (0, [])
+        self.urgent = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name='recommendation-refresher', daemon=True)
+        self.thread.start()
+        self.schedule_poll()
+
+    def request(self, cart):
+        # Tk thread: schedule a refresh for this cart and return its version
+        with self.condition:
+            self.version += 1
+            self.pending = (self.version, dict(cart))
+            self.condition.notify()
+            return self.version
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def next_cart(self):
+        # Block until a cart is pending and has been quiet for debounce seconds, None once closed
+        with self.condition:
+            while self.pending is None and not self.closed:
+                self.condition.wait()
+            while not self.closed and not self.urgent:
+                version = self.pending[0]
+                self.condition.wait(self.debounce)
+                if self.pending[0] == version:
+                    break
+            if self.closed:
+                return None
+            pending, self.pending = self.pending, None
+            self.urgent = False
+            return pending
+
+    def finish(self, version, recommendations):
+        with self.condition:
+            self.finished = (version, recommendations)
+            self.condition.notify_all()
+
+    def latest(self, timeout=1.0):
+        # Tk thread: recommendations of the last requested cart, computed now if still debounced, None
+        # when they failed or took longer than timeout
+        with self.condition:
+            self.urgent = self.pending is not None
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: self.finished[0] == self.version or self.closed, timeout)
+            version, recommendations = self.finished
+            return recommendations if version == self.version else None
+
+    def sync_session(self, cart):
+        # Apply the difference to the previous cart, the session only folds in the changed items
+        if self.session is None:
+            return
+        if not cart:
+            self.session.clear()
+        else:
+            for product in set(self.session_cart) | set(cart):
+                change = cart.get(product, 0) - self.session_cart.get(product, 0)
+                for _ in range(change):
+                    self.session.add(product)
+                for _ in range(-change):
+                    self.session.remove(product)
+        self.session_cart = cart
+
+    def run(self):
+        while True:
+            pending = self.next_cart()
+            if pending is None:
+                return
+            version, cart = pending
+            try:
+                self.sync_session(cart)
+            except Exception as e:
+                # The session may hold part of the change, start the next cart from an empty one
+                print(f"Error updating the cart session: {e}")
+                self.session.clear()
+                self.session_cart = {}
+                self.finish(version, None)
+                continue
+            try:
+                recommendations = self.recommender.update_recommendations(list(cart), session=self.session)
+            except Exception as e:
+                print(f"Error refreshing recommendations: {e}")
+                self.finish(version, None)
+                continue
+            self.finish(version, recommendations)
+            if version == self.version and not self.closed:
+                self.results.put((version, recommendations))
+
+    def schedule_poll(self):
+        try:
+            self.root.after(int(self.poll_interval * 1000), self.poll)
+        except tk.TclError:
+            # The window has been destroyed
+            self.close()
+
+    def poll(self):
+        # Tk thread: show the newest result unless the cart changed since it was requested
+        latest = None
+        while True:
+            try:
+                latest = self.results.get_nowait()
+            except queue.Empty:
+                break
+        if latest is not None and latest[0] == self.version:
+            self.on_result(latest[1])
+        if not self.closed:
+            self.schedule_poll()
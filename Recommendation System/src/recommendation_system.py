@@ -1,25 +1,40 @@
-from src.recommendation import load_association_rules, get_related_recommendations, get_db_connection
-from src.metric import MetricsCalculator
-from src.training import data_preparation, model_training
-from src.pipeline import TransactionPipeline
+from src.recommendation import get_db_connection, query_rules
+from src.recommendation_engine import RecommendationEngine
+from src.metrics_counters import reset_counters
 
 from tkinter import messagebox, Toplevel, ttk, Button
 import tkinter as tk
 import sqlite3
 
 
-class RecommendationSystem:
-    def __init__(self, ui_controller=None):
+class RecommendationSystem(RecommendationEngine):
+    def __init__(self, ui_controller=None, ingest_workers=None):
         # Initialize recommendation system components
-        self.rules_df = None
-        self.pipeline = TransactionPipeline()
-        self.metrics_calculator = MetricsCalculator()
-        self.cached_recommendations = {}
+        super().__init__(ingest_workers=ingest_workers)
+        # Metrics and training pull in pandas, mlxtend and matplotlib, they are created on first use
+        self._metrics_calculator = None
+        # Snapshot the Metrics page was drawn from, reused by its warnings and graphs
+        self.metrics_snapshot = None
+        self._incremental_trainer = None
         self.attachment_files = []
         self.is_logged_in = False
         self.attachment_files = []
         self.ui_controller = ui_controller
 
+    @property
+    def metrics_calculator(self):
+        if self._metrics_calculator is None:
+            from src.metric import MetricsCalculator
+            self._metrics_calculator = MetricsCalculator()
+        return self._metrics_calculator
+
+    @property
+    def incremental_trainer(self):
+        if self._incremental_trainer is None:
+            from src.incremental_training import IncrementalTrainer
+            self._incremental_trainer = IncrementalTrainer(min_support=0.009, lift_threshold=1, confidence_threshold=0.1)
+        return self._incremental_trainer
+
     def show_login(self, root):
         # Create a login window
         self.login_window = Toplevel(root)
@@ -65,39 +80,11 @@ class RecommendationSystem:
         else:
             messagebox.showerror("Logout Failed", "You are not logged in.")
             
-    def load_rules(self):
-        # Load association rules
-        self.rules_df = load_association_rules()
-        if self.rules_df.empty:
-            print("No rules were loaded.")
-        # else:
-        #     pass
-            # print(f"Loaded {len(self.rules_df)} rules.")
-            # print(self.rules_df.head())
-
-    def update_recommendations(self, scanned_items):
-        # Ensure the rules are loaded
-        if self.rules_df is None or self.rules_df.empty:
-            self.load_rules()
-
-        # Get the recommendations for the scanned items
-        recommendations = get_related_recommendations(scanned_items, self.rules_df)
-        return recommendations
-
-
-    def checkout(self, transaction_id, purchased_items, recommended_items):
-        # Log the transaction and recommendations
-        self.pipeline.save_log(transaction_id, recommended_items, purchased_items)
-        print("Transaction logged successfully.")
-
-    def show_shelf_recommendations(self, limit=None):
-        # Return top recommendations for display in the UI
-        if self.rules_df is None or self.rules_df.empty:
-            self.load_rules()
-
-        # Limit recommendations if needed
-        return self.rules_df.head(limit)
-    
+    def show_shelf_recommendations(self, limit=50, order_by='lift', after=None):
+        # Return one page of top recommendations for display in the UI, sorted and paged in SQL.
+        # Rows are (rule_id, antecedents, consequents, support, confidence, lift, leverage)
+        return query_rules(order_by=order_by, limit=limit, after=after)
+
     def fetch_data(self):
         # Clear data from the transactions and anonymization_logs tables
         conn = get_db_connection()
@@ -106,9 +93,13 @@ class RecommendationSystem:
         try:
             # Clear the existing transactions and anonymization logs
             cursor.execute('DELETE FROM transactions')
+            cursor.execute('DELETE FROM transaction_items')
             cursor.execute('DELETE FROM sqlite_sequence WHERE name="transactions"')
             cursor.execute('DELETE FROM anonymization_logs')
             cursor.execute('DELETE FROM sqlite_sequence WHERE name="anonymization_logs"')
+            reset_counters(cursor, ['anonymization_total', 'anonymization_success'])
+            # The stored itemset counts describe the old transactions
+            self.incremental_trainer.reset(cursor)
 
             conn.commit()
             print("Cleared existing transaction and log data.")
@@ -124,50 +115,38 @@ class RecommendationSystem:
         self.pipeline.process_new_data()
         print("New data fetched and inserted into the transactions table.")
 
-    def train_model(self):
-        # Database connection
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Fetch transaction data directly from the transactions table
-        cursor.execute("SELECT * FROM transactions")
-        transactions = cursor.fetchall()
+    def train_model(self, incremental=True):
+        # Only fold in the transactions added since the last run, incremental=False rebuilds the rules
+        # with a full FP-Growth pass over every transaction
+        if incremental:
+            self.incremental_trainer.train()
+            print("Model training completed successfully.")
+            return
 
-        if not transactions or len(transactions) == 0:
-            raise ValueError("No transaction data available for model training.")
+        from src.training import load_transaction_baskets, model_training
 
-        cursor.close()
-        conn.close()
+        # Fetch the baskets as item ids from the transaction_items table
+        processed_transactions, item_names = load_transaction_baskets()
 
-        processed_transactions = data_preparation(transactions)
+        if not processed_transactions:
+            raise ValueError("No transaction data available for model training.")
 
-        model_training(processed_transactions, min_support=0.009, lift_threshold=1, confidence_threshold=0.1)
+        model_training(processed_transactions, min_support=0.009, lift_threshold=1, confidence_threshold=0.1, sparse=True,
+                       item_names=item_names)
         print("Model training completed successfully.")
 
 
     def show_metrics(self):
-        log_df = self.metrics_calculator.load_recommendation_logs()
-        # Calculate and return metrics
-        anonymized_percentage = self.metrics_calculator.calculate_anonymized_percentage()
-        transparency_percentage = self.metrics_calculator.calculate_transparency_percentage()
-        ranked_metrics_df = self.metrics_calculator.calculate_ranked_metrics(log_df)
-        aggregated_metrics = self.metrics_calculator.calculate_aggregated_metrics(ranked_metrics_df)
-        coverage_rate = self.metrics_calculator.calculate_purchase_recommendation_coverage(log_df)
-
-        metrics = {
-            "anonymized_percentage": anonymized_percentage,
-            "transparency_percentage": transparency_percentage,
-            "aggregated_metrics": aggregated_metrics,
-            "coverage_rate": coverage_rate
-        }
-        return metrics
+        # Calculate and return metrics, every figure comes from one snapshot of SQL aggregates
+        self.metrics_snapshot = self.metrics_calculator.take_snapshot()
+        return self.metrics_snapshot.as_dict()
     
     def get_metric_warnings(self):
-        return self.metrics_calculator.get_warnings()
+        return self.metrics_calculator.get_warnings(self.metrics_snapshot)
     
     def show_metrics_graph(self):
         # Display metrics graphs
-        self.metrics_calculator.show_metrics_graph()
+        self.metrics_calculator.show_metrics_graph(self.metrics_snapshot)
 
     # Feedback-related
     def open_feedback_window(self, root):
@@ -0,0 +1,121 @@
+import glob
+import mmap
+import os
+import re
+import struct
+import numpy as np
+from src import storage
+from src.rule_store import RuleStore
+
+# Binary rule files written after training, one per model version. None keeps them next to the database
+ARTIFACT_DIR = None
+ARTIFACT_PATTERN = 'rules_v{version}.bin'
+
+MAGIC = b'RULESTOR'
+FORMAT_VERSION = 1
+
+# magic, format version, reserved, model version, items, rules, antecedent ids, consequent ids, vocabulary bytes
+HEADER = struct.Struct('<8sII6q')
+
+# Sections in file order: (RuleStore attribute, dtype, length given the header counts)
+SECTIONS = [
+    ('vocabulary_ptr', '<i8', lambda items, rules, antecedents, consequents: items + 1),
+    ('antecedent_ptr', '<i8', lambda items, rules, antecedents, consequents: rules + 1),
+    ('antecedent_ids', '<i4', lambda items, rules, antecedents, consequents: antecedents),
+    ('consequent_ptr', '<i8', lambda items, rules, antecedents, consequents: rules + 1),
+    ('consequent_ids', '<i4', lambda items, rules, antecedents, consequents: consequents),
+    ('support', '<f8', lambda items, rules, antecedents, consequents: rules),
+    ('confidence', '<f8', lambda items, rules, antecedents, consequents: rules),
+    ('lift', '<f8', lambda items, rules, antecedents, consequents: rules),
+    ('leverage', '<f8', lambda items, rules, antecedents, consequents: rules),
+    ('index_ptr', '<i8', lambda items, rules, antecedents, consequents: items + 1),
+    ('index_rules', '<i4', lambda items, rules, antecedents, consequents: antecedents),
+]
+
+
+def artifact_dir(directory=ARTIFACT_DIR):
+    return directory or os.path.dirname(storage.connection_manager.db_path) or '.'
+
+
+def artifact_path(version, directory=ARTIFACT_DIR):
+    return os.path.join(artifact_dir(directory), ARTIFACT_PATTERN.format(version=version))
+
+
+def aligned(offset):
+    # Every section starts on an 8 byte boundary so the arrays can be viewed in place
+    return (offset + 7) & ~7
+
+
+def save_rule_artifact(rule_store, path):
+    """
+    Writes the rule store to path in a fixed little-endian layout: a header with the counts, the
+    vocabulary offsets, the CSR rule arrays, the metric arrays, the item -> rules index and finally
+    the UTF-8 item names. The file is written under a temporary name and renamed into place.
+    """
+    names = [name.encode('utf-8') for name in rule_store.items]
+    vocabulary_ptr = np.zeros(len(names) + 1, dtype=np.int64)
+    vocabulary_ptr[1:] = np.cumsum([len(name) for name in names])
+    vocabulary = b''.join(names)
+
+    arrays = dict(vars(rule_store), vocabulary_ptr=vocabulary_ptr)
+    version = rule_store.version if rule_store.version is not None else -1
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, version, len(rule_store.items), len(rule_store),
+                         len(rule_store.antecedent_ids), len(rule_store.consequent_ids), len(vocabulary))
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(header)
+        for name, dtype, _ in SECTIONS:
+            file.write(b'\0' * (aligned(file.tell()) - file.tell()))
+            file.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+        file.write(vocabulary)
+    os.replace(temporary_path, path)
+
+
+def open_rule_artifact(path):
+    """
+    Maps a file written by save_rule_artifact read-only and returns a RuleStore whose arrays are
+    views into the mapping. Nothing is copied or rebuilt, and processes opening the same file
+    share its pages through the OS page cache.
+    """
+    with open(path, 'rb') as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapping) < HEADER.size:
+        raise ValueError(f"{path} is not a rule artifact.")
+    magic, format_version, _, version, *counts, vocabulary_size = HEADER.unpack_from(mapping)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a rule artifact of format {FORMAT_VERSION}.")
+
+    arrays = {}
+    offset = HEADER.size
+    for name, dtype, length in SECTIONS:
+        offset = aligned(offset)
+        count = length(*counts)
+        arrays[name] = np.frombuffer(mapping, dtype=dtype, count=count, offset=offset)
+        offset += arrays[name].nbytes
+    if offset + vocabulary_size != len(mapping):
+        raise ValueError(f"{path} is truncated.")
+
+    vocabulary = mapping[offset:]
+    vocabulary_ptr = arrays.pop('vocabulary_ptr').tolist()
+    items = [vocabulary[start:end].decode('utf-8') for start, end in zip(vocabulary_ptr, vocabulary_ptr[1:])]
+
+    rule_store = RuleStore(items, **arrays)
+    rule_store.version = version if version >= 0 else None
+    # Keep the mapping alive for as long as the arrays point into it
+    rule_store.mapping = mapping
+    return rule_store
+
+
+def remove_stale_artifacts(keep_versions, directory=ARTIFACT_DIR):
+    # Delete the files of model versions that were garbage-collected from the database
+    pattern = re.compile(re.escape(ARTIFACT_PATTERN).replace(r'\{version\}', r'(\d+)') + '$')
+    for path in glob.glob(os.path.join(artifact_dir(directory), ARTIFACT_PATTERN.format(version='*'))):
+        match = pattern.search(os.path.basename(path))
+        if match and int(match.group(1)) not in keep_versions:
+            try:
+                os.remove(path)
+            except OSError:
+                # Still mapped by a running POS on platforms that forbid it, retried after the next training
+                pass
@@ -0,0 +1,271 @@
+import numpy as np
+
+
+def normalize_item(item):
+    # Item names are matched case-insensitively and without surrounding spaces
+    return item.strip().lower()
+
+
+class RuleStore:
+    """
+    Compact, integer-encoded copy of the association rules.
+
+    Product names are mapped to integer ids through a single vocabulary. Antecedents and
+    consequents are kept as CSR style id arrays (rule r owns ids[ptr[r]:ptr[r + 1]]) and the
+    rule metrics live in parallel NumPy arrays, so lookups never touch strings.
+    """
+
+    def __init__(self, items, antecedent_ptr, antecedent_ids, consequent_ptr, consequent_ids,
+                 support, confidence, lift, leverage, index_ptr=None, index_rules=None):
+        # Vocabulary: id -> display name and normalized name -> id
+        self.items = list(items)
+        self.item_ids = {normalize_item(name): item_id for item_id, name in enumerate(self.items)}
+
+        self.antecedent_ptr = np.asarray(antecedent_ptr, dtype=np.int64)
+        self.antecedent_ids = np.asarray(antecedent_ids, dtype=np.int32)
+        self.consequent_ptr = np.asarray(consequent_ptr, dtype=np.int64)
+        self.consequent_ids = np.asarray(consequent_ids, dtype=np.int32)
+
+        self.support = np.asarray(support, dtype=np.float64)
+        self.confidence = np.asarray(confidence, dtype=np.float64)
+        self.lift = np.asarray(lift, dtype=np.float64)
+        self.leverage = np.asarray(leverage, dtype=np.float64)
+
+        # Model version the rules were loaded from, set by the loaders
+        self.version = None
+
+        # A prebuilt index (e.g. from a rule artifact) is used as is
+        if index_ptr is None or index_rules is None:
+            self.build_index()
+        else:
+            self.index_ptr = np.asarray(index_ptr, dtype=np.int64)
+            self.index_rules = np.asarray(index_rules, dtype=np.int32)
+
+    @classmethod
+    def from_rows(cls, rows):
+        # Build the store from (antecedents, consequents, support, confidence, lift, leverage) rows
+        # where antecedents and consequents are ', ' joined product names
+        items = []
+        item_ids = {}
+
+        def encode(names):
+            ids = []
+            for name in names.split(','):
+                key = normalize_item(name)
+                if not key:
+                    continue
+                if key not in item_ids:
+                    item_ids[key] = len(items)
+                    items.append(name.strip())
+                if item_ids[key] not in ids:
+                    ids.append(item_ids[key])
+            return ids
+
+        antecedent_ptr = [0]
+        antecedent_ids = []
+        consequent_ptr = [0]
+        consequent_ids = []
+        support, confidence, lift, leverage = [], [], [], []
+
+        for antecedents, consequents, rule_support, rule_confidence, rule_lift, rule_leverage in rows:
+            antecedent_ids.extend(encode(antecedents or ''))
+            antecedent_ptr.append(len(antecedent_ids))
+            consequent_ids.extend(encode(consequents or ''))
+            consequent_ptr.append(len(consequent_ids))
+            support.append(rule_support)
+            confidence.append(rule_confidence)
+            lift.append(rule_lift)
+            leverage.append(rule_leverage)
+
+        return cls(items, antecedent_ptr, antecedent_ids, consequent_ptr, consequent_ids,
+                   support, confidence, lift, leverage)
+
+    @classmethod
+    def from_item_rows(cls, rules, rule_items):
+        # Build the store from the normalized tables: rules are (rule_id, support, confidence, lift,
+        # leverage) rows and rule_items are (rule_id, role, item_id, name) rows joined with items
+        positions = {rule[0]: position for position, rule in enumerate(rules)}
+        antecedents = [[] for _ in rules]
+        consequents = [[] for _ in rules]
+        items = []
+        compact_ids = {}
+
+        for rule_id, role, item_id, name in rule_items:
+            position = positions.get(rule_id)
+            if position is None:
+                continue
+            if item_id not in compact_ids:
+                compact_ids[item_id] = len(items)
+                items.append(name)
+            target = antecedents if role == 'antecedent' else consequents
+            target[position].append(compact_ids[item_id])
+
+        def to_csr(id_lists):
+            ptr = np.zeros(len(id_lists) + 1, dtype=np.int64)
+            ptr[1:] = np.cumsum([len(ids) for ids in id_lists])
+            ids = [item_id for item_ids in id_lists for item_id in item_ids]
+            return ptr, ids
+
+        antecedent_ptr, antecedent_ids = to_csr(antecedents)
+        consequent_ptr, consequent_ids = to_csr(consequents)
+        metrics = list(zip(*[rule[1:] for rule in rules])) or [[], [], [], []]
+        return cls(items, antecedent_ptr, antecedent_ids, consequent_ptr, consequent_ids, *metrics)
+
+    def build_index(self):
+        # Inverted index item id -> ids of the rules whose antecedents contain it, also in CSR form
+        rule_of_entry = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.antecedent_ptr))
+        order = np.argsort(self.antecedent_ids, kind='stable')
+        self.index_rules = rule_of_entry[order]
+        counts = np.bincount(self.antecedent_ids, minlength=len(self.items))
+        self.index_ptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def __len__(self):
+        return len(self.confidence)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        # Size of the numeric arrays, useful to compare against the old DataFrame footprint
+        arrays = (self.antecedent_ptr, self.antecedent_ids, self.consequent_ptr, self.consequent_ids,
+                  self.support, self.confidence, self.lift, self.leverage, self.index_ptr, self.index_rules)
+        return sum(array.nbytes for array in arrays)
+
+    def lookup(self, name):
+        return self.item_ids.get(normalize_item(name))
+
+    def encode_items(self, names):
+        # Ids of the known items among names, unknown items are skipped
+        ids = (self.lookup(name) for name in names)
+        return sorted(set(item_id for item_id in ids if item_id is not None))
+
+    def antecedents(self, rule_id):
+        return self.antecedent_ids[self.antecedent_ptr[rule_id]:self.antecedent_ptr[rule_id + 1]]
+
+    def consequents(self, rule_id):
+        return self.consequent_ids[self.consequent_ptr[rule_id]:self.consequent_ptr[rule_id + 1]]
+
+    def rules_for_item(self, item_id):
+        return self.index_rules[self.index_ptr[item_id]:self.index_ptr[item_id + 1]]
+
+    def relevant_rules(self, item_ids):
+        # Rules with at least one of item_ids in their antecedents
+        if not len(item_ids):
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate([self.rules_for_item(item_id) for item_id in item_ids]))
+
+    def expand_consequents(self, rule_ids):
+        # Flatten the consequents of rule_ids into (item id, confidence of its rule) pairs
+        starts = self.consequent_ptr[rule_ids]
+        lengths = self.consequent_ptr[rule_ids + 1] - starts
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        candidates = self.consequent_ids[np.repeat(starts, lengths) + offsets]
+        confidences = np.repeat(self.confidence[rule_ids], lengths)
+        return candidates, confidences
+
+    def recommend(self, scanned_items, top_n=5):
+        # Best confidence per consequent of the relevant rules, items already in the cart first
+        cart_ids = self.encode_items(scanned_items)
+        rule_ids = self.relevant_rules(cart_ids)
+        if not len(rule_ids):
+            return []
+
+        candidates, confidences = self.expand_consequents(rule_ids)
+        order = np.lexsort((-confidences, candidates))
+        candidates = candidates[order]
+        confidences = confidences[order]
+        first = np.concatenate(([True], candidates[1:] != candidates[:-1]))
+        candidates = candidates[first]
+        confidences = confidences[first]
+
+        in_cart = np.isin(candidates, cart_ids)
+        ranking = np.lexsort((candidates, -confidences, ~in_cart))[:top_n]
+
+        recommendations = []
+        for position in ranking:
+            item_name = self.items[candidates[position]]
+            if in_cart[position]:
+                item_name += " (Already in cart)"
+            recommendations.append(item_name)
+        return recommendations
+
+    def recommend_batch(self, carts, top_n=5, chunk_size=20000):
+        """
+        Recommendations for many carts at once, identical to calling recommend() on each of them.
+
+        Each chunk of carts becomes a sparse cart x item matrix; multiplied by the item x rule
+        antecedent matrix it marks the relevant rules of every cart. The consequents of those
+        (cart, rule) pairs are expanded into (cart, item, confidence) triples, reduced to the best
+        confidence per cart and item and ranked per cart with one lexsort.
+        """
+        from scipy import sparse
+
+        rule_of_entry = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.antecedent_ptr))
+        antecedent_matrix = sparse.csr_matrix(
+            (np.ones(len(self.antecedent_ids), dtype=np.int32), (self.antecedent_ids, rule_of_entry)),
+            shape=(len(self.items), len(self)))
+
+        recommendations = []
+        for start in range(0, len(carts), chunk_size):
+            recommendations.extend(self.recommend_chunk(carts[start:start + chunk_size], top_n, antecedent_matrix,
+                                                        sparse))
+        return recommendations
+
+    def recommend_chunk(self, carts, top_n, antecedent_matrix, sparse):
+        cart_ids = [self.encode_items(cart) for cart in carts]
+        cart_ptr = np.zeros(len(carts) + 1, dtype=np.int64)
+        cart_ptr[1:] = np.cumsum([len(ids) for ids in cart_ids])
+        cart_items = np.fromiter((item_id for ids in cart_ids for item_id in ids), dtype=np.int64, count=cart_ptr[-1])
+        cart_matrix = sparse.csr_matrix((np.ones(len(cart_items), dtype=np.int32), cart_items, cart_ptr),
+                                        shape=(len(carts), len(self.items)))
+
+        # Relevant (cart, rule) pairs: at least one antecedent of the rule is in the cart
+        hits = (cart_matrix @ antecedent_matrix).tocoo()
+        pair_carts, pair_rules = hits.row.astype(np.int64), hits.col.astype(np.int64)
+
+        # Expand into (cart, candidate, confidence) triples
+        starts = self.consequent_ptr[pair_rules]
+        lengths = self.consequent_ptr[pair_rules + 1] - starts
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        candidates = self.consequent_ids[np.repeat(starts, lengths) + offsets].astype(np.int64)
+        triple_carts = np.repeat(pair_carts, lengths)
+        confidences = np.repeat(self.confidence[pair_rules], lengths)
+
+        # Best confidence per (cart, candidate)
+        order = np.lexsort((-confidences, candidates, triple_carts))
+        triple_carts, candidates, confidences = triple_carts[order], candidates[order], confidences[order]
+        first = np.ones(len(candidates), dtype=bool)
+        first[1:] = (candidates[1:] != candidates[:-1]) | (triple_carts[1:] != triple_carts[:-1])
+        triple_carts, candidates, confidences = triple_carts[first], candidates[first], confidences[first]
+
+        # Same ranking as recommend(): items already in the cart, then confidence, then item id
+        keys = triple_carts * len(self.items) + candidates
+        in_cart = np.isin(keys, np.repeat(np.arange(len(carts)), np.diff(cart_ptr)) * len(self.items) + cart_items)
+        order = np.lexsort((candidates, -confidences, ~in_cart, triple_carts))
+        triple_carts, candidates, in_cart = triple_carts[order], candidates[order], in_cart[order]
+        group_starts = np.searchsorted(triple_carts, triple_carts, side='left')
+        keep = np.arange(len(triple_carts)) - group_starts < top_n
+
+        recommendations = [[] for _ in carts]
+        for cart, candidate, already in zip(triple_carts[keep].tolist(), candidates[keep].tolist(),
+                                            in_cart[keep].tolist()):
+            item_name = self.items[candidate]
+            if already:
+                item_name += " (Already in cart)"
+            recommendations[cart].append(item_name)
+        return recommendations
+
+    def rows(self, limit=None):
+        # Decode rules back into display rows for the shelf view
+        count = len(self) if limit is None else min(limit, len(self))
+        for rule_id in range(count):
+            yield (
+                ', '.join(self.items[item_id] for item_id in self.antecedents(rule_id)),
+                ', '.join(self.items[item_id] for item_id in self.consequents(rule_id)),
+                float(self.support[rule_id]),
+                float(self.confidence[rule_id]),
+                float(self.lift[rule_id]),
+                float(self.leverage[rule_id])
+            )
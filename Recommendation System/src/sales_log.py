@@ -0,0 +1,144 @@
+import csv
+import glob
+import os
+import re
+import threading
+
+SALES_FIELDNAMES = ['Transaction_ID', 'Product_Name', 'Quantity', 'Transaction_Date', 'Unit_Price', 'Customer_ID']
+
+
+def write_durably(path, text):
+    # Replace path with text so that after a crash it holds either the old or the new content
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+class TransactionIdAllocator:
+    """
+    Persistent transaction counter. Instead of counting the logged checkouts at startup, the counter
+    file holds the highest id reserved so far. Ids are handed out from reserved blocks, and
+    reserve_ahead() writes the next block (fsync + rename) while the current one is still in use. The
+    POS calls it from the checkout logger's idle path, so next() only touches the file when the
+    blocks ran out before that. A crash can skip the ids reserved ahead but never hands out an id
+    twice.
+    """
+
+    def __init__(self, path='./data/transaction_counter', block_size=100, initial=None):
+        self.path = path
+        self.block_size = block_size
+        # lock guards last and reserved, write_lock serializes the counter file writes and is taken first
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.last = self.load(initial)
+        self.reserved = self.last
+        self.reserve_ahead()
+
+    def load(self, initial=None):
+        try:
+            with open(self.path) as file:
+                return int(file.read().strip() or 0)
+        except FileNotFoundError:
+            # First start: continue from the legacy count if the caller has one
+            return initial() if callable(initial) else (initial or 0)
+        except ValueError as e:
+            raise ValueError(f"Transaction counter file {self.path} is corrupt.") from e
+
+    def write(self, reserved):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        write_durably(self.path, f"{reserved}\n")
+
+    def reserve_ahead(self):
+        # Keep a whole block reserved beyond the ids handed out, without holding up next() while writing
+        with self.write_lock:
+            with self.lock:
+                if self.reserved - self.last >= self.block_size:
+                    return
+                reserved = self.reserved + self.block_size
+            self.write(reserved)
+            with self.lock:
+                self.reserved = reserved
+
+    def next(self):
+        with self.lock:
+            if self.last < self.reserved:
+                self.last += 1
+                return self.last
+
+        # The reserved ids ran out before reserve_ahead() was called again
+        with self.write_lock, self.lock:
+            if self.last >= self.reserved:
+                reserved = self.last + self.block_size
+                self.write(reserved)
+                self.reserved = reserved
+            self.last += 1
+            return self.last
+
+
+class SalesLog:
+    """
+    Append-only sales log split into segments next to path: retail-data.csv becomes
+    retail-data.000001.csv, retail-data.000002.csv, ... A new segment is started once the current one
+    reaches max_bytes, so appending only ever touches one bounded file. A legacy single file at path
+    is still read first by files() and read_chunks().
+    """
+
+    def __init__(self, path='./data/retail-data.csv', max_bytes=64 * 1024 ** 2):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory, name = os.path.split(path)
+        self.directory = directory or '.'
+        self.stem, self.extension = os.path.splitext(name)
+        self.pattern = re.compile(re.escape(self.stem) + r'\.(\d{6})' + re.escape(self.extension) + '$')
+        self.current = None
+        self.lock = threading.Lock()
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, f"{self.stem}.{number:06d}{self.extension}")
+
+    def segments(self):
+        # (number, path) of every segment in order
+        found = []
+        for path in glob.glob(os.path.join(self.directory, f"{glob.escape(self.stem)}.*{self.extension}")):
+            match = self.pattern.search(os.path.basename(path))
+            if match:
+                found.append((int(match.group(1)), path))
+        return sorted(found)
+
+    def files(self):
+        files = [path for _, path in self.segments()]
+        if os.path.exists(self.path):
+            files.insert(0, self.path)
+        return files
+
+    def read_chunks(self, chunk_size):
+        import pandas as pd
+
+        for path in self.files():
+            for chunk in pd.read_csv(path, chunksize=chunk_size):
+                yield chunk
+
+    def append(self, rows):
+        with self.lock:
+            if self.current is None:
+                segments = self.segments()
+                self.current = segments[-1][0] if segments else 1
+            path = self.segment_path(self.current)
+            if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+                self.current += 1
+                path = self.segment_path(self.current)
+
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'a', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=SALES_FIELDNAMES)
+                if file.tell() == 0:
+                    writer.writeheader()
+                writer.writerows(rows)
+                file.flush()
+                os.fsync(file.fileno())
+            return path
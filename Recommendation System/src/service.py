@@ -0,0 +1,353 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import socket
+import threading
+import time
+import uuid
+from src.recommendation_engine import RecommendationEngine
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Protocol: one JSON object per line in each direction. Requests carry an "op" and an optional "id"
+# that is echoed in the reply, so a client may pipeline several requests on one connection.
+#   {"op": "recommend", "items": [...], "top_n": 5}  -> {"ok": true, "recommendations": [...]}
+#   {"op": "checkout", "transaction_id": ..., "purchased_items": [...], "recommended_items": [...],
+#    "key": "..."}                                   -> {"ok": true}
+#   {"op": "checkout_batch", "logs": [{checkout fields without "op"}, ...]}
+#                                                    -> {"ok": true}, all logs are committed or none
+#   {"op": "stats"}                                  -> {"ok": true, "stats": {...}}
+# A checkout sent again with the key of one the service already committed is acknowledged without
+# being written twice, so a client may retry a checkout whose reply it did not get.
+
+# Requests a client may send again after losing the reply, they do not change anything
+READ_ONLY_OPS = {'recommend', 'stats'}
+
+
+class RecommendationService:
+    """
+    Headless recommendation server shared by several POS terminals.
+
+    All connections are served by one asyncio loop from a single RecommendationEngine, i.e. one
+    rule index, one recommendation cache and the usual hot swap when training activates a new model.
+    Checkouts are queued and written by a single writer thread in batches of up to batch_size logs
+    per transaction, the logs of one checkout_batch request always share a transaction. A checkout
+    is acknowledged once its batch has been committed. The keys of the
+    last remembered_keys checkouts are kept to recognize a retried one, they do not survive a restart.
+
+    Loading and version checks of the rule set are blocking SQLite reads, so they run on the default
+    executor, at most once per version_check_interval, and never on the loop that serves the tills.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, batch_size=200, flush_interval=0.05,
+                 remembered_keys=100000):
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.engine = RecommendationEngine(ingest_workers=0)
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='checkout-writer')
+        self.checkouts = None
+        # Checkout key -> future of its commit, oldest first
+        self.checkout_keys = OrderedDict()
+        self.remembered_keys = remembered_keys
+        self.server = None
+        self.writer_task = None
+        # Version check of the active model running on the default executor, if any
+        self.rules_check = None
+        self.stats = {'connections': 0, 'recommend': 0, 'checkout': 0, 'duplicates': 0, 'batches': 0, 'errors': 0}
+
+    async def start(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.engine.load_rules)
+        self.checkouts = asyncio.Queue()
+        self.writer_task = asyncio.create_task(self.write_checkouts())
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"Recommendation service listening on {self.host}:{self.port}")
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        # Let the writer drain the queued checkouts before it is cancelled, unless it has died
+        if self.checkouts is not None:
+            drained = asyncio.ensure_future(self.checkouts.join())
+            await asyncio.wait([drained, self.writer_task], return_when=asyncio.FIRST_COMPLETED)
+            drained.cancel()
+            if self.writer_task.done() and not self.writer_task.cancelled() and self.writer_task.exception():
+                print(f"Checkout writer failed: {self.writer_task.exception()}")
+            self.writer_task.cancel()
+        self.writer.shutdown(wait=True)
+
+    async def handle_connection(self, reader, writer):
+        self.stats['connections'] += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self.handle_request(line)
+                writer.write(json.dumps(reply).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, line):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            op = request.get('op')
+
+            if op == 'recommend':
+                self.stats['recommend'] += 1
+                # Ranking a cart takes microseconds, it runs on the loop without a thread hop
+                self.refresh_rules()
+                recommendations = []
+                if self.engine.rule_store is not None:
+                    recommendations = self.engine.update_recommendations(request.get('items', []),
+                                                                         refresh_rules=False)
+                reply = {'ok': True, 'recommendations': recommendations[:request.get('top_n', 5)]}
+            elif op in ('checkout', 'checkout_batch'):
+                logs = request.get('logs', []) if op == 'checkout_batch' else [request]
+                self.stats['checkout'] += len(logs)
+                reply = {'ok': await self.commit_checkouts(logs)}
+                if not reply['ok']:
+                    reply['error'] = "Failed to save the checkout log."
+            elif op == 'stats':
+                reply = {'ok': True, 'stats': dict(self.stats, queued_checkouts=self.checkouts.qsize(),
+                                                   cache=self.engine.recommendation_cache_stats())}
+            else:
+                raise ValueError(f"Unknown op: {op}")
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            reply = {'ok': False, 'error': str(e)}
+
+        if request_id is not None:
+            reply['id'] = request_id
+        return reply
+
+    def refresh_rules(self):
+        # Start a version check of the active model on the default executor when one is due, a newly
+        # trained rule set is then loaded by the engine's reload thread
+        engine = self.engine
+        if self.rules_check is not None and not self.rules_check.done():
+            return
+        if engine.rule_store is None or time.monotonic() - engine.last_version_check < engine.version_check_interval:
+            return
+        self.rules_check = asyncio.get_running_loop().run_in_executor(None, engine.check_for_new_rules)
+
+    async def commit_checkouts(self, checkouts):
+        # A retried checkout waits for the commit of the first one instead of being queued again,
+        # unless that commit failed. The new ones are queued as one entry, so they commit together
+        commits = []
+        logs = []
+        keys = []
+        for checkout in checkouts:
+            key = checkout.get('key')
+            done = self.checkout_keys.get(key) if key is not None else None
+            if done is not None and not (done.done() and not done.result()):
+                self.stats['duplicates'] += 1
+                if done not in commits:
+                    commits.append(done)
+                continue
+            logs.append((checkout.get('transaction_id'), checkout.get('recommended_items', []),
+                         checkout.get('purchased_items', [])))
+            keys.append(key)
+
+        if logs:
+            done = asyncio.get_running_loop().create_future()
+            for key in keys:
+                if key is not None:
+                    self.checkout_keys[key] = done
+                    self.checkout_keys.move_to_end(key)
+            while len(self.checkout_keys) > self.remembered_keys:
+                self.checkout_keys.popitem(last=False)
+            await self.checkouts.put((logs, done))
+            commits.append(done)
+
+        return all([await done for done in commits])
+
+    async def write_checkouts(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.checkouts.get()]
+            # Gather whatever else arrives within flush_interval, up to batch_size logs. Queued
+            # entries are never split, a large checkout_batch may exceed batch_size on its own
+            deadline = loop.time() + self.flush_interval
+            while sum(len(logs) for logs, _ in batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.checkouts.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                saved = await loop.run_in_executor(
+                    self.writer, self.engine.pipeline.save_logs, [log for logs, _ in batch for log in logs])
+            except Exception as e:
+                print(f"Error writing checkout logs: {e}")
+                saved = False
+            self.stats['batches'] += 1
+            for _, done in batch:
+                if not done.done():
+                    done.set_result(saved)
+                self.checkouts.task_done()
+
+
+class RemoteRecommendationClient:
+    """
+    Blocking client for RecommendationService with the calls POSUI makes on RecommendationSystem,
+    so a till can use the store server instead of its own in-process engine.
+
+    A request is sent again on a new connection only when it cannot have reached the service, or
+    when it only reads. Checkouts carry a key made of the client id and the transaction id, so a
+    caller retrying one that failed after it was sent does not get it written twice.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=2.0):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.sock = None
+        self.file = None
+        self.next_id = 0
+        self.client_id = uuid.uuid4().hex
+        # The till's checkout logger calls in from its own thread, one request at a time on the connection
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_address(cls, address, **kwargs):
+        # "host:port" or just "port"
+        host, _, port = address.rpartition(':')
+        return cls(host or DEFAULT_HOST, int(port), **kwargs)
+
+    def connect(self):
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile('rwb')
+
+    def close(self):
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+            self.sock = self.file = None
+
+    def connection_closed(self):
+        # True when the service has closed the idle connection, e.g. it was restarted since the last call
+        try:
+            self.sock.setblocking(False)
+            try:
+                return self.sock.recv(1, socket.MSG_PEEK) == b''
+            finally:
+                self.sock.settimeout(self.timeout)
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+
+    def request(self, op, **payload):
+        with self.lock:
+            return self._request(op, **payload)
+
+    def _request(self, op, **payload):
+        self.next_id += 1
+        request_id = self.next_id
+        message = json.dumps(dict(payload, op=op, id=request_id)).encode('utf-8') + b'\n'
+        for attempt in range(2):
+            sent = False
+            try:
+                # Reconnect first if the service was restarted since the last call
+                if self.sock is not None and self.connection_closed():
+                    self.close()
+                if self.sock is None:
+                    self.connect()
+                self.file.write(message)
+                self.file.flush()
+                sent = True
+                reply = self.read_reply(request_id)
+                break
+            except OSError:
+                self.close()
+                # Once sent, a checkout may have been committed, so only reads are sent again
+                if attempt or (sent and op not in READ_ONLY_OPS):
+                    raise
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error', "Recommendation service request failed."))
+        return reply
+
+    def read_reply(self, request_id):
+        # A reply that cannot be parsed or answers another request leaves the connection out of step
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Recommendation service closed the connection.")
+        try:
+            reply = json.loads(line)
+        except ValueError as e:
+            raise ConnectionError(f"Malformed reply from the recommendation service: {e}") from e
+        if not isinstance(reply, dict) or reply.get('id') != request_id:
+            raise ConnectionError("Reply from the recommendation service does not match the request.")
+        return reply
+
+    def checkout_key(self, transaction_id):
+        return f"{self.client_id}:{transaction_id}"
+
+    def load_rules(self):
+        # The rules live in the service
+        pass
+
+    def new_cart_session(self, scanned_items=()):
+        # Carts are scored by the service, there is no local session
+        return None
+
+    def update_recommendations(self, scanned_items, session=None):
+        try:
+            return self.request('recommend', items=list(scanned_items))['recommendations']
+        except (OSError, RuntimeError) as e:
+            print(f"Recommendation service error: {e}")
+            return []
+
+    def checkout(self, transaction_id, purchased_items, recommended_items):
+        try:
+            self.request('checkout', transaction_id=transaction_id, purchased_items=list(purchased_items),
+                         recommended_items=list(recommended_items), key=self.checkout_key(transaction_id))
+            print("Transaction logged successfully.")
+        except (OSError, RuntimeError) as e:
+            print(f"Recommendation service error: {e}")
+
+    def save_logs(self, logs):
+        # (transaction_id, recommended_items, purchased_items) tuples, committed together by the service
+        try:
+            self.request('checkout_batch', logs=[
+                {'transaction_id': transaction_id, 'purchased_items': list(purchased_items),
+                 'recommended_items': list(recommended_items), 'key': self.checkout_key(transaction_id)}
+                for transaction_id, recommended_items, purchased_items in logs])
+            return True
+        except (OSError, RuntimeError) as e:
+            print(f"Recommendation service error: {e}")
+            return False
+
+    def stats(self):
+        return self.request('stats')['stats']
+
+
+def run_service(host=DEFAULT_HOST, port=DEFAULT_PORT, **kwargs):
+    service = RecommendationService(host, port, **kwargs)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("Recommendation service stopped.")
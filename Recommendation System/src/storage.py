@@ -0,0 +1,349 @@
+import sqlite3
+import threading
+from src.metrics_counters import rebuild_counters
+
+DB_PATH = './data/recommendation_system.db'
+
+# Pragmas applied to every new connection, override them with configure()
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,
+    'busy_timeout': 5000,
+}
+
+# Bumped whenever migrate_schema() learns a new step
+SCHEMA_VERSION = 3
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS recommendation_logs (
+        log_id INTEGER PRIMARY KEY,
+        transaction_id TEXT,
+        recommended_items TEXT,
+        purchased_items TEXT,
+        timestamp TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS association_rules (
+        rule_id INTEGER PRIMARY KEY,
+        antecedents TEXT,
+        consequents TEXT,
+        support REAL,
+        confidence REAL,
+        lift REAL,
+        leverage REAL,
+        version INTEGER NOT NULL DEFAULT 1
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS anonymization_logs (
+        Transaction_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Anonymization_Timestamp TEXT,
+        Status TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS transactions (
+        transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        products TEXT,
+        datetime TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS items (
+        item_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS transaction_items (
+        transaction_id INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        PRIMARY KEY (transaction_id, item_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS recommendation_log_items (
+        log_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        PRIMARY KEY (log_id, role, position)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS association_rule_items (
+        rule_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        PRIMARY KEY (rule_id, role, position)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS itemset_counts (
+        itemset TEXT PRIMARY KEY,
+        size INTEGER,
+        count INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS training_state (
+        key TEXT PRIMARY KEY,
+        value INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS model_versions (
+        version INTEGER PRIMARY KEY,
+        created TEXT,
+        rule_count INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS active_model (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS metrics_counters (
+        name TEXT PRIMARY KEY,
+        value REAL NOT NULL
+    )
+    ''',
+]
+
+# Created after migrate_schema(), since they may reference columns a migration adds
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_association_rules_version_lift ON association_rules (version, lift)',
+    'CREATE INDEX IF NOT EXISTS idx_association_rules_version_confidence ON association_rules (version, confidence)',
+    'CREATE INDEX IF NOT EXISTS idx_association_rules_version_support ON association_rules (version, support)',
+    'CREATE INDEX IF NOT EXISTS idx_transaction_items_item ON transaction_items (item_id)',
+    'CREATE INDEX IF NOT EXISTS idx_recommendation_log_items_item ON recommendation_log_items (item_id)',
+    'CREATE INDEX IF NOT EXISTS idx_association_rule_items_item ON association_rule_items (item_id)',
+]
+
+
+# Text columns written before the items tables existed join their items with ', '
+LEGACY_SEPARATOR = ', '
+
+
+def split_legacy_items(text):
+    return [item.strip() for item in (text or '').split(LEGACY_SEPARATOR) if item.strip()]
+
+
+def get_item_ids(cursor, names):
+    # Map product names to items.item_id, adding the names seen for the first time
+    names = list(dict.fromkeys(names))
+    cursor.executemany('INSERT OR IGNORE INTO items (name) VALUES (?)', ((name,) for name in names))
+
+    item_ids = {}
+    for start in range(0, len(names), 500):
+        batch = names[start:start + 500]
+        cursor.execute(f"SELECT name, item_id FROM items WHERE name IN ({', '.join('?' * len(batch))})", batch)
+        item_ids.update(cursor.fetchall())
+    return item_ids
+
+
+def insert_item_rows(cursor, table, key_column, rows):
+    # rows are (key, role, [names]) tuples, role is None for tables without one
+    item_ids = get_item_ids(cursor, [name for _, _, names in rows for name in names])
+    if table == 'transaction_items':
+        cursor.executemany(
+            'INSERT OR IGNORE INTO transaction_items (transaction_id, item_id) VALUES (?, ?)',
+            ((key, item_ids[name]) for key, _, names in rows for name in names))
+    else:
+        cursor.executemany(
+            f'INSERT INTO {table} ({key_column}, role, position, item_id) VALUES (?, ?, ?, ?)',
+            ((key, role, position, item_ids[name]) for key, role, names in rows
+             for position, name in enumerate(names)))
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def add_primary_key(conn, table, key_column, columns):
+    # Rebuild a table created without an explicit id so that its rows keep their rowid as the new key
+    column_list = ', '.join(columns)
+    definitions = ', '.join(f"{column} {declared_type}" for column, declared_type in
+                            [(row[1], row[2]) for row in conn.execute(f"PRAGMA table_info({table})")])
+    conn.execute(f"CREATE TABLE {table}_migrated ({key_column} INTEGER PRIMARY KEY, {definitions})")
+    conn.execute(f"INSERT INTO {table}_migrated ({key_column}, {column_list}) SELECT rowid, {column_list} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_migrated RENAME TO {table}")
+
+
+def migrate_schema(conn):
+    # Bring a database created by older releases up to SCHEMA_VERSION
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    conn.execute('BEGIN')
+    try:
+        if version < 1:
+            # Version 1: baskets, logs and rules are stored as item ids instead of ', ' joined text
+            log_columns = table_columns(conn, 'recommendation_logs')
+            if 'log_id' not in log_columns:
+                add_primary_key(conn, 'recommendation_logs', 'log_id', log_columns)
+            rule_columns = table_columns(conn, 'association_rules')
+            if 'rule_id' not in rule_columns:
+                add_primary_key(conn, 'association_rules', 'rule_id', rule_columns)
+
+            cursor = conn.cursor()
+            for table in ('transaction_items', 'recommendation_log_items', 'association_rule_items'):
+                cursor.execute(f"DELETE FROM {table}")
+
+            transactions = cursor.execute('SELECT transaction_id, products FROM transactions').fetchall()
+            insert_item_rows(cursor, 'transaction_items', 'transaction_id',
+                             [(transaction_id, None, split_legacy_items(products))
+                              for transaction_id, products in transactions])
+
+            logs = cursor.execute('SELECT log_id, recommended_items, purchased_items FROM recommendation_logs').fetchall()
+            insert_item_rows(cursor, 'recommendation_log_items', 'log_id',
+                             [row for log_id, recommended, purchased in logs
+                              for row in ((log_id, 'recommended', split_legacy_items(recommended)),
+                                          (log_id, 'purchased', split_legacy_items(purchased)))])
+
+            rules = cursor.execute('SELECT rule_id, antecedents, consequents FROM association_rules').fetchall()
+            insert_item_rows(cursor, 'association_rule_items', 'rule_id',
+                             [row for rule_id, antecedents, consequents in rules
+                              for row in ((rule_id, 'antecedent', split_legacy_items(antecedents)),
+                                          (rule_id, 'consequent', split_legacy_items(consequents)))])
+
+            # Incremental training counts were keyed by product name, recount them by id
+            cursor.execute('DELETE FROM itemset_counts')
+            cursor.execute('DELETE FROM training_state')
+
+        if version < 2:
+            # Version 2: rules belong to a model version and active_model points at the one in use.
+            # The rules saved so far become version 1
+            if 'version' not in table_columns(conn, 'association_rules'):
+                conn.execute('ALTER TABLE association_rules ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+            for column in ('lift', 'confidence', 'support'):
+                conn.execute(f'DROP INDEX IF EXISTS idx_association_rules_{column}')
+
+            rule_count = conn.execute('SELECT COUNT(*) FROM association_rules WHERE version = 1').fetchone()[0]
+            if rule_count:
+                conn.execute("INSERT OR IGNORE INTO model_versions (version, created, rule_count) "
+                             "VALUES (1, datetime('now', 'localtime'), ?)", (rule_count,))
+                conn.execute('INSERT OR IGNORE INTO active_model (id, version) VALUES (1, 1)')
+
+        if version < 3:
+            # Version 3: running metrics counters, backfilled from the existing logs
+            rebuild_counters(conn.cursor())
+
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+class PooledConnection:
+    """
+    Connection handed out by the ConnectionManager.
+
+    It behaves like a sqlite3 connection, but close() only rolls back whatever the caller left
+    uncommitted and keeps the underlying connection open for the next caller on the same thread.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+
+class ConnectionManager:
+    """
+    Per-thread pool of SQLite connections with a one-time schema bootstrap.
+
+    Each thread (Tk main loop, training and fetching threads) reuses its own connection, and the
+    CREATE TABLE statements run once per process instead of on every connection request.
+    """
+
+    def __init__(self, db_path=DB_PATH, **pragmas):
+        self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS, **pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        # Bumped by configure() so threads drop connections opened with the old settings
+        self._generation = 0
+
+    def configure(self, db_path=None, **pragmas):
+        with self._lock:
+            if db_path is not None and db_path != self.db_path:
+                self.db_path = db_path
+                self._schema_ready = False
+            self.pragmas.update(pragmas)
+            self._generation += 1
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            if value is not None:
+                conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def init_schema(self, conn):
+        if self._schema_ready:
+            return
+        with self._lock:
+            if self._schema_ready:
+                return
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            migrate_schema(conn)
+            for statement in INDEXES:
+                conn.execute(statement)
+            conn.commit()
+            self._schema_ready = True
+
+    def get_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.generation != self._generation:
+            if conn is not None:
+                conn.close()
+            conn = self.connect()
+            self._local.conn = conn
+            self._local.generation = self._generation
+
+        self.init_schema(conn)
+        return PooledConnection(conn)
+
+    def close(self):
+        # Close the calling thread's connection, e.g. before a worker thread exits
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# Process wide manager used by get_db_connection()
+connection_manager = ConnectionManager()
+
+
+def configure(db_path=None, **pragmas):
+    connection_manager.configure(db_path, **pragmas)
+
+
+def get_connection():
+    return connection_manager.get_connection()
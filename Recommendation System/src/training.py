@@ -1,76 +1,221 @@
 import os
+import tracemalloc
 import pandas as pd
 from mlxtend.preprocessing import TransactionEncoder
 from mlxtend.frequent_patterns import fpgrowth, association_rules
-from src.recommendation import get_db_connection
+import sqlite3
+from src.recommendation import get_db_connection, load_rule_store
+from src.bitset_miner import bitset_eclat
+from src.storage import insert_item_rows
+from src.rule_artifact import ARTIFACT_DIR, artifact_path, save_rule_artifact, remove_stale_artifacts
+
+# Model versions kept in association_rules, older ones are garbage-collected after each training
+KEEP_MODEL_VERSIONS = 2
+
+# Frequent itemset miners selectable in model_training, all return the frame association_rules expects
+MINING_ENGINES = {
+    'fpgrowth': fpgrowth,
+    'bitset': bitset_eclat,
+}
 
 def data_preparation(raw_transactions):
     transactions = [row[1].split(', ') for row in raw_transactions]
     return transactions
 
-def save_relevant_rules_to_db(relevant_rules):
+def load_transaction_baskets():
+    """
+    Reads every basket as a list of item ids from transaction_items, together with the
+    item id -> product name vocabulary. Baskets without items are kept as empty lists.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute('SELECT transaction_id FROM transactions ORDER BY transaction_id')
+        baskets = {transaction_id: [] for transaction_id, in cursor}
+
+        cursor.execute('SELECT transaction_id, item_id FROM transaction_items ORDER BY transaction_id')
+        for transaction_id, item_id in cursor:
+            if transaction_id in baskets:
+                baskets[transaction_id].append(item_id)
+
+        cursor.execute('SELECT item_id, name FROM items')
+        item_names = dict(cursor.fetchall())
+        return list(baskets.values()), item_names
+
+    finally:
+        cursor.close()
+        conn.close()
+
+def save_relevant_rules_to_db(relevant_rules, item_names=None):
     """
     Saves the relevant association rules to the database in a single batch insert operation.
+    When the rules were mined on item ids, item_names maps them back to product names.
+
+    The rules are written as a new model version and the active_model pointer is flipped to it
+    in the same transaction, so readers see either the old or the new rule set, never a mix.
     """
     # Connect to the database
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    try:
-        # Create table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS association_rules (
-                antecedents TEXT,
-                consequents TEXT,
-                support REAL,
-                confidence REAL,
-                lift REAL,
-                leverage REAL
-            )
-        ''')
+    def decode(items):
+        return [item_names[item] if item_names is not None else str(item) for item in items]
 
+    try:
         # Prepare the data insert
-        rules_to_insert = [
+        rules = [
             (
-                ', '.join(list(map(str, row['antecedents']))),
-                ', '.join(list(map(str, row['consequents']))),
-                row['support'],
-                row['confidence'],
-                row['lift'],
-                row['leverage']
+                decode(antecedents),
+                decode(consequents),
+                support,
+                confidence,
+                lift,
+                leverage
             )
-            for _, row in relevant_rules.iterrows()
+            for antecedents, consequents, support, confidence, lift, leverage in zip(
+                relevant_rules['antecedents'], relevant_rules['consequents'], relevant_rules['support'],
+                relevant_rules['confidence'], relevant_rules['lift'], relevant_rules['leverage'])
         ]
 
+        # Rule ids follow the current maximum so the item rows can be written with executemany too.
+        # The write lock is taken before the maxima are read, a concurrent training run waits
+        # instead of claiming the same rule ids and version
+        if not conn.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT COALESCE(MAX(rule_id), 0) FROM association_rules')
+        first_rule_id = cursor.fetchone()[0] + 1
+        rule_ids = range(first_rule_id, first_rule_id + len(rules))
+
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM model_versions')
+        version = cursor.fetchone()[0] + 1
+
         # Insert all the rules
         cursor.executemany('''
-            INSERT INTO association_rules (antecedents, consequents, support, confidence, lift, leverage)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', rules_to_insert)
+            INSERT INTO association_rules (rule_id, antecedents, consequents, support, confidence, lift, leverage, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(rule_id, ', '.join(antecedents), ', '.join(consequents), support, confidence, lift, leverage, version)
+              for rule_id, (antecedents, consequents, support, confidence, lift, leverage) in zip(rule_ids, rules)])
+
+        insert_item_rows(cursor, 'association_rule_items', 'rule_id',
+                         [row for rule_id, rule in zip(rule_ids, rules)
+                          for row in ((rule_id, 'antecedent', rule[0]), (rule_id, 'consequent', rule[1]))])
+
+        # Register the version and make it the active one
+        cursor.execute("INSERT INTO model_versions (version, created, rule_count) "
+                       "VALUES (?, datetime('now', 'localtime'), ?)", (version, len(rules)))
+        cursor.execute('INSERT OR REPLACE INTO active_model (id, version) VALUES (1, ?)', (version,))
+        collect_old_versions(cursor, version)
 
         # Commit the transaction
         conn.commit()
-        print(f"{len(rules_to_insert)} relevant association rules saved to the database.")
+        print(f"{len(rules)} relevant association rules saved to the database as model version {version}.")
 
     except Exception as e:
         # Rollback in case of any error during the transaction
-        # conn.rollback()
+        conn.rollback()
         print(f"Error saving relevant rules to database: {e}")
+        return
 
     finally:
         conn.close()
 
-def model_training(transactions, min_support=0.001, lift_threshold=0, confidence_threshold=0):
+    export_rule_artifact()
+
+def export_rule_artifact(directory=ARTIFACT_DIR):
+    """
+    Writes the active model version to its binary rule file, which the POS maps at startup
+    instead of querying the rules. Files of garbage-collected versions are removed.
+    """
+    try:
+        rule_store = load_rule_store()
+        if rule_store.version is None:
+            return None
+        path = artifact_path(rule_store.version, directory)
+        save_rule_artifact(rule_store, path)
+
+        conn = get_db_connection()
+        try:
+            kept_versions = {version for version, in conn.execute('SELECT version FROM model_versions')}
+        finally:
+            conn.close()
+        remove_stale_artifacts(kept_versions, directory)
+        print(f"Rule artifact written to {path}.")
+        return path
+
+    except (OSError, sqlite3.Error) as e:
+        # The POS falls back to loading the rules from the database
+        print(f"Error writing the rule artifact: {e}")
+        return None
+
+def collect_old_versions(cursor, active_version, keep=KEEP_MODEL_VERSIONS):
+    """
+    Deletes the rules of all but the newest keep model versions, the active one always stays.
+    """
+    cursor.execute('SELECT version FROM model_versions ORDER BY version DESC LIMIT -1 OFFSET ?', (keep,))
+    old_versions = [version for version, in cursor.fetchall() if version != active_version]
+    for version in old_versions:
+        cursor.execute('DELETE FROM association_rule_items WHERE rule_id IN '
+                       '(SELECT rule_id FROM association_rules WHERE version = ?)', (version,))
+        cursor.execute('DELETE FROM association_rules WHERE version = ?', (version,))
+        cursor.execute('DELETE FROM model_versions WHERE version = ?', (version,))
+    if old_versions:
+        print(f"Removed model versions {', '.join(map(str, old_versions))}.")
+
+def encode_transactions(transactions, sparse=False):
+    """
+    One-hot encode the transactions, either as a dense boolean DataFrame or as a pandas sparse
+    DataFrame backed by the CSR matrix of TransactionEncoder.
+    """
+    te = TransactionEncoder()
+    te.fit(transactions)
+
+    if sparse:
+        te_ary = te.transform(transactions, sparse=True)
+        return pd.DataFrame.sparse.from_spmatrix(te_ary, columns=te.columns_)
+
+    te_ary = te.transform(transactions)
+    return pd.DataFrame(te_ary, columns=te.columns_)
+
+def measure_peak(stage, profile_memory=True):
+    # Result of stage() and the peak memory (MB) Python allocated while it ran, None when not profiled
+    if not profile_memory:
+        return stage(), None
+    tracemalloc.start()
+    try:
+        result = stage()
+        return result, tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    finally:
+        tracemalloc.stop()
+
+def model_training(transactions, min_support=0.001, lift_threshold=0, confidence_threshold=0, sparse=False,
+                   engine='fpgrowth', item_names=None, profile_memory=False):
     """
     Train the recommendation model using FP-Growth and generate association rules.
+    With sparse=True the baskets stay sparse from encoding through mining, engine picks the
+    frequent itemset miner from MINING_ENGINES. Transactions may hold item ids, in which
+    case item_names maps them back to product names when the rules are saved.
+    profile_memory traces the peak memory of encoding and mining, at a cost in speed.
     """
     # Convert transaction data into one-hot encoding
-    te = TransactionEncoder()
-    te_ary = te.fit(transactions).transform(transactions)
-    basket_encoded = pd.DataFrame(te_ary, columns=te.columns_)
+    basket_encoded, encode_peak = measure_peak(lambda: encode_transactions(transactions, sparse=sparse), profile_memory)
+    # mlxtend wants string column names on sparse frames, so item ids are mined as strings
+    if item_names is not None:
+        basket_encoded.columns = [str(column) for column in basket_encoded.columns]
+        item_names = {str(item_id): name for item_id, name in item_names.items()}
+    print(f"Encoded {basket_encoded.shape[0]} transactions x {basket_encoded.shape[1]} products "
+          f"({basket_encoded.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB, {'sparse' if sparse else 'dense'}).")
     
-    # Apply FP-Growth algorithm to find frequent itemsets
-    frequent_itemsets = fpgrowth(basket_encoded, min_support=min_support, use_colnames=True).sort_values("support", ascending=False)
+    # Apply FP-Growth algorithm (or the selected engine) to find frequent itemsets
+    if engine not in MINING_ENGINES:
+        raise ValueError(f"Unknown mining engine '{engine}', expected one of {', '.join(MINING_ENGINES)}.")
+    mine = MINING_ENGINES[engine]
+    frequent_itemsets, mine_peak = measure_peak(
+        lambda: mine(basket_encoded, min_support=min_support, use_colnames=True), profile_memory)
+    frequent_itemsets = frequent_itemsets.sort_values("support", ascending=False)
+    if profile_memory:
+        print(f"Peak memory ({'sparse' if sparse else 'dense'}): encoding {encode_peak:.1f} MB, "
+              f"mining {mine_peak:.1f} MB.")
     
     # Generate association rules
     assoc_rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1).sort_values('lift', ascending=False).reset_index(drop=True)
@@ -79,9 +224,9 @@ def model_training(transactions, min_support=0.001, lift_threshold=0, confidence
     relevant_rules = assoc_rules[(assoc_rules['lift'] > lift_threshold) & (assoc_rules['confidence'] > confidence_threshold)]
 
     # Save the relevant rules
-    save_relevant_rules_to_db(relevant_rules)
+    save_relevant_rules_to_db(relevant_rules, item_names)
 
-def initial_training(initial_data_file):
+def initial_training(initial_data_file, sparse=False, engine='fpgrowth'):
     """
     Perform initial training on a dataset and prepare the transactions for model training.
     """
@@ -100,4 +245,4 @@ def initial_training(initial_data_file):
     print(f"Initial training on {len(transactions)} transactions.")
     
     # Perform model training
-    model_training(transactions)
+    model_training(transactions, sparse=sparse, engine=engine)
@@ -0,0 +1,16 @@
+import os
+import pytest
+from src import storage
+
+# Run from the "Recommendation System" folder: python -m pytest -q
+# Every test gets its own scratch database, the real ./data database is never opened
+
+
+@pytest.fixture(autouse=True)
+def scratch_db(tmp_path):
+    db_path = os.path.join(tmp_path, 'test.db')
+    pragmas = dict(storage.connection_manager.pragmas)
+    storage.configure(db_path=db_path)
+    yield db_path
+    storage.connection_manager.close()
+    storage.connection_manager.pragmas = pragmas
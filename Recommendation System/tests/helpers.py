@@ -0,0 +1,52 @@
+# Shared builders for the tests
+
+
+def add_rules(rules):
+    """
+    Saves rules as the new active model version. rules are (antecedents, consequents, support, confidence,
+    lift, leverage) tuples with lists of product names.
+    """
+    import pandas as pd
+    from src.training import save_relevant_rules_to_db
+
+    columns = ['antecedents', 'consequents', 'support', 'confidence', 'lift', 'leverage']
+    save_relevant_rules_to_db(pd.DataFrame([(frozenset(a), frozenset(c), *metrics) for a, c, *metrics in rules],
+                                           columns=columns))
+
+
+def add_baskets(baskets):
+    # Stores baskets of product names as new transactions, like a bulk ingest
+    from src.pipeline import TransactionPipeline
+    from src.recommendation import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        TransactionPipeline().write_transactions(conn.cursor(), [list(basket) for basket in baskets])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def random_baskets(rng, count, bundles=(('A', 'B', 'C'), ('C', 'D'), ('E', 'F', 'G', 'H')), noise='IJKLMN'):
+    # Baskets built from a few bundles that tend to be bought together plus random single items,
+    # so mining finds itemsets of several sizes
+    baskets = []
+    for _ in range(count):
+        basket = set()
+        for bundle in bundles:
+            if rng.random() < 0.3:
+                basket.update(item for item in bundle if rng.random() < 0.85)
+        basket.update(rng.sample(noise, rng.randint(0, 2)))
+        baskets.append(sorted(basket))
+    return baskets
+
+
+def active_rules(places=9):
+    # Rules of the active model keyed on (antecedents, consequents), metrics rounded to places
+    from src.recommendation import query_rules
+
+    def names(text):
+        return frozenset(text.split(', '))
+
+    return {(names(antecedents), names(consequents)): tuple(round(value, places) for value in metrics)
+            for _, antecedents, consequents, *metrics in query_rules(limit=-1)}
@@ -0,0 +1,31 @@
+import os
+import tempfile
+from src import storage
+from benchmarks.bench_pos_replay import load_retail_baskets, replay
+from benchmarks.synthetic import generate_baskets
+
+
+def test_retail_baskets_survive_undecodable_bytes(tmp_path):
+    path = tmp_path / 'retail.csv'
+    path.write_bytes(b'\xef\xbb\xbfInvoiceNo,Description,Quantity\r\n1,MILK ,1\r\n1,BREAD,2\r\n1,MILK,1\r\n'
+                     b'2,CAF\xe9 MUG,1\r\n2,,1\r\n')
+
+    assert load_retail_baskets(str(path)) == [['MILK', 'BREAD'], ['CAF� MUG']]
+
+
+def test_replay_reports_latencies_and_removes_its_scratch_files(scratch_db):
+    catalogue = [f"Product {index}" for index in range(30)]
+    baskets = generate_baskets(400, catalogue, seed=1)
+    scratch_directories = lambda: {name for name in os.listdir(tempfile.gettempdir()) if name.startswith('pos_replay_')}
+    before = scratch_directories()
+
+    run = replay(baskets[:300], baskets[300:], min_support=0.02, confidence_threshold=0.1, use_session=True,
+                 cache_size=64, engine='bitset')
+
+    assert run['rules'] > 0
+    assert run['scan']['count'] == sum(len(basket) for basket in baskets[300:])
+    assert run['checkout']['count'] == 100
+    assert run['durability']['committed'] == 100 and run['durability']['pending'] == 0
+    assert run['commit']['count'] == run['durability']['batches']
+    assert scratch_directories() == before
+    assert storage.connection_manager.db_path == scratch_db
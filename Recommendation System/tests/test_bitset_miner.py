@@ -0,0 +1,38 @@
+import random
+import numpy as np
+import pytest
+from mlxtend.frequent_patterns import fpgrowth
+from src import bitset_miner
+from src.bitset_miner import bitset_eclat, minimum_count
+from src.training import encode_transactions
+from tests.helpers import random_baskets
+
+
+def itemsets(frequent_itemsets):
+    return {itemset: round(support, 12) for itemset, support in zip(frequent_itemsets['itemsets'], frequent_itemsets['support'])}
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+@pytest.mark.parametrize('min_support', [0.02, 0.05, 0.07, 0.2])
+def test_bitset_eclat_matches_fpgrowth(sparse, min_support):
+    # 100 baskets put 0.07 on a float boundary: 0.07 * 100 is just above 7
+    basket_encoded = encode_transactions(random_baskets(random.Random(8), 100), sparse=sparse)
+
+    expected = itemsets(fpgrowth(basket_encoded, min_support=min_support, use_colnames=True))
+    assert itemsets(bitset_eclat(basket_encoded, min_support=min_support, use_colnames=True)) == expected
+    capped = bitset_eclat(basket_encoded, min_support=min_support, use_colnames=True, max_len=2)
+    assert itemsets(capped) == {itemset: support for itemset, support in expected.items() if len(itemset) <= 2}
+
+
+def test_popcount_table_fallback(monkeypatch):
+    bitsets = np.packbits(np.random.default_rng(0).random((5, 100)) < 0.3, axis=1)
+    expected = bitset_miner.popcount(bitsets)
+    monkeypatch.delattr(np, 'bitwise_count', raising=False)
+    assert bitset_miner.popcount(bitsets).tolist() == expected.tolist()
+
+
+def test_minimum_count():
+    assert minimum_count(0.05, 100) == 5
+    assert minimum_count(0.009, 1000) == 9
+    assert minimum_count(0.5, 3) == 2
+    assert minimum_count(0.07, 100) == 8
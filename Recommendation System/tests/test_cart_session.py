@@ -0,0 +1,56 @@
+import random
+from src.cart_session import CartSession
+from src.rule_store import RuleStore
+from tests.test_rule_store import random_rules
+
+
+def test_session_matches_rule_store_through_adds_and_removes():
+    rng = random.Random(3)
+    items = [f"Product {index}" for index in range(25)]
+    rule_store = RuleStore.from_rows(random_rules(rng, items, 150))
+    session = CartSession(rule_store)
+    cart = []
+
+    for _ in range(500):
+        if cart and rng.random() < 0.4:
+            item = rng.choice(cart)
+            cart.remove(item)
+            session.remove(item)
+        else:
+            item = rng.choice(items)
+            cart.append(item)
+            session.add(item)
+        assert session.recommendations(top_n=5) == rule_store.recommend(cart, top_n=5)
+
+    session.clear()
+    assert session.recommendations() == []
+
+
+def test_ranking_heap_stays_bounded():
+    rng = random.Random(5)
+    items = [f"Product {index}" for index in range(10)]
+    rule_store = RuleStore.from_rows(random_rules(rng, items, 60))
+    session = CartSession(rule_store)
+
+    for _ in range(2000):
+        item = rng.choice(items)
+        session.add(item)
+        session.recommendations()
+        session.remove(item)
+        session.recommendations()
+
+    assert len(session.ranking) <= 4 * len(session.candidate_scores) + 64
+
+
+def test_rebind_rescores_the_cart():
+    old_store = RuleStore.from_rows([('Milk', 'Bread', 0.1, 0.5, 1.2, 0.0)])
+    new_store = RuleStore.from_rows([('Milk', 'Eggs', 0.1, 0.9, 1.2, 0.0)])
+    session = CartSession(old_store, ['Milk', 'Milk'])
+    assert session.recommendations() == ['Bread']
+
+    session.rebind(new_store)
+    assert session.recommendations() == ['Eggs']
+    session.remove('Milk')
+    assert session.recommendations() == ['Eggs']
+    session.remove('Milk')
+    assert session.recommendations() == []
@@ -0,0 +1,139 @@
+import csv
+import json
+import threading
+from src.checkout_logger import CheckoutLogger
+from src.sales_log import SALES_FIELDNAMES, SalesLog
+
+
+class FlakySaveLogs:
+    # save_logs that fails while down is set and records every committed log
+    def __init__(self):
+        self.down = False
+        self.committed = []
+
+    def __call__(self, logs):
+        if self.down:
+            return False
+        self.committed.extend(logs)
+        return True
+
+
+def checkout(index):
+    return (f"REC{index:03d}", [], [f"Product {index}"]), [{'Transaction_ID': index}]
+
+
+def sales_checkout(index):
+    # A checkout with a complete sales row, as POSOperations.transaction_rows builds them
+    return checkout(index)[0], [dict(dict.fromkeys(SALES_FIELDNAMES, ''), Transaction_ID=index)]
+
+
+def test_rows_are_only_written_for_committed_checkouts():
+    save_logs = FlakySaveLogs()
+    rows = []
+    logger = CheckoutLogger(save_logs, rows.extend, retries=1, flush_interval=0.01)
+
+    logger.submit(*checkout(1))
+    logger.flush()
+    save_logs.down = True
+    logger.submit(*checkout(2))
+    logger.flush()
+    logger.close()
+
+    assert [log[0] for log in save_logs.committed] == ['REC001']
+    assert rows == [{'Transaction_ID': 1}]
+    assert logger.durability_stats()['failed'] == 1
+
+
+def test_failed_batches_are_spilled_and_recovered_in_order(tmp_path):
+    spill_path = str(tmp_path / 'unsaved_checkouts.jsonl')
+    save_logs = FlakySaveLogs()
+    save_logs.down = True
+    rows = []
+    logger = CheckoutLogger(save_logs, rows.extend, retries=1, flush_interval=0.01, spill_path=spill_path)
+    for index in range(3):
+        logger.submit(*checkout(index))
+    logger.flush()
+    logger.close()
+    assert logger.durability_stats()['spilled'] == 3
+    assert rows == []
+
+    # The next start commits the spilled checkouts before any new one
+    save_logs.down = False
+    logger = CheckoutLogger(save_logs, rows.extend, batch_size=2, flush_interval=0.01, spill_path=spill_path)
+    logger.submit(*checkout(3))
+    logger.flush()
+    logger.close()
+
+    assert [log[0] for log in save_logs.committed] == ['REC000', 'REC001', 'REC002', 'REC003']
+    assert rows == [{'Transaction_ID': index} for index in range(4)]
+    assert logger.durability_stats()['recovered'] == 3
+    assert not (tmp_path / 'unsaved_checkouts.jsonl').exists()
+
+
+def test_checkouts_that_still_fail_stay_spilled_and_torn_lines_are_skipped(tmp_path):
+    spill_path = tmp_path / 'unsaved_checkouts.jsonl'
+    log, transaction_rows = checkout(1)
+    spill_path.write_text(json.dumps({'log': log, 'rows': transaction_rows}) + '\n{"log": ["REC0', encoding='utf-8')
+    save_logs = FlakySaveLogs()
+    save_logs.down = True
+
+    logger = CheckoutLogger(save_logs, retries=1, spill_path=str(spill_path))
+    logger.retry_spilled()
+    assert spill_path.read_text(encoding='utf-8').splitlines() == [json.dumps({'log': log, 'rows': transaction_rows})]
+
+    save_logs.down = False
+    logger.retry_spilled()
+    assert save_logs.committed == [log]
+    assert not spill_path.exists()
+
+
+def test_sales_rows_that_fail_are_spilled_without_their_committed_log(tmp_path):
+    spill_path = str(tmp_path / 'unsaved_checkouts.jsonl')
+    save_logs = FlakySaveLogs()
+    sales_log = SalesLog(str(tmp_path / 'retail-data.csv'))
+    append = sales_log.append
+
+    def failing_append(rows):
+        raise OSError('disk full')
+
+    sales_log.append = failing_append
+    logger = CheckoutLogger(save_logs, sales_log.append, retries=1, flush_interval=0.01, spill_path=spill_path)
+    logger.submit(*sales_checkout(1))
+    logger.flush()
+    logger.close()
+    assert [log[0] for log in save_logs.committed] == ['REC001']
+    assert logger.durability_stats()['spilled'] == 1
+    assert sales_log.files() == []
+
+    # Replayed on the next start, the log is not saved a second time
+    logger = CheckoutLogger(save_logs, append, spill_path=spill_path).start()
+    logger.flush()
+    logger.close()
+    assert [log[0] for log in save_logs.committed] == ['REC001']
+    assert logger.durability_stats()['recovered'] == 1
+    with open(sales_log.files()[0], newline='') as file:
+        assert [row['Transaction_ID'] for row in csv.DictReader(file)] == ['1']
+    assert not (tmp_path / 'unsaved_checkouts.jsonl').exists()
+
+
+def test_commit_durations_are_kept_per_batch():
+    logger = CheckoutLogger(FlakySaveLogs(), batch_size=2, flush_interval=0.01, commit_history=3)
+    for index in range(10):
+        logger.submit(*checkout(index))
+        logger.flush()
+    logger.close()
+
+    assert len(logger.commit_seconds) == 3
+    assert logger.durability_stats()['batches'] == 10
+
+
+def test_idle_work_runs_on_the_writer_once_the_queue_is_drained():
+    threads = []
+    logger = CheckoutLogger(FlakySaveLogs(), flush_interval=0.01,
+                            on_idle=lambda: threads.append(threading.current_thread().name))
+    for index in range(3):
+        logger.submit(*checkout(index))
+    logger.flush()
+    logger.close()
+
+    assert threads and set(threads) == {'checkout-logger'}
@@ -0,0 +1,96 @@
+import json
+import random
+from src.incremental_training import IncrementalTrainer
+from src.recommendation import get_db_connection
+from src.training import load_transaction_baskets, model_training
+from tests.helpers import active_rules, add_baskets, random_baskets
+
+
+def full_mining_rules(min_support):
+    baskets, item_names = load_transaction_baskets()
+    model_training(baskets, min_support=min_support, lift_threshold=1, confidence_threshold=0.1, sparse=True,
+                   item_names=item_names)
+    return active_rules()
+
+
+def test_incremental_rules_match_full_mining():
+    rng = random.Random(11)
+    trainer = IncrementalTrainer(min_support=0.05, lift_threshold=1, confidence_threshold=0.1)
+
+    # Several runs, so itemsets become and stop being candidates as the total grows
+    for count in (30, 120, 15, 200):
+        add_baskets(random_baskets(rng, count))
+        trainer.train()
+        incremental = active_rules()
+        assert incremental == full_mining_rules(0.05)
+
+    assert any(len(antecedents) + len(consequents) >= 3 for antecedents, consequents in incremental)
+
+
+def stored_counts():
+    conn = get_db_connection()
+    try:
+        return dict(conn.execute('SELECT itemset, count FROM itemset_counts').fetchall())
+    finally:
+        conn.close()
+
+
+def test_indexed_counts_of_new_candidates_match_a_history_scan():
+    rng = random.Random(5)
+    # Every promoted candidate is counted from the item index
+    indexed = IncrementalTrainer(min_support=0.05, indexed_count_limit=10 ** 6)
+    for count in (40, 160, 60):
+        add_baskets(random_baskets(rng, count))
+        indexed.train()
+        assert active_rules() == full_mining_rules(0.05)
+    counts = stored_counts()
+
+    conn = get_db_connection()
+    indexed.reset(conn.cursor())
+    conn.commit()
+    conn.close()
+    IncrementalTrainer(min_support=0.05, indexed_count_limit=0).update_counts()
+    assert stored_counts() == counts
+
+
+def test_only_apriori_candidates_are_stored():
+    rng = random.Random(2)
+    add_baskets(random_baskets(rng, 300))
+    trainer = IncrementalTrainer(min_support=0.05)
+    trainer.update_counts()
+
+    conn = get_db_connection()
+    counts = {frozenset(json.loads(itemset)): count for itemset, count in conn.execute('SELECT itemset, count FROM itemset_counts')}
+    conn.close()
+    frequent = {itemset for itemset, count in counts.items() if count >= 0.05 * 300}
+    for itemset in counts:
+        if len(itemset) > 1:
+            assert all(itemset - {item} in frequent for item in itemset)
+    # Counting every combination of the baskets would store far more
+    assert len(counts) < 200
+
+
+def test_max_len_caps_the_itemset_size():
+    add_baskets(random_baskets(random.Random(4), 300))
+    IncrementalTrainer(min_support=0.05, max_len=2).update_counts()
+
+    conn = get_db_connection()
+    assert conn.execute('SELECT MAX(size) FROM itemset_counts').fetchone()[0] == 2
+    conn.close()
+
+
+def test_train_model_is_incremental_unless_asked_to_rebuild():
+    from src.recommendation_system import RecommendationSystem
+
+    rng = random.Random(8)
+    system = RecommendationSystem(ingest_workers=0)
+    system.incremental_trainer.min_support = 0.05
+    add_baskets(random_baskets(rng, 100))
+    system.train_model()
+    assert stored_counts()
+
+    # The rebuild mines every transaction and leaves the incremental counts alone
+    add_baskets(random_baskets(rng, 50))
+    counts = stored_counts()
+    system.train_model(incremental=False)
+    assert stored_counts() == counts
@@ -0,0 +1,64 @@
+import threading
+from src.lru_cache import LRUCache
+from src.recommendation_engine import RecommendationEngine
+from tests.helpers import add_rules
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats == {'size': 2, 'maxsize': 2, 'hits': 3, 'misses': 1, 'evictions': 1, 'invalidations': 0,
+                           'hit_rate': 0.75}
+
+
+def test_binding_another_owner_drops_the_entries():
+    old_store, new_store = object(), object()
+    cache = LRUCache()
+    cache.bind(old_store)
+    cache.put('cart', 'old', owner=old_store)
+    cache.bind(old_store)
+    assert cache.get('cart') == 'old'
+
+    cache.bind(new_store)
+    assert cache.get('cart') is None and cache.stats['invalidations'] == 1
+    # A result computed from the old store while the swap happened is not kept
+    cache.put('cart', 'old', owner=old_store)
+    assert cache.get('cart') is None
+
+
+def test_concurrent_use_keeps_the_bound():
+    cache = LRUCache(maxsize=50)
+
+    def use(offset):
+        for index in range(2000):
+            cache.put((offset + index) % 300, index)
+            cache.get((offset + 2 * index) % 300)
+
+    threads = [threading.Thread(target=use, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 50 and cache.hits + cache.misses == 8000
+
+
+def test_new_model_version_invalidates_cached_carts():
+    add_rules([(['Milk'], ['Bread'], 0.2, 0.8, 2.0, 0.05)])
+    engine = RecommendationEngine(ingest_workers=0)
+    assert engine.update_recommendations(['Milk']) == ['Bread']
+    assert engine.update_recommendations([' milk']) == ['Bread']
+    assert engine.recommendation_cache_stats()['hits'] == 1
+
+    add_rules([(['Milk'], ['Eggs'], 0.2, 0.8, 2.0, 0.05)])
+    engine.version_check_interval = 0
+    engine.update_recommendations(['Milk'])
+    engine.reload_thread.join()
+
+    assert engine.update_recommendations(['Milk']) == ['Eggs']
+    assert engine.recommendation_cache_stats()['invalidations'] == 1
@@ -0,0 +1,58 @@
+import random
+import pytest
+from src.metric import MetricsCalculator
+from src.pipeline import TransactionPipeline
+from src.recommendation import get_db_connection
+from tests.helpers import add_rules
+
+
+def random_logs(rng, count):
+    items = [f"Product {index}" for index in range(15)]
+    logs = []
+    for index in range(count):
+        recommended = rng.sample(items, rng.choice([0, 0, 1, 3, 5, 7]))
+        purchased = rng.sample(items, rng.randint(0, 4))
+        logs.append((f"REC{index:04d}", recommended, purchased))
+    return logs
+
+
+def add_transactions(product_lists, status):
+    conn = get_db_connection()
+    TransactionPipeline().write_transactions(conn.cursor(), product_lists, status=status)
+    conn.commit()
+    conn.close()
+
+
+def assert_snapshot_matches_full_calculation(calculator):
+    snapshot = calculator.take_snapshot()
+    log_df = calculator.load_recommendation_logs()
+    ranked = calculator.calculate_ranked_metrics(log_df)
+
+    assert snapshot.log_count == len(log_df)
+    assert snapshot.anonymized_percentage == pytest.approx(calculator.calculate_anonymized_percentage())
+    assert snapshot.transparency_percentage == pytest.approx(calculator.calculate_transparency_percentage())
+    assert snapshot.coverage_rate == pytest.approx(calculator.calculate_purchase_recommendation_coverage(log_df))
+    expected = calculator.calculate_aggregated_metrics(ranked)
+    assert snapshot.aggregated_metrics == pytest.approx(expected)
+    assert snapshot.ranked_metrics.to_numpy() == pytest.approx(ranked[['Precision@K', 'Recall@K']].to_numpy())
+
+
+def test_snapshot_matches_the_full_calculation():
+    rng = random.Random(17)
+    calculator = MetricsCalculator(precision_threshold=0.4)
+    pipeline = TransactionPipeline()
+    add_rules([(['Milk'], ['Bread'], 0.2, 0.8, 2.0, 0.05), (['Tea'], ['Milk'], 0.0, 0.5, 1.2, 0.0),
+               (['Eggs'], ['Tea'], 0.1, 0.5, 0.0, 0.0)])
+
+    logs = random_logs(rng, 300)
+    for start in range(0, 300, 60):
+        assert pipeline.save_logs(logs[start:start + 60])
+        add_transactions([['Milk']] * rng.randint(1, 5), status='Failed')
+        assert_snapshot_matches_full_calculation(calculator)
+
+
+def test_empty_snapshot():
+    snapshot = MetricsCalculator().take_snapshot()
+    assert snapshot.log_count == 0 and snapshot.coverage_rate == 0.0
+    assert snapshot.as_dict()['aggregated_metrics'] == {'Average Precision@K': 0.0, 'Average Recall@K': 0.0,
+                                                        'Percentage Meeting Precision@K Threshold': 0.0}
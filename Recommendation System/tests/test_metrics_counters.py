@@ -0,0 +1,83 @@
+from collections import Counter
+import random
+import sqlite3
+import pytest
+from src import storage
+from src.metrics_counters import load_counters, log_counters, rebuild_counters
+from src.pipeline import TransactionPipeline
+from src.recommendation import get_db_connection
+from src.recommendation_system import RecommendationSystem
+from tests.test_metrics import random_logs
+from tests.test_pipeline import sales_chunk
+
+
+def assert_counters_match_a_rebuild():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    counters = load_counters(cursor)
+    rebuilt = dict(rebuild_counters(cursor))
+    conn.rollback()
+    conn.close()
+    assert counters == pytest.approx({name: value for name, value in rebuilt.items() if value})
+
+
+def test_running_counters_match_a_rebuild(tmp_path):
+    rng = random.Random(18)
+    pipeline = TransactionPipeline()
+    logs = random_logs(rng, 200)
+    # Repeated recommendations and empty logs count like the SQL rebuild counts them
+    logs += [('REC9000', ['Milk', 'Milk', 'Bread'], ['Milk']), ('REC9001', [], [])]
+
+    for start in range(0, len(logs), 50):
+        assert pipeline.save_logs(logs[start:start + 50])
+        assert_counters_match_a_rebuild()
+
+    # A failed batch rolls its counters back with its rows
+    assert not pipeline.save_logs([('REC9002', ['Milk'], ['Milk']), ('REC9003', [None], ['Milk'])])
+    assert_counters_match_a_rebuild()
+
+    pipeline.save_anonymized_transactions(sales_chunk(30))
+    conn = get_db_connection()
+    pipeline.log_anonymization(conn.cursor(), None, 'Failed')
+    conn.commit()
+    conn.close()
+    assert_counters_match_a_rebuild()
+
+    # Fetching the sales again replaces the anonymization logs and their counters
+    sales_file = tmp_path / 'retail-data.csv'
+    sales_chunk(10).to_csv(sales_file, index=False)
+    recommendation_system = RecommendationSystem(ingest_workers=0)
+    recommendation_system.pipeline.retail_data_file = str(sales_file)
+    recommendation_system.fetch_data()
+    assert_counters_match_a_rebuild()
+
+
+def test_log_counters():
+    assert log_counters(['A', 'B', 'C', 'D', 'E', 'F'], ['F', 'A']) == {'precision:1:5': 1, 'recall_sum': 0.5}
+    assert log_counters([], ['A']) == {'precision:0:0': 1, 'recall_sum': 0.0}
+
+
+def test_version_2_database_gets_backfilled_counters(scratch_db):
+    # A version 2 database holds logs but no counters table
+    conn = sqlite3.connect(scratch_db)
+    for statement in storage.SCHEMA:
+        conn.execute(statement)
+    conn.execute('DROP TABLE metrics_counters')
+    logs = random_logs(random.Random(3), 40)
+    for log_id, (transaction_id, recommended_items, purchased_items) in enumerate(logs, start=1):
+        conn.execute('INSERT INTO recommendation_logs (log_id, transaction_id, recommended_items, purchased_items) '
+                     'VALUES (?, ?, ?, ?)', (log_id, transaction_id, ', '.join(recommended_items), ', '.join(purchased_items)))
+        storage.insert_item_rows(conn.cursor(), 'recommendation_log_items', 'log_id',
+                                 [(log_id, 'recommended', recommended_items), (log_id, 'purchased', purchased_items)])
+    conn.execute("INSERT INTO anonymization_logs (Anonymization_Timestamp, Status) VALUES ('2024-01-01', 'Success')")
+    conn.execute('PRAGMA user_version = 2')
+    conn.commit()
+    conn.close()
+
+    conn = get_db_connection()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == storage.SCHEMA_VERSION
+    counters = load_counters(conn.cursor())
+    conn.close()
+    expected = sum((log_counters(recommended_items, purchased_items) for _, recommended_items, purchased_items in logs),
+                   Counter({'anonymization_total': 1, 'anonymization_success': 1}))
+    assert counters == pytest.approx({name: value for name, value in expected.items() if value})
@@ -0,0 +1,104 @@
+import sqlite3
+from src import storage
+from src.metrics_counters import load_counters, rebuild_counters
+from src.recommendation import get_db_connection, load_rule_store
+from tests.helpers import add_rules
+
+# Tables as the first release created them: ', ' joined text columns, no log or rule ids
+LEGACY_SCHEMA = [
+    'CREATE TABLE recommendation_logs (transaction_id TEXT, recommended_items TEXT, purchased_items TEXT, timestamp TEXT)',
+    'CREATE TABLE association_rules (antecedents TEXT, consequents TEXT, support REAL, confidence REAL, lift REAL, '
+    'leverage REAL)',
+    'CREATE TABLE anonymization_logs (Transaction_ID INTEGER PRIMARY KEY AUTOINCREMENT, Anonymization_Timestamp TEXT, '
+    'Status TEXT)',
+    'CREATE TABLE transactions (transaction_id INTEGER PRIMARY KEY AUTOINCREMENT, products TEXT, datetime TEXT)',
+]
+
+
+def create_legacy_database(path):
+    conn = sqlite3.connect(path)
+    for statement in LEGACY_SCHEMA:
+        conn.execute(statement)
+    conn.executemany('INSERT INTO transactions (products, datetime) VALUES (?, ?)',
+                     [('Milk, Bread', '2024-01-01 10:00:00'), ('Bread', '2024-01-01 11:00:00'), ('', '2024-01-02 09:00:00')])
+    conn.executemany('INSERT INTO recommendation_logs VALUES (?, ?, ?, ?)',
+                     [('REC001', 'Bread, Eggs', 'Milk, Bread', '2024-01-01 10:00:00'),
+                      ('REC002', '', 'Bread', '2024-01-01 11:00:00')])
+    conn.executemany('INSERT INTO association_rules VALUES (?, ?, ?, ?, ?, ?)',
+                     [('Milk', 'Bread', 0.3, 0.9, 1.5, 0.1), ('Bread, Milk', 'Eggs', 0.1, 0.4, 1.2, 0.01)])
+    conn.execute("INSERT INTO anonymization_logs (Anonymization_Timestamp, Status) VALUES ('2024-01-01', 'Success')")
+    conn.commit()
+    conn.close()
+
+
+def create_version_1_database(path):
+    # Item tables in place, but rules without a model version
+    conn = sqlite3.connect(path)
+    for statement in storage.SCHEMA:
+        conn.execute(statement)
+    for table in ('model_versions', 'active_model', 'metrics_counters'):
+        conn.execute(f'DROP TABLE {table}')
+    conn.execute('ALTER TABLE association_rules DROP COLUMN version')
+    conn.execute("INSERT INTO association_rules VALUES (1, 'Milk', 'Bread', 0.3, 0.9, 1.5, 0.1)")
+    storage.insert_item_rows(conn.cursor(), 'association_rule_items', 'rule_id',
+                             [(1, 'antecedent', ['Milk']), (1, 'consequent', ['Bread'])])
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+    conn.close()
+
+
+def item_rows(conn, query):
+    return sorted(conn.execute(query).fetchall())
+
+
+def test_legacy_database_is_migrated_to_item_ids(scratch_db):
+    create_legacy_database(scratch_db)
+    conn = get_db_connection()
+
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == storage.SCHEMA_VERSION
+    assert item_rows(conn, 'SELECT transaction_id, name FROM transaction_items JOIN items USING (item_id)') == [
+        (1, 'Bread'), (1, 'Milk'), (2, 'Bread')]
+    assert item_rows(conn, 'SELECT log_id, transaction_id FROM recommendation_logs') == [(1, 'REC001'), (2, 'REC002')]
+    assert item_rows(conn, 'SELECT log_id, role, position, name FROM recommendation_log_items JOIN items USING (item_id)') == [
+        (1, 'purchased', 0, 'Milk'), (1, 'purchased', 1, 'Bread'), (1, 'recommended', 0, 'Bread'),
+        (1, 'recommended', 1, 'Eggs'), (2, 'purchased', 0, 'Bread')]
+    assert item_rows(conn, 'SELECT rule_id, role, name FROM association_rule_items JOIN items USING (item_id)') == [
+        (1, 'antecedent', 'Milk'), (1, 'consequent', 'Bread'), (2, 'antecedent', 'Bread'), (2, 'antecedent', 'Milk'),
+        (2, 'consequent', 'Eggs')]
+
+    # The legacy rules become model version 1 and stay in use
+    assert conn.execute('SELECT version FROM active_model').fetchone()[0] == 1
+    assert conn.execute('SELECT rule_count FROM model_versions WHERE version = 1').fetchone()[0] == 2
+    assert load_rule_store().recommend(['Milk']) == ['Bread', 'Eggs']
+
+    # The counters are backfilled from the migrated logs
+    counters = load_counters(conn.cursor())
+    assert counters
+    rebuild_counters(conn.cursor())
+    assert load_counters(conn.cursor()) == counters
+    conn.close()
+
+
+def test_version_1_rules_become_the_active_model(scratch_db):
+    create_version_1_database(scratch_db)
+    conn = get_db_connection()
+
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == storage.SCHEMA_VERSION
+    assert conn.execute('SELECT rule_id, version FROM association_rules').fetchall() == [(1, 1)]
+    assert conn.execute('SELECT version, rule_count FROM model_versions').fetchall() == [(1, 1)]
+    assert conn.execute('SELECT version FROM active_model').fetchone()[0] == 1
+    conn.close()
+    assert load_rule_store().recommend(['milk']) == ['Bread']
+
+    # The next training run saves version 2 next to it
+    add_rules([(['Eggs'], ['Bread'], 0.1, 0.5, 1.2, 0.0)])
+    assert load_rule_store().version == 2
+
+
+def test_migration_is_skipped_on_a_current_database():
+    conn = get_db_connection()
+    conn.execute("INSERT INTO items (name) VALUES ('Milk')")
+    conn.commit()
+    storage.migrate_schema(conn._conn)
+    assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 1
+    conn.close()
@@ -0,0 +1,58 @@
+import sqlite3
+import threading
+from src.recommendation import get_active_version, get_db_connection
+from src.training import KEEP_MODEL_VERSIONS
+from tests.helpers import active_rules, add_rules
+
+
+def test_concurrent_training_runs_get_their_own_versions():
+    def train(index):
+        add_rules([([f"Product {index}"], ['Bread'], 0.1, 0.5, 1.2, 0.0), ([f"Product {index}"], ['Eggs'], 0.1, 0.4, 1.1, 0.0)])
+
+    threads = [threading.Thread(target=train, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conn = get_db_connection()
+    versions = conn.execute('SELECT version, rule_count FROM model_versions ORDER BY version').fetchall()
+    rule_counts = conn.execute('SELECT version, COUNT(*) FROM association_rules GROUP BY version ORDER BY version').fetchall()
+    item_rows = conn.execute('SELECT COUNT(*) FROM association_rule_items').fetchone()[0]
+    conn.close()
+
+    assert versions == [(version, 2) for version in range(9 - KEEP_MODEL_VERSIONS, 9)]
+    assert rule_counts == versions
+    assert item_rows == 4 * KEEP_MODEL_VERSIONS
+    assert get_active_version() == 8
+
+
+def test_old_versions_are_collected_and_the_active_one_served():
+    for index in range(4):
+        add_rules([([f"Product {index}"], ['Bread'], 0.1, 0.5, 1.2, 0.0)])
+
+    assert get_active_version() == 4
+    assert list(active_rules()) == [(frozenset(['Product 3']), frozenset(['Bread']))]
+    conn = get_db_connection()
+    assert [version for version, in conn.execute('SELECT version FROM model_versions ORDER BY version')] == [3, 4]
+    conn.close()
+
+
+def test_training_waits_for_a_run_holding_the_write_lock(scratch_db):
+    add_rules([(['Milk'], ['Bread'], 0.1, 0.5, 1.2, 0.0)])
+
+    # Another run has written version 2 but not committed it yet
+    other = sqlite3.connect(scratch_db, isolation_level=None, check_same_thread=False)
+    other.execute('BEGIN IMMEDIATE')
+    other.execute("INSERT INTO association_rules (rule_id, antecedents, consequents, support, confidence, lift, "
+                  "leverage, version) VALUES (2, 'Tea', 'Milk', 0.1, 0.5, 1.2, 0.0, 2)")
+    other.execute("INSERT INTO model_versions (version, created, rule_count) VALUES (2, datetime('now'), 1)")
+    commit = threading.Timer(0.3, other.execute, args=('COMMIT',))
+    commit.start()
+
+    add_rules([(['Eggs'], ['Bread'], 0.1, 0.5, 1.2, 0.0)])
+    commit.join()
+    other.close()
+
+    assert get_active_version() == 3
+    assert list(active_rules()) == [(frozenset(['Eggs']), frozenset(['Bread']))]
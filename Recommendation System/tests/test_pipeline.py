@@ -0,0 +1,110 @@
+import threading
+import pandas as pd
+from src.pipeline import INGEST_WORKERS_ENV, TransactionPipeline, default_ingest_workers
+from src.recommendation import get_db_connection
+
+
+def sales_chunk(transaction_count, first_id=1):
+    rows = []
+    for transaction_id in range(first_id, first_id + transaction_count):
+        for product in (f"Product {transaction_id % 7}", f"Product {transaction_id % 5 + 10}"):
+            rows.append({'Transaction_ID': transaction_id, 'Product_Name': product, 'Quantity': 1,
+                         'Transaction_Date': '2024-01-01 10:00:00', 'Unit_Price': 10, 'Customer_ID': 'C1'})
+    # A line without a product still counts as a transaction
+    rows.append({'Transaction_ID': first_id + transaction_count, 'Product_Name': None, 'Quantity': 1,
+                 'Transaction_Date': '2024-01-01 10:00:00', 'Unit_Price': 10, 'Customer_ID': 'C1'})
+    return pd.DataFrame(rows)
+
+
+def stored_baskets():
+    conn = get_db_connection()
+    try:
+        rows = conn.execute('''
+            SELECT transactions.transaction_id, transactions.products, items.name
+            FROM transactions
+            LEFT JOIN transaction_items ON transaction_items.transaction_id = transactions.transaction_id
+            LEFT JOIN items ON items.item_id = transaction_items.item_id
+        ''').fetchall()
+        logs = conn.execute("SELECT COUNT(*) FROM anonymization_logs WHERE Status = 'Success'").fetchone()[0]
+    finally:
+        conn.close()
+    baskets = {}
+    for transaction_id, products, name in rows:
+        baskets.setdefault(transaction_id, (products, set()))[1].update([name] if name else [])
+    return sorted((products, sorted(names)) for products, names in baskets.values()), logs
+
+
+def test_bulk_ingest_stores_the_same_baskets_as_row_by_row(scratch_db):
+    chunk = sales_chunk(40)
+    TransactionPipeline(bulk=False).save_anonymized_transactions(chunk)
+    row_by_row = stored_baskets()
+
+    conn = get_db_connection()
+    for table in ('transactions', 'transaction_items', 'anonymization_logs'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.commit()
+    conn.close()
+
+    TransactionPipeline(bulk=True).save_anonymized_transactions(chunk)
+    assert stored_baskets() == row_by_row
+    assert row_by_row[1] == 41
+
+
+def test_bulk_ingest_and_checkouts_do_not_take_the_same_ids():
+    pipeline = TransactionPipeline(bulk=True)
+    errors = []
+
+    def ingest():
+        try:
+            for start in range(0, 400, 20):
+                pipeline.save_anonymized_transactions(sales_chunk(20, first_id=start))
+        except Exception as e:
+            errors.append(e)
+
+    def checkouts():
+        for index in range(200):
+            if not pipeline.save_log(f"REC{index}", ['Product 1'], ['Product 2', 'Product 3']):
+                errors.append(index)
+
+    threads = [threading.Thread(target=ingest), threading.Thread(target=checkouts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    conn = get_db_connection()
+    assert conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0] == 20 * 21 + 200
+    conn.close()
+
+
+def test_parallel_ingest_stores_the_same_baskets_as_serial(tmp_path):
+    sales_file = tmp_path / 'retail-data.csv'
+    sales_chunk(300).to_csv(sales_file, index=False)
+
+    TransactionPipeline(retail_data_file=str(sales_file), chunk_size=100).process_new_data()
+    serial = stored_baskets()
+
+    conn = get_db_connection()
+    for table in ('transactions', 'transaction_items', 'anonymization_logs'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.commit()
+    conn.close()
+
+    pipeline = TransactionPipeline(retail_data_file=str(sales_file), chunk_size=100, workers=2)
+    pipeline.process_new_data()
+    assert stored_baskets() == serial
+    assert pipeline.stats['write']['chunks'] == 7
+
+
+def test_default_ingest_workers(monkeypatch):
+    monkeypatch.setenv(INGEST_WORKERS_ENV, '3')
+    assert default_ingest_workers() == 3
+    monkeypatch.setenv(INGEST_WORKERS_ENV, '0')
+    assert default_ingest_workers() == 0
+
+    monkeypatch.delenv(INGEST_WORKERS_ENV)
+    monkeypatch.setattr('os.cpu_count', lambda: 2)
+    assert default_ingest_workers() == 0
+    monkeypatch.setattr('os.cpu_count', lambda: 16)
+    assert default_ingest_workers() == 4
@@ -0,0 +1,36 @@
+import pytest
+from src.recommendation import query_rules
+from tests.helpers import add_rules
+
+
+def test_pages_follow_the_full_ordering_without_gaps():
+    # Tied lifts, so the pages also depend on rule_id breaking ties
+    add_rules([([f"Product {index}"], ["Bread"], 0.01 * (index % 7), 0.5, 1.0 + index % 4, 0.0) for index in range(23)])
+    everything = query_rules(limit=-1)
+
+    pages, after = [], None
+    while True:
+        page = query_rules(limit=5, after=after)
+        if not page:
+            break
+        pages.extend(page)
+        after = (page[-1][5], page[-1][0])
+
+    assert pages == everything
+    assert [(row[5], row[0]) for row in everything] == sorted(((row[5], row[0]) for row in everything), reverse=True)
+
+
+def test_sorting_by_another_column():
+    add_rules([(["Milk"], ["Bread"], 0.3, 0.2, 1.5, 0.0), (["Eggs"], ["Bread"], 0.1, 0.9, 1.1, 0.0)])
+
+    assert [row[1] for row in query_rules(order_by='confidence')] == ['Eggs', 'Milk']
+    assert [row[1] for row in query_rules(order_by='confidence', after=(0.9, 10 ** 9))] == ['Eggs', 'Milk']
+    with pytest.raises(ValueError):
+        query_rules(order_by='rule_id; DROP TABLE items')
+
+
+def test_only_the_active_version_is_listed():
+    add_rules([(["Milk"], ["Bread"], 0.3, 0.2, 1.5, 0.0)])
+    add_rules([(["Eggs"], ["Bread"], 0.1, 0.9, 1.1, 0.0)])
+
+    assert [row[1] for row in query_rules()] == ['Eggs']
@@ -0,0 +1,59 @@
+import random
+import numpy as np
+import pandas as pd
+import pytest
+from src.metric import MetricsCalculator
+
+
+def naive_ranked_metrics(log_df, max_k=5):
+    # The per-row loop calculate_ranked_metrics replaced, kept as the reference
+    precision_k_list, recall_k_list = [], []
+    for _, row in log_df.iterrows():
+        recommended_items, purchased_items = row['recommended_items'], row['purchased_items']
+        if not isinstance(recommended_items, list) and pd.isna(recommended_items) or \
+                not isinstance(purchased_items, list) and pd.isna(purchased_items):
+            precision_k_list.append(0)
+            recall_k_list.append(0)
+            continue
+        if not isinstance(recommended_items, list):
+            recommended_items = [item.strip() for item in recommended_items.split(',')]
+            purchased_items = [item.strip() for item in purchased_items.split(',')]
+        k = min(max_k, len(recommended_items))
+        relevant_items = set(recommended_items[:k]) & set(purchased_items)
+        precision_k_list.append(len(relevant_items) / k if k > 0 else 0.0)
+        recall_k_list.append(len(relevant_items) / len(purchased_items) if purchased_items else 0.0)
+    return pd.DataFrame({'Precision@K': precision_k_list, 'Recall@K': recall_k_list})
+
+
+def random_log_frame(rng, count, as_lists):
+    items = [f"Product {index}" for index in range(12)]
+    rows = []
+    for index in range(count):
+        # Repeated recommendations are allowed, a repeat counts once like in a set
+        recommended = [rng.choice(items) for _ in range(rng.choice([0, 1, 3, 5, 8]))]
+        purchased = rng.sample(items, rng.randint(0, 5))
+        if as_lists:
+            rows.append((f"REC{index}", recommended, purchased))
+        else:
+            rows.append((f"REC{index}", rng.choice([np.nan, ', '.join(recommended)]) if rng.random() < 0.05
+                         else ', '.join(recommended), ', '.join(purchased)))
+    return pd.DataFrame(rows, columns=['transaction_id', 'recommended_items', 'purchased_items'])
+
+
+@pytest.mark.parametrize('as_lists', [False, True])
+def test_vectorized_metrics_match_the_row_loop(as_lists):
+    log_df = random_log_frame(random.Random(19), 2000, as_lists)
+    calculator = MetricsCalculator()
+
+    ranked = calculator.calculate_ranked_metrics(log_df, max_k=5, k_values=(1, 3))
+    expected = naive_ranked_metrics(log_df)
+    assert ranked['Precision@K'].to_numpy() == pytest.approx(expected['Precision@K'].to_numpy())
+    assert ranked['Recall@K'].to_numpy() == pytest.approx(expected['Recall@K'].to_numpy())
+    for k in (1, 3):
+        at_k = naive_ranked_metrics(log_df, max_k=k)
+        assert ranked[f'Precision@{k}'].to_numpy() == pytest.approx(at_k['Precision@K'].to_numpy())
+        assert ranked[f'Recall@{k}'].to_numpy() == pytest.approx(at_k['Recall@K'].to_numpy())
+
+
+def test_empty_frame():
+    assert MetricsCalculator().calculate_ranked_metrics(pd.DataFrame()).empty
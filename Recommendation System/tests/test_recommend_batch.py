@@ -0,0 +1,26 @@
+import random
+from src.recommendation import get_batch_recommendations
+from src.rule_store import RuleStore
+
+
+def test_batch_matches_recommend_per_cart():
+    rng = random.Random(12)
+    items = [f"Product {index}" for index in range(40)]
+    # Repeated confidences and several consequents per rule, so the ranking has ties to break
+    rules = []
+    for _ in range(300):
+        chosen = rng.sample(items, rng.randint(2, 5))
+        split = rng.randint(1, len(chosen) - 1)
+        rules.append((', '.join(chosen[:split]), ', '.join(chosen[split:]), 0.1, rng.choice([0.2, 0.4, 0.6, 0.8]), 1.5, 0.0))
+    rule_store = RuleStore.from_rows(rules)
+
+    carts = [rng.sample(items, rng.randint(0, 6)) + rng.sample(['Unknown', ' product 3 '], rng.randint(0, 1))
+             for _ in range(500)]
+    expected = [rule_store.recommend(cart, top_n=4) for cart in carts]
+    assert rule_store.recommend_batch(carts, top_n=4) == expected
+    assert rule_store.recommend_batch(carts, top_n=4, chunk_size=7) == expected
+
+
+def test_batch_without_rules_or_carts():
+    assert get_batch_recommendations([['Milk'], []], RuleStore.from_rows([])) == [[], []]
+    assert RuleStore.from_rows([('Milk', 'Bread', 0.1, 0.5, 1.2, 0.0)]).recommend_batch([]) == []
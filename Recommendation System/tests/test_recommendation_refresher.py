@@ -0,0 +1,131 @@
+import threading
+import time
+import tkinter as tk
+from src.cart_session import CartSession
+from src.recommendation_refresher import RecommendationRefresher
+from src.rule_store import RuleStore
+
+RULES = [('Milk', 'Bread', 0.1, 0.5, 1.2, 0.0), ('Tea', 'Honey', 0.1, 0.6, 1.2, 0.0)]
+
+
+class FakeRoot:
+    # Stands in for the Tk root, the test runs the polls itself
+    def __init__(self):
+        self.destroyed = False
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        if self.destroyed:
+            raise tk.TclError('can\'t invoke "after" command: application has been destroyed')
+        self.scheduled.append(callback)
+
+
+class CountingRecommender:
+    def __init__(self):
+        self.rule_store = RuleStore.from_rows(RULES)
+        self.carts = []
+
+    def new_cart_session(self):
+        return CartSession(self.rule_store)
+
+    def update_recommendations(self, scanned_items, session=None):
+        self.carts.append(sorted(scanned_items))
+        return session.recommendations()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_a_burst_of_scans_is_scored_once():
+    root = FakeRoot()
+    recommender = CountingRecommender()
+    shown = []
+    refresher = RecommendationRefresher(root, recommender, shown.append, debounce=0.1)
+
+    for cart in ({'Milk': 1}, {'Milk': 2}, {'Milk': 2, 'Tea': 1}):
+        refresher.request(cart)
+    wait_for(lambda: not refresher.results.empty())
+    root.scheduled.pop()()
+
+    assert recommender.carts == [['Milk', 'Tea']]
+    assert shown == [['Honey', 'Bread']]
+    refresher.close()
+
+
+def test_result_of_an_older_cart_is_dropped():
+    root = FakeRoot()
+    shown = []
+    refresher = RecommendationRefresher(root, CountingRecommender(), shown.append, debounce=0.01)
+
+    version = refresher.request({'Milk': 1})
+    wait_for(lambda: not refresher.results.empty())
+    refresher.version = version + 1
+    root.scheduled.pop()()
+    assert shown == []
+    refresher.close()
+
+
+def test_failed_session_update_starts_over_from_an_empty_cart():
+    root = FakeRoot()
+    recommender = CountingRecommender()
+    shown = []
+    refresher = RecommendationRefresher(root, recommender, shown.append, debounce=0.01)
+    failed = threading.Event()
+    add = refresher.session.add
+
+    def add_once_failing(item):
+        if not failed.is_set():
+            failed.set()
+            add(item)
+            raise RuntimeError('session update failed')
+        add(item)
+
+    refresher.session.add = add_once_failing
+    refresher.request({'Milk': 1, 'Tea': 1})
+    wait_for(lambda: failed.is_set() and refresher.session_cart == {} and refresher.pending is None)
+    assert refresher.session.recommendations() == []
+
+    refresher.request({'Tea': 1})
+    wait_for(lambda: not refresher.results.empty())
+    root.scheduled.pop()()
+    assert shown == [['Honey']]
+    refresher.close()
+
+
+def test_polling_stops_once_the_window_is_destroyed():
+    root = FakeRoot()
+    shown = []
+    refresher = RecommendationRefresher(root, CountingRecommender(), shown.append, debounce=0.01)
+    refresher.request({'Milk': 1})
+    wait_for(lambda: not refresher.results.empty())
+
+    root.destroyed = True
+    root.scheduled.pop()()
+    assert shown == [['Bread']]
+    assert refresher.closed
+    refresher.thread.join(5)
+    assert not refresher.thread.is_alive()
+
+
+def test_checkout_right_after_a_scan_gets_the_final_cart():
+    root = FakeRoot()
+    recommender = CountingRecommender()
+    shown = []
+    # A debounce far longer than the test, latest() must not wait for it
+    refresher = RecommendationRefresher(root, recommender, shown.append, debounce=30)
+
+    refresher.request({'Milk': 1})
+    refresher.request({'Milk': 1, 'Tea': 1})
+    start = time.monotonic()
+    assert refresher.latest() == ['Honey', 'Bread']
+    assert time.monotonic() - start < 1
+    assert recommender.carts == [['Milk', 'Tea']]
+
+    # Nothing changed since, the finished result is returned as is
+    assert refresher.latest() == ['Honey', 'Bread']
+    assert recommender.carts == [['Milk', 'Tea']]
+    refresher.close()
@@ -0,0 +1,63 @@
+import os
+import random
+import numpy as np
+import pytest
+from src.recommendation import load_rule_store, open_rule_store
+from src.rule_artifact import SECTIONS, artifact_path, open_rule_artifact, save_rule_artifact
+from src.rule_store import RuleStore
+from tests.helpers import add_rules
+from tests.test_rule_store import random_rules
+
+
+def assert_same_store(left, right):
+    assert left.items == right.items and left.version == right.version
+    for name, _, _ in SECTIONS[1:]:
+        np.testing.assert_array_equal(getattr(left, name), getattr(right, name))
+
+
+def test_artifact_round_trip(tmp_path):
+    rng = random.Random(9)
+    rule_store = RuleStore.from_rows(random_rules(rng, [f"Produit {index} é" for index in range(40)], 300))
+    rule_store.version = 7
+    path = os.path.join(tmp_path, 'rules.bin')
+
+    save_rule_artifact(rule_store, path)
+    mapped = open_rule_artifact(path)
+    assert_same_store(mapped, rule_store)
+    for _ in range(20):
+        cart = rng.sample(rule_store.items, 3)
+        assert mapped.recommend(cart) == rule_store.recommend(cart)
+
+
+def test_empty_store_round_trip(tmp_path):
+    path = os.path.join(tmp_path, 'rules.bin')
+    save_rule_artifact(RuleStore.from_rows([]), path)
+
+    mapped = open_rule_artifact(path)
+    assert len(mapped) == 0 and mapped.version is None and mapped.recommend(['Milk']) == []
+
+
+def test_training_writes_the_artifact_the_pos_maps():
+    add_rules([(['Milk'], ['Bread'], 0.2, 0.8, 2.0, 0.05)])
+    add_rules([(['Milk'], ['Eggs'], 0.2, 0.8, 2.0, 0.05)])
+    add_rules([(['Milk'], ['Tea'], 0.2, 0.8, 2.0, 0.05)])
+
+    # Files of garbage-collected versions are removed
+    assert [os.path.exists(artifact_path(version)) for version in (1, 2, 3)] == [False, True, True]
+    rule_store = open_rule_store()
+    assert rule_store.mapping is not None
+    assert_same_store(rule_store, load_rule_store())
+    assert rule_store.recommend(['Milk']) == ['Tea']
+
+
+def test_damaged_artifact_falls_back_to_the_database():
+    add_rules([(['Milk'], ['Bread'], 0.2, 0.8, 2.0, 0.05)])
+    path = artifact_path(1)
+    with open(path, 'r+b') as file:
+        file.truncate(os.path.getsize(path) - 3)
+
+    with pytest.raises(ValueError):
+        open_rule_artifact(path)
+    rule_store = open_rule_store()
+    assert getattr(rule_store, 'mapping', None) is None
+    assert rule_store.recommend(['Milk']) == ['Bread']
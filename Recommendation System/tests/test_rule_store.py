@@ -0,0 +1,63 @@
+import random
+import pandas as pd
+from src.rule_store import RuleStore
+from src.recommendation import get_related_recommendations
+
+
+def pandas_recommendations(scanned_items, rules_df, top_n=5):
+    # The DataFrame implementation RuleStore replaced, kept as the reference ranking
+    scanned = set(item.strip().lower() for item in scanned_items)
+    recommendations = []
+    for _, row in rules_df.iterrows():
+        antecedents = set(item.strip().lower() for item in row['antecedents'].split(','))
+        if not antecedents & scanned:
+            continue
+        for item in (item.strip() for item in row['consequents'].split(',')):
+            recommendations.append({'item': item, 'confidence': row['confidence'], 'in_cart': item.lower() in scanned})
+    if not recommendations:
+        return []
+    df = pd.DataFrame(recommendations).sort_values('confidence', ascending=False)
+    df = df.drop_duplicates(subset='item', keep='first')
+    df['priority'] = df['in_cart'].map(lambda in_cart: 0 if in_cart else 1)
+    df = df.sort_values(['priority', 'confidence'], ascending=[True, False])
+    return [row['item'] + (" (Already in cart)" if row['in_cart'] else "") for _, row in df.iterrows()][:top_n]
+
+
+def random_rules(rng, items, count):
+    # Distinct confidences and one consequent per rule, so the ranking has no ties the two
+    # implementations could order differently
+    confidences = rng.sample(range(1, 10 * count), count)
+    rules = []
+    for confidence in confidences:
+        chosen = rng.sample(items, rng.randint(2, 4))
+        rules.append((', '.join(chosen[:-1]), chosen[-1], 0.1, confidence / (10 * count), 1.5, 0.01))
+    return rules
+
+
+def test_recommend_matches_pandas_ranking():
+    rng = random.Random(7)
+    items = [f"Product {index}" for index in range(30)]
+    rules = random_rules(rng, items, 200)
+    rules_df = pd.DataFrame(rules, columns=['antecedents', 'consequents', 'support', 'confidence', 'lift', 'leverage'])
+    rule_store = RuleStore.from_rows(rules)
+
+    for _ in range(100):
+        cart = rng.sample(items, rng.randint(1, 6))
+        assert rule_store.recommend(cart, top_n=5) == pandas_recommendations(cart, rules_df)
+
+
+def test_recommend_normalizes_names_and_skips_unknown_items():
+    rule_store = RuleStore.from_rows([('Milk', 'Bread', 0.2, 0.8, 2.0, 0.05), ('Bread', 'Milk, Eggs', 0.1, 0.5, 1.5, 0.02)])
+
+    assert rule_store.recommend(['  mILK ', 'Unknown'], top_n=5) == ['Bread']
+    assert rule_store.recommend(['milk', 'bread']) == ['Bread (Already in cart)', 'Milk (Already in cart)', 'Eggs']
+    assert get_related_recommendations(['Unknown'], rule_store) == []
+
+
+def test_index_lists_the_rules_of_each_antecedent():
+    rule_store = RuleStore.from_rows([('A, B', 'C', 0.1, 0.5, 1.0, 0.0), ('B', 'A', 0.1, 0.6, 1.0, 0.0),
+                                      ('C', 'A', 0.1, 0.7, 1.0, 0.0)])
+
+    assert rule_store.rules_for_item(rule_store.lookup('B')).tolist() == [0, 1]
+    assert rule_store.rules_for_item(rule_store.lookup('C')).tolist() == [2]
+    assert len(rule_store) == 3 and rule_store.items == ['A', 'B', 'C']
@@ -0,0 +1,85 @@
+import csv
+import pytest
+from src import sales_log
+from src.pos_operations import POSOperations
+from src.sales_log import SalesLog, TransactionIdAllocator
+
+
+def counter_value(path):
+    return int(path.read_text().strip())
+
+
+def test_ids_are_never_handed_out_twice_after_a_crash(tmp_path):
+    path = tmp_path / 'transaction_counter'
+    allocator = TransactionIdAllocator(str(path), block_size=10, initial=lambda: 7)
+    handed_out = [allocator.next() for _ in range(25)]
+    assert handed_out == list(range(8, 33))
+
+    # A crash loses the in-memory position, the restart continues after everything reserved
+    restarted = TransactionIdAllocator(str(path), block_size=10, initial=lambda: 0)
+    assert restarted.next() > max(handed_out)
+    assert restarted.next() == restarted.last
+
+
+def test_next_does_not_write_while_reserve_ahead_keeps_up(tmp_path, monkeypatch):
+    path = tmp_path / 'transaction_counter'
+    allocator = TransactionIdAllocator(str(path), block_size=10)
+    assert counter_value(path) == 10
+
+    writes = []
+    write_durably = sales_log.write_durably
+    monkeypatch.setattr(sales_log, 'write_durably', lambda *args: writes.append(args) or write_durably(*args))
+    for _ in range(3):
+        for _ in range(5):
+            allocator.next()
+        assert writes == []
+        # What the checkout logger does after each batch
+        allocator.reserve_ahead()
+        writes.clear()
+    assert allocator.last == 15 and counter_value(path) == 30
+
+    # Without reserve_ahead the block runs out and next() writes the following one itself
+    for _ in range(15):
+        allocator.next()
+    assert allocator.next() == 31 and counter_value(path) == 40
+
+
+def test_sales_log_starts_a_new_segment_at_max_bytes(tmp_path):
+    legacy = tmp_path / 'retail-data.csv'
+    legacy.write_text(','.join(sales_log.SALES_FIELDNAMES) + '\n')
+    log = SalesLog(str(legacy), max_bytes=200)
+    row = {'Transaction_ID': 1, 'Product_Name': 'Milk', 'Quantity': 1, 'Transaction_Date': '2024-01-01 10:00:00',
+           'Unit_Price': 2.5, 'Customer_ID': 'C1'}
+
+    paths = [log.append([row, row]) for _ in range(4)]
+    assert paths[0].endswith('retail-data.000001.csv')
+    assert len(set(paths)) > 1
+    assert log.files()[0] == str(legacy)
+    assert log.files()[1:] == sorted(set(paths))
+
+    # Every segment has its own header, and a new SalesLog keeps appending to the last one
+    rows = 0
+    for path in log.files()[1:]:
+        with open(path, newline='') as file:
+            rows += len(list(csv.DictReader(file)))
+    assert rows == 8
+    assert SalesLog(str(legacy), max_bytes=10 ** 6).append([row]) == paths[-1]
+
+
+def test_failed_sales_rows_reach_the_caller_without_reserving_ids(tmp_path, monkeypatch):
+    pos_operations = POSOperations(recommend_log_path=str(tmp_path / 'recommend_log.csv'),
+                                   counter_path=str(tmp_path / 'transaction_counter'),
+                                   sales_log_path=str(tmp_path / 'retail-data.csv'))
+    # Some ids handed out, so the next block would be due
+    for _ in range(5):
+        pos_operations.generate_transaction_id()
+    reserved = pos_operations.transaction_ids.reserved
+
+    def failing_append(rows):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(pos_operations.sales_log, 'append', failing_append)
+    pos_operations.add_product('Milk')
+    with pytest.raises(OSError):
+        pos_operations.write_transaction_rows(pos_operations.transaction_rows())
+    assert pos_operations.transaction_ids.reserved == reserved
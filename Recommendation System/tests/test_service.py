@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from src.recommendation import get_db_connection
+from src.service import RecommendationService, RemoteRecommendationClient
+from tests.helpers import add_rules
+
+
+@pytest.fixture
+def service():
+    service = RecommendationService(port=0, flush_interval=0.01)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(service.start())
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait(5)
+    yield service
+    asyncio.run_coroutine_threadsafe(service.stop(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+class FakeService:
+    """
+    Listens on a free port and answers each request line with reply(request) -> bytes, closing the
+    connection when it returns None or, with one_reply_per_connection, after each reply. Every
+    received request is kept in requests.
+    """
+
+    def __init__(self, reply, one_reply_per_connection=False):
+        self.reply = reply
+        self.one_reply_per_connection = one_reply_per_connection
+        self.requests = []
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            with conn, conn.makefile('rwb') as file:
+                for line in file:
+                    request = json.loads(line)
+                    self.requests.append(request)
+                    reply = self.reply(request)
+                    if reply is None:
+                        break
+                    file.write(reply)
+                    file.flush()
+                    if self.one_reply_per_connection:
+                        break
+
+    def close(self):
+        self.listener.close()
+
+
+def stored_logs():
+    conn = get_db_connection()
+    try:
+        return conn.execute('SELECT transaction_id, purchased_items FROM recommendation_logs ORDER BY log_id').fetchall()
+    finally:
+        conn.close()
+
+
+def test_recommend_and_checkout(service):
+    add_rules([(['Milk'], ['Bread'], 0.2, 0.8, 2.0, 0.05)])
+    service.engine.load_rules()
+    client = RemoteRecommendationClient(port=service.port)
+
+    assert client.update_recommendations(['Milk']) == ['Bread']
+    assert client.save_logs([('REC001', ['Bread'], ['Milk', 'Bread']), ('REC002', [], ['Tea'])])
+    client.checkout('REC003', ['Eggs'], [])
+    assert stored_logs() == [('REC001', 'Milk, Bread'), ('REC002', 'Tea'), ('REC003', 'Eggs')]
+    assert client.stats()['checkout'] == 3
+    client.close()
+
+
+def test_retried_checkout_is_written_once(service):
+    client = RemoteRecommendationClient(port=service.port)
+    for _ in range(3):
+        client.request('checkout', transaction_id='REC001', purchased_items=['Milk'], recommended_items=[],
+                       key=client.checkout_key('REC001'))
+    # Another till may use the same transaction id
+    other = RemoteRecommendationClient(port=service.port)
+    other.request('checkout', transaction_id='REC001', purchased_items=['Tea'], recommended_items=[],
+                  key=other.checkout_key('REC001'))
+
+    assert stored_logs() == [('REC001', 'Milk'), ('REC001', 'Tea')]
+    assert client.stats()['duplicates'] == 2
+    client.close()
+    other.close()
+
+
+def test_save_logs_commits_the_batch_in_one_request(service):
+    client = RemoteRecommendationClient(port=service.port)
+    commits = []
+    save_logs = service.engine.pipeline.save_logs
+    service.engine.pipeline.save_logs = lambda logs: commits.append(len(logs)) or save_logs(logs)
+
+    assert client.save_logs([('REC001', [], ['Milk']), ('REC002', [], ['Tea']), ('REC003', [], ['Eggs'])])
+    # Retried together with a new one, only the new log is written
+    assert client.save_logs([('REC003', [], ['Eggs']), ('REC004', [], ['Jam'])])
+
+    assert commits == [3, 1]
+    assert [log[0] for log in stored_logs()] == ['REC001', 'REC002', 'REC003', 'REC004']
+    assert client.stats()['duplicates'] == 1
+    client.close()
+
+
+def test_failed_batch_is_not_acknowledged(service):
+    client = RemoteRecommendationClient(port=service.port)
+    service.engine.pipeline.save_logs = lambda logs: False
+
+    assert client.save_logs([('REC001', [], ['Milk']), ('REC002', [], ['Tea'])]) is False
+    assert stored_logs() == []
+    client.close()
+
+
+def test_rules_are_loaded_and_checked_off_the_event_loop(service, monkeypatch):
+    from src import recommendation_engine
+
+    threads = []
+    get_active_version = recommendation_engine.get_active_version
+    monkeypatch.setattr(recommendation_engine, 'get_active_version',
+                        lambda: threads.append(threading.current_thread().name) or get_active_version())
+    loads = []
+    monkeypatch.setattr(service.engine, 'load_rules', lambda: loads.append(1))
+    client = RemoteRecommendationClient(port=service.port)
+    # No rules yet: an empty result, the store is not reloaded on every request
+    assert client.update_recommendations(['Milk']) == []
+    assert client.update_recommendations(['Milk']) == []
+    assert threads == [] and loads == []
+
+    add_rules([(['Milk'], ['Bread'], 0.2, 0.8, 2.0, 0.05)])
+    service.engine.last_version_check = 0
+    deadline = time.monotonic() + 5
+    while client.update_recommendations(['Milk']) != ['Bread']:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert threads and all(name.startswith('asyncio') for name in threads)
+    client.close()
+
+
+def test_writer_errors_are_replied_and_a_dead_writer_does_not_block_stop(service):
+    client = RemoteRecommendationClient(port=service.port)
+
+    def fail(logs):
+        raise OSError('disk full')
+
+    service.engine.pipeline.save_logs = fail
+    assert client.save_logs([('REC001', [], ['Milk'])]) is False
+    client.close()
+
+    async def stop_with_a_dead_writer():
+        stopped = RecommendationService(port=0)
+        await stopped.start()
+        stopped.writer_task.cancel()
+        await stopped.checkouts.put(([('REC002', [], ['Milk'])], asyncio.get_running_loop().create_future()))
+        await asyncio.wait_for(stopped.stop(), 5)
+
+    asyncio.run(stop_with_a_dead_writer())
+
+
+def test_checkout_is_not_resent_once_it_reached_the_service():
+    fake = FakeService(lambda request: None)
+    client = RemoteRecommendationClient(port=fake.port)
+
+    with pytest.raises(ConnectionError):
+        client.request('checkout', transaction_id='REC001', purchased_items=['Milk'], recommended_items=[])
+    assert [request['op'] for request in fake.requests] == ['checkout']
+
+    # A lost reply to a read is simply asked again
+    with pytest.raises(ConnectionError):
+        client.request('recommend', items=['Milk'])
+    assert [request['op'] for request in fake.requests] == ['checkout', 'recommend', 'recommend']
+    fake.close()
+
+
+def test_connection_closed_by_a_restart_is_replaced_before_sending():
+    # Closes the connection after each reply, like a service restarted between two calls
+    fake = FakeService(lambda request: json.dumps({'ok': True, 'id': request['id']}).encode('utf-8') + b'\n',
+                       one_reply_per_connection=True)
+    client = RemoteRecommendationClient(port=fake.port)
+    client.request('checkout', transaction_id='REC001', purchased_items=['Milk'], recommended_items=[])
+    time.sleep(0.1)
+
+    client.request('checkout', transaction_id='REC002', purchased_items=['Milk'], recommended_items=[])
+    assert [request['transaction_id'] for request in fake.requests] == ['REC001', 'REC002']
+    fake.close()
+
+
+def test_malformed_reply_closes_the_connection():
+    fake = FakeService(lambda request: b'not json\n')
+    client = RemoteRecommendationClient(port=fake.port)
+
+    with pytest.raises(ConnectionError):
+        client.request('checkout', transaction_id='REC001', purchased_items=['Milk'], recommended_items=[])
+    assert client.sock is None
+    assert client.save_logs([('REC002', [], ['Milk'])]) is False
+    assert client.update_recommendations(['Milk']) == []
+    fake.close()
+
+
+def test_service_imports_without_tkinter():
+    code = ("import sys; sys.modules['tkinter'] = None; import src.service; "
+            "print(sorted(name for name in ('tkinter', 'pandas', 'matplotlib') if sys.modules.get(name)))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == '[]'
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import pytest
+from benchmarks.bench_startup import check, import_times
+from mainpos import DEFERRED_MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cashier_screen_imports_without_the_deferred_modules():
+    pytest.importorskip('tkinter')
+    # A fresh interpreter, the test session itself has pandas and friends loaded already
+    code = ("import sys, mainpos, src.pos_ui; "
+            "print(sorted(name for name in mainpos.DEFERRED_MODULES if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=ROOT)
+    assert result.stdout.strip() == '[]'
+
+
+def test_import_times_lists_the_modules_of_the_cashier_screen(monkeypatch):
+    pytest.importorskip('tkinter')
+    monkeypatch.chdir(ROOT)
+    times = import_times()
+
+    assert 'src.pos_ui' in times and 'src.checkout_logger' in times
+    assert all(self_us <= cumulative_us for self_us, cumulative_us in times.values())
+    assert not set(DEFERRED_MODULES) & set(times)
+
+
+def test_check_reports_deferred_modules_and_slowdowns_past_the_slack():
+    baseline = {'import_ms': 100.0, 'ui_ms': 20.0, 'first_frame_ms': None, 'total_ms': 400.0}
+    results = {'import_ms': 120.0, 'ui_ms': 65.0, 'first_frame_ms': 30.0, 'total_ms': 500.0,
+               'loaded_deferred_modules': []}
+    assert check(results, baseline, tolerance=0.25, min_slack_ms=50) == []
+
+    results.update(ui_ms=71.0, total_ms=501.0, loaded_deferred_modules=['pandas'])
+    failures = check(results, baseline, tolerance=0.25, min_slack_ms=50)
+    assert failures[0] == "deferred modules imported at startup: pandas"
+    assert [failure.split()[0] for failure in failures[1:]] == ['ui_ms', 'total_ms']
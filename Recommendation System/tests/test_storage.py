@@ -0,0 +1,40 @@
+import threading
+from src import storage
+from src.recommendation import get_db_connection
+
+
+def test_connections_are_pooled_per_thread():
+    first = get_db_connection()
+    second = get_db_connection()
+    assert first._conn is second._conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_db_connection()._conn))
+    thread.start()
+    thread.join()
+    assert other[0] is not first._conn
+
+
+def test_close_rolls_back_uncommitted_work_and_keeps_the_connection():
+    conn = get_db_connection()
+    conn.execute("INSERT INTO items (name) VALUES ('Milk')")
+    conn.close()
+
+    conn = get_db_connection()
+    assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+    conn.execute("INSERT INTO items (name) VALUES ('Milk')")
+    conn.commit()
+    conn.close()
+    assert get_db_connection().execute('SELECT COUNT(*) FROM items').fetchone()[0] == 1
+
+
+def test_schema_and_pragmas_are_applied_once(scratch_db):
+    conn = get_db_connection()
+    assert storage.connection_manager._schema_ready
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == storage.SCHEMA_VERSION
+
+    # configure() hands out fresh connections with the new settings
+    storage.configure(busy_timeout=1234)
+    assert get_db_connection()._conn is not conn._conn
+    assert get_db_connection().execute('PRAGMA busy_timeout').fetchone()[0] == 1234
@@ -0,0 +1,35 @@
+import os
+import numpy as np
+from benchmarks.synthetic import BasketGenerator
+
+PRODUCT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'prod_list.csv')
+
+
+def test_same_seed_gives_the_same_baskets():
+    first = BasketGenerator(PRODUCT_FILE, seed=5).baskets(2000)
+    assert BasketGenerator(PRODUCT_FILE, seed=5).baskets(2000) == first
+    assert BasketGenerator(PRODUCT_FILE, seed=6).baskets(2000) != first
+
+
+def test_baskets_hold_distinct_catalogue_items():
+    generator = BasketGenerator(PRODUCT_FILE, catalogue_size=500, seed=1)
+    basket_ptr, item_ids = generator.generate(5000)
+
+    assert len(basket_ptr) == 5001 and basket_ptr[-1] == len(item_ids)
+    sizes = np.diff(basket_ptr)
+    assert sizes.min() >= 1 and 3 < sizes.mean() < 5
+    for basket in generator.names(basket_ptr, item_ids)[:500]:
+        assert len(set(basket)) == len(basket)
+    # Products beyond the bundled list are numbered clones
+    assert len(set(generator.items)) == 500 and generator.items[-1].rpartition(' #')[2].isdigit()
+
+
+def test_bundles_are_bought_together():
+    generator = BasketGenerator(PRODUCT_FILE, bundle_count=5, bundle_rate=0.2, seed=2)
+    baskets = [set(basket) for basket in generator.baskets(20000)]
+
+    for bundle in generator.bundles:
+        names = {generator.items[item] for item in bundle}
+        together = sum(names <= basket for basket in baskets) / len(baskets)
+        # Planted in about bundle_rate / bundle_count of the baskets, far above chance
+        assert together > 0.5 * 0.2 / 5
@@ -0,0 +1,29 @@
+import random
+from src.training import encode_transactions, load_transaction_baskets, measure_peak, model_training
+from tests.helpers import active_rules, add_baskets, random_baskets
+
+
+def test_measure_peak_traces_the_stage():
+    result, peak = measure_peak(lambda: len(bytearray(8 * 1024 ** 2)))
+    assert result == 8 * 1024 ** 2 and peak >= 8
+    assert measure_peak(lambda: 1, profile_memory=False) == (1, None)
+
+
+def test_sparse_encoding_peaks_below_dense():
+    rng = random.Random(1)
+    catalogue = [f"Product {index}" for index in range(3000)]
+    baskets = [rng.sample(catalogue, 5) for _ in range(3000)]
+
+    _, dense_peak = measure_peak(lambda: encode_transactions(baskets))
+    _, sparse_peak = measure_peak(lambda: encode_transactions(baskets, sparse=True))
+    assert sparse_peak < dense_peak / 2
+
+
+def test_model_training_reports_peak_memory(capsys):
+    add_baskets(random_baskets(random.Random(6), 200))
+    baskets, item_names = load_transaction_baskets()
+
+    model_training(baskets, min_support=0.05, lift_threshold=1, confidence_threshold=0.1, sparse=True,
+                   item_names=item_names, profile_memory=True)
+    assert "Peak memory (sparse): encoding" in capsys.readouterr().out
+    assert active_rules()